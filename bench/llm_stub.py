@@ -0,0 +1,144 @@
+"""
+OpenAI chat-completions 형식으로 응답하는 로컬 스텁 서버와 LLM 클라이언트 점검
+
+    python bench/llm_stub.py --serve --port 8900    # 스텁 서버만 실행 (LLM_BASE_URL=http://127.0.0.1:8900/v1)
+    python bench/llm_stub.py                        # 스텁 서버를 띄워 캐시/병합/재시도 동작 확인
+
+스텁은 사용자 문장을 로컬 파서로 해석한 결과를 {"constraints": [...]} 로 돌려주며,
+delay 초만큼 늦게 응답하고 처음 fail_first번의 요청에는 500 오류를 낸다.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_client import LLMClient
+from nlp import build_prompt, food_names, parse_response
+from nlp_local import parse_local
+
+SYSTEM_PROMPT = build_prompt(food_names()) # 전체 음식 목록을 넣은 프롬프트 (스텁은 사용자 문장만 봄)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, delay: float = 0.2, fail_first: int = 0):
+        super().__init__(('127.0.0.1', port), StubHandler)
+        self.delay = delay
+        self.fail_first = fail_first
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if not self.path.endswith('/chat/completions'):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with self.server.lock:
+            self.server.calls += 1
+            fail = self.server.calls <= self.server.fail_first
+        time.sleep(self.server.delay)
+        if fail:
+            self._send(500, {"error": {"message": "stub failure", "type": "server_error"}})
+            return
+
+        user_text = body['messages'][-1]['content']
+        constraints = [c.model_dump(exclude_none=True) for c in parse_local(user_text).constraints]
+        self._send(200, {
+            "id": f"stub-{self.server.calls}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get('model', 'stub'),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps({"constraints": constraints}, ensure_ascii=False)},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    def _send(self, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+async def check(server: StubServer, cache_path: str):
+    client = LLMClient(base_url=server.base_url, api_key='stub', timeout=5, backoff=0.05, cache_path=cache_path)
+    phrasings = ["불고기 빼고 1800kcal 이하", "불고기 빼고  1800kcal 이하.", "불고기 빼고 1800KCAL 이하!"]
+
+    # 같은 문장(정규화 후)을 동시에 50번 요청 -> 서버 호출 1번
+    start = time.perf_counter()
+    results = await asyncio.gather(*(client.acomplete(SYSTEM_PROMPT, phrasings[i % 3]) for i in range(50)))
+    elapsed = time.perf_counter() - start
+    assert len(set(results)) == 1 and isinstance(parse_response(results[0]), list)
+    print(f"동시 50건 (표현 3종): 서버 호출 {server.calls}회, {elapsed:.2f}s, {client.stats()}")
+
+    # 캐시 적중
+    calls = server.calls
+    client.complete(SYSTEM_PROMPT, phrasings[0])
+    assert server.calls == calls
+    client.close()
+
+    # 디스크 캐시: 새 클라이언트도 서버 호출 없이 응답
+    client = LLMClient(base_url=server.base_url, api_key='stub', cache_path=cache_path)
+    client.complete(SYSTEM_PROMPT, phrasings[0])
+    assert server.calls == calls
+    print(f"디스크 캐시: {client.stats()}")
+    client.close()
+
+    # 500 오류 두 번 뒤 재시도로 성공
+    server.fail_first = server.calls + 2
+    client = LLMClient(base_url=server.base_url, api_key='stub', backoff=0.05)
+    content = client.complete(SYSTEM_PROMPT, "잡채 넣어줘")
+    assert isinstance(parse_response(content), list)
+    print(f"재시도: {client.stats()}")
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--serve', action='store_true', help='스텁 서버만 실행')
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--delay', type=float, default=0.2)
+    parser.add_argument('--fail-first', type=int, default=0)
+    args = parser.parse_args()
+
+    server = StubServer(args.port, args.delay, args.fail_first)
+    if args.serve:
+        print(f"스텁 서버: {server.base_url}")
+        server.serve_forever()
+        return
+
+    server.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(check(server, os.path.join(tmp, 'llm_cache.sqlite')))
+    server.shutdown()
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
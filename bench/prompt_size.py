@@ -0,0 +1,89 @@
+"""
+음식 목록 크기에 따른 LLM 프롬프트 크기와 후보 검색 시간 비교
+
+    python bench/prompt_size.py
+    python bench/prompt_size.py --sizes 200 2000 20000
+
+실제 음식 이름에 수식어를 붙여 만든 가상 목록으로, 전체 목록을 넣은 프롬프트와
+검색으로 줄인 프롬프트의 길이(문자 수, 추정 토큰 수)와 로컬 검색 시간을 잰다.
+LLM 응답 시간은 입력 토큰 수에 비례해 늘어나므로 프롬프트 토큰 수를 대신 비교한다.
+"""
+import argparse
+import itertools
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from food_retrieval import FoodRetriever
+from nlp import build_prompt, food_names
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests', 'parser_corpus.jsonl')
+MODIFIERS = ['', '매운', '치즈', '해물', '수제', '미니', '왕', '크림', '간장', '마늘', '트러플', '숯불', '들기름',
+             '버터', '불맛', '저당', '통밀', '곤약', '두부', '닭가슴살', '흑임자', '바질', '레몬', '훈제']
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding('cl100k_base')
+except ImportError:
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    # tiktoken이 없으면 한글 음절 1토큰, 그 외 문자 4자당 1토큰으로 추정
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    hangul = sum('가' <= char <= '힣' for char in text)
+    return hangul + (len(text) - hangul) // 4
+
+
+def synthetic_names(size: int) -> list:
+    # 실제 이름을 먼저 쓰고, 모자라면 수식어 조합으로 채움
+    base = food_names()
+    names = list(base)
+    combos = (f'{a}{b}{name}' for a, b in itertools.combinations(MODIFIERS, 2) for name in base)
+    seen = set(names)
+    for name in combos:
+        if len(names) >= size:
+            break
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names[:size]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[200, 1000, 5000, 20000])
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH, encoding='utf-8') as f:
+        texts = [json.loads(line)['text'] for line in f if line.strip()]
+
+    print(f"토큰 수: {'tiktoken cl100k' if _encoding else '추정'}, 문장 {len(texts)}개")
+    print(f"{'음식 수':>8} {'전체 토큰':>10} {'축소 토큰(평균/최대)':>18} {'후보 수':>8} {'색인(ms)':>9} {'검색 평균/p95(us)':>18}")
+    for size in args.sizes:
+        names = synthetic_names(size)
+        start = time.perf_counter()
+        retriever = FoodRetriever(names)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        full_tokens = count_tokens(build_prompt(names))
+        latencies, tokens, counts = [], [], []
+        for text in texts:
+            start = time.perf_counter()
+            candidates = retriever.candidates(text)
+            latencies.append((time.perf_counter() - start) * 1e6)
+            tokens.append(count_tokens(build_prompt(candidates)))
+            counts.append(len(candidates))
+
+        p95 = sorted(latencies)[int(len(latencies) * 0.95) - 1]
+        print(f"{len(names):>8} {full_tokens:>10} {statistics.mean(tokens):>10.0f} / {max(tokens):<6} "
+              f"{statistics.mean(counts):>8.1f} {build_ms:>9.1f} {statistics.mean(latencies):>9.0f} / {p95:<8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+음식 인식 처리량 측정 (이미지 디코딩, 한 장씩 추론 vs 마이크로 배치)
+
+    python bench/recognition_bench.py
+    python bench/recognition_bench.py --model best.onnx --images a.jpg b.png --requests 256 --concurrency 32
+    python bench/recognition_bench.py --input-size 320 --batches 1 4 8 16
+
+--model이 없으면 onnx 패키지로 YOLOv8 출력 형식(4 + 클래스 수, 앵커 수)을 흉내 내는 작은 합성곱 모델을 만들어
+쓴다 (라벨은 카탈로그 음식 이름). 기본 이미지는 test-result-1.png와 이를 JPEG로 다시 저장한 것이다.
+onnxruntime, Pillow (테스트 모델을 만들 때는 onnx)가 필요하다.
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import get_catalog
+from recognition import FoodRecognizer, decode_image, recognition_available
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_IMAGE = os.path.join(ROOT, 'test-result-1.png')
+TEST_CLASSES = 16
+STRIDE = 32
+
+
+def build_test_model(path: str, input_size: int, classes: int = TEST_CLASSES):
+    """
+    입력 (N, 3, S, S) -> 출력 (N, 4 + classes, (S/32)^2) 인 테스트 모델 저장
+
+    stride 32 합성곱 하나 + 시그모이드이고, 상자 채널은 입력 크기 배율을 곱해 좌표처럼 만든다.
+    """
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(0)
+    channels = 4 + classes
+    anchors = (input_size // STRIDE) ** 2
+    weight = rng.normal(0, 0.05, (channels, 3, STRIDE, STRIDE)).astype(np.float32)
+    scale = np.ones((1, channels, 1), np.float32)
+    scale[0, :2], scale[0, 2:4] = input_size, input_size / 4
+
+    graph = helper.make_graph(
+        [
+            helper.make_node('Conv', ['images', 'weight'], ['features'], strides=[STRIDE, STRIDE]),
+            helper.make_node('Reshape', ['features', 'shape'], ['flat']),
+            helper.make_node('Sigmoid', ['flat'], ['scores']),
+            helper.make_node('Mul', ['scores', 'scale'], ['output0']),
+        ],
+        'food_detector_test',
+        [helper.make_tensor_value_info('images', TensorProto.FLOAT, ['batch', 3, input_size, input_size])],
+        [helper.make_tensor_value_info('output0', TensorProto.FLOAT, ['batch', channels, anchors])],
+        [numpy_helper.from_array(weight, 'weight'), numpy_helper.from_array(scale, 'scale'),
+         numpy_helper.from_array(np.array([0, channels, -1], np.int64), 'shape')],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    names = {i: str(name) for i, name in enumerate(get_catalog().names[:classes])}
+    model.metadata_props.add(key='names', value=repr(names))
+    onnx.save(model, path)
+
+
+def load_images(paths: list) -> list:
+    # [(이름, 바이트), ...] 기본 이미지는 PNG 원본과 JPEG 변환본
+    from PIL import Image
+    images = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            images.append((os.path.basename(path), f.read()))
+    if paths == [SAMPLE_IMAGE]:
+        buffer = io.BytesIO()
+        Image.open(SAMPLE_IMAGE).convert('RGB').save(buffer, format='JPEG', quality=90)
+        images.append(('test-result-1.jpg', buffer.getvalue()))
+    return images
+
+
+def percentiles(values: list) -> str:
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return f"p50 {pick(0.5):>7.1f}ms p95 {pick(0.95):>7.1f}ms"
+
+
+def bench_decode(images: list, input_size: int, repeat: int):
+    print(f"{'이미지':<22} {'바이트':>9} {'디코딩 평균(ms)':>15}")
+    for name, data in images:
+        times = []
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            decode_image(data, input_size)
+            times.append(time.perf_counter() - started_at)
+        print(f"{name:<22} {len(data):>9} {statistics.mean(times) * 1000:>15.2f}")
+
+
+def bench_sequential(recognizer: FoodRecognizer, decoded: list, requests: int):
+    # 배치 없이 한 장씩 추론
+    latencies = []
+    started_at = time.perf_counter()
+    for i in range(requests):
+        request_started_at = time.perf_counter()
+        recognizer.run_batch([decoded[i % len(decoded)]])
+        latencies.append(time.perf_counter() - request_started_at)
+    wall = time.perf_counter() - started_at
+    print(f"{'한 장씩':<14} {requests / wall:>8.1f} img/s  {percentiles(latencies)}")
+
+
+async def bench_batched(recognizer: FoodRecognizer, images: list, requests: int, concurrency: int):
+    # 디코딩부터 포함해 동시 요청을 마이크로 배치로 처리
+    limit = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def request(data: bytes):
+        async with limit:
+            request_started_at = time.perf_counter()
+            await recognizer.recognize(data)
+            latencies.append(time.perf_counter() - request_started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(request(images[i % len(images)][1]) for i in range(requests)))
+    wall = time.perf_counter() - started_at
+    return requests / wall, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default=None, help='ONNX 모델 경로 (없으면 테스트 모델 생성)')
+    parser.add_argument('--images', nargs='+', default=[SAMPLE_IMAGE])
+    parser.add_argument('--input-size', type=int, default=640, help='테스트 모델 입력 크기')
+    parser.add_argument('--requests', type=int, default=128)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--batches', type=int, nargs='+', default=[1, 4, 8, 16], help='비교할 최대 배치 크기')
+    parser.add_argument('--window', type=float, default=0.005)
+    parser.add_argument('--threads', type=int, default=None)
+    args = parser.parse_args()
+
+    if not recognition_available():
+        sys.exit("onnxruntime과 Pillow가 필요합니다")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = args.model
+        if model_path is None:
+            model_path = os.path.join(tmp, 'food_detector_test.onnx')
+            build_test_model(model_path, args.input_size)
+
+        images = load_images(args.images)
+        recognizer = FoodRecognizer(model_path, get_catalog(), threads=args.threads)
+        print(f"모델 입력 {recognizer.input_size}px, 라벨 {len(recognizer.labels)}개, "
+              f"카탈로그 연결 {sum(i is not None for i in recognizer.food_index)}개, 스레드 {args.threads or os.cpu_count()}")
+        bench_decode(images, recognizer.input_size, repeat=20)
+
+        decoded = [decode_image(data, recognizer.input_size) for _, data in images]
+        recognizer.run_batch(decoded[:1]) # 첫 실행의 초기화 비용 제외
+
+        print(f"\n{'방식':<14} {'처리량':>14}  지연 시간 (요청 {args.requests}건, 동시 {args.concurrency})")
+        bench_sequential(recognizer, decoded, args.requests)
+        recognizer.close()
+        for max_batch in args.batches:
+            recognizer = FoodRecognizer(model_path, get_catalog(), threads=args.threads,
+                                        max_batch=max_batch, window=args.window)
+            throughput, latencies = asyncio.run(bench_batched(recognizer, images, args.requests, args.concurrency))
+            recognizer.close()
+            print(f"{f'배치 최대 {max_batch}':<14} {throughput:>8.1f} img/s  {percentiles(latencies)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+추천 요청의 단계별 소요 시간(p50/p95/p99)과 처리량 측정
+
+    python bench/recommend_bench.py
+    python bench/recommend_bench.py --sizes 200 5000 100000 --requests 40 --preferences
+    python bench/recommend_bench.py --preferences --llm-stub 0.3      # 로컬 파서가 못 푸는 문장은 스텁 LLM으로
+    python bench/recommend_bench.py --http --requests 200 --concurrency 8
+
+기본 모드는 카탈로그 크기마다 가상 카탈로그를 CSV로 써서 다시 읽고(catalog_load), 캐시와 풀이 풀 없이
+목표값 계산부터 결과 변환까지 요청을 순서대로 처리하며 metrics.collect()로 요청별 단계 시간을 모은다.
+--http 모드는 기본 카탈로그로 main.app을 프로세스 안에서 띄워 동시 요청의 지연 시간과 처리량을 재고,
+/metrics의 단계별 평균을 함께 출력한다.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+# recommend 모듈을 불러오기 전에 설정 (워커 프로세스 없이 이 프로세스에서 풀이)
+os.environ.setdefault('SOLVER_WORKERS', '0')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import FoodCatalog
+from metrics import STAGES, collect, stage
+from nlp import parse_constraints
+from nlp_local import parse_local
+from recommend import MealRecommendation
+from solver_backends import SolverSettings
+from solver_bench import PROFILES, synthetic_catalog
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests', 'parser_corpus.jsonl')
+
+
+def percentile(values: list, q: float) -> float:
+    # 최근접 순위 방식 백분위수
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))]
+
+
+def load_preferences(use_llm: bool) -> list:
+    # LLM을 쓰지 않으면 로컬 파서로 전부 해석되는 문장만 사용
+    with open(CORPUS_PATH, encoding='utf-8') as f:
+        texts = [json.loads(line)['text'] for line in f if line.strip()]
+    return texts if use_llm else [text for text in texts if parse_local(text).complete]
+
+
+def start_llm_stub(delay: float):
+    # 스텁 서버를 띄우고 nlp의 LLM 클라이언트가 그쪽을 보도록 환경 변수 설정
+    from llm_stub import StubServer
+    server = StubServer(delay=delay).start()
+    os.environ['LLM_BASE_URL'] = server.base_url
+    os.environ.setdefault('API_KEY', 'stub')
+    return server
+
+
+def handle(recommender: MealRecommendation, profile: tuple, preference: str = None):
+    # recommend_one_meal과 같은 순서로 한 건 처리
+    height, weight, age, gender, activity, goal = profile
+    with stage('targets'):
+        daily_calories = recommender.calculate_daily_calories(weight, height, age, gender, activity, goal)
+        targets = recommender.calculate_meal_targets(daily_calories)
+    constraints = None
+    if preference:
+        with stage('constraint_parse'):
+            parsed = parse_constraints(preference)
+        constraints = recommender.compile_constraints(parsed)
+    return recommender.solve_meal_optimization(targets, constraints)
+
+
+def print_stages(samples: list, wall: float):
+    # samples: [(요청 전체 시간, {단계: 초}), ...]
+    names = [name for name in STAGES if any(name in timings for _, timings in samples)]
+    print(f"    {'단계':<20} {'횟수':>5} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9}")
+    for name in names + ['total']:
+        values = [total if name == 'total' else timings[name] for total, timings in samples
+                  if name == 'total' or name in timings]
+        print(f"    {name:<20} {len(values):>5} {percentile(values, 50) * 1000:>9.2f} "
+              f"{percentile(values, 95) * 1000:>9.2f} {percentile(values, 99) * 1000:>9.2f}")
+    print(f"    처리량 {len(samples) / wall:.1f} req/s (순차, {len(samples)}건 {wall:.2f}s)")
+
+
+def run_sizes(args, preferences: list):
+    settings = SolverSettings.from_env(args.time_limit)
+    cases = list(itertools.islice(itertools.cycle(PROFILES), args.requests))
+    texts = list(itertools.islice(itertools.cycle(preferences), args.requests)) if preferences else [None] * args.requests
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = os.path.join(tmp, f'catalog_{size}.csv')
+            synthetic_catalog(size).food_data.to_csv(path, index=False)
+            with collect() as load_timings:
+                catalog = FoodCatalog.from_csv(path)
+            recommender = MealRecommendation(catalog, settings=settings)
+            print(f"음식 {size}개: catalog_load {load_timings['catalog_load'] * 1000:.1f}ms")
+
+            samples = []
+            started_at = time.perf_counter()
+            for profile, text in zip(cases, texts):
+                with collect() as timings:
+                    request_started_at = time.perf_counter()
+                    handle(recommender, profile, text)
+                    samples.append((time.perf_counter() - request_started_at, timings))
+            print_stages(samples, time.perf_counter() - started_at)
+
+
+async def run_http(args, preferences: list):
+    import httpx
+    import main
+
+    params = [dict(zip(('height', 'weight', 'age', 'gender', 'activity', 'goal'), profile))
+              for profile in itertools.islice(itertools.cycle(PROFILES), args.requests)]
+    if preferences:
+        for item, text in zip(params, itertools.cycle(preferences)):
+            item['preference'] = text
+
+    latencies, errors = [], 0
+    limit = asyncio.Semaphore(args.concurrency)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=60) as client:
+        async def request(item: dict):
+            nonlocal errors
+            async with limit:
+                request_started_at = time.perf_counter()
+                response = await client.get('/recommend/', params=item)
+                latencies.append(time.perf_counter() - request_started_at)
+                errors += response.status_code != 200 or response.json().get('status') != 'success'
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*(request(item) for item in params))
+        wall = time.perf_counter() - started_at
+        exposition = (await client.get('/metrics')).text
+
+    print(f"HTTP /recommend/ {len(latencies)}건, 동시 {args.concurrency}, 실패 {errors}건")
+    print(f"    지연 p50 {percentile(latencies, 50) * 1000:.1f}ms, p95 {percentile(latencies, 95) * 1000:.1f}ms, "
+          f"p99 {percentile(latencies, 99) * 1000:.1f}ms, 처리량 {len(latencies) / wall:.1f} req/s")
+
+    # /metrics 히스토그램의 합계/횟수로 단계별 평균 계산
+    sums = dict(re.findall(r'^decfi_stage_seconds_sum\{stage="(\w+)"\} (\S+)$', exposition, re.MULTILINE))
+    counts = dict(re.findall(r'^decfi_stage_seconds_count\{stage="(\w+)"\} (\S+)$', exposition, re.MULTILINE))
+    print(f"    {'단계':<20} {'횟수':>5} {'평균(ms)':>9}")
+    for name in STAGES:
+        if name in counts and float(counts[name]):
+            print(f"    {name:<20} {int(float(counts[name])):>5} {float(sums[name]) / float(counts[name]) * 1000:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[200, 1000, 5000, 20000, 100000])
+    parser.add_argument('--requests', type=int, default=20, help='카탈로그 크기별 (또는 HTTP) 요청 수')
+    parser.add_argument('--time-limit', type=float, default=10.0)
+    parser.add_argument('--preferences', action='store_true', help='요청마다 자연어 선호 문장 포함')
+    parser.add_argument('--llm-stub', type=float, default=None, metavar='DELAY',
+                        help='로컬 파서가 못 푸는 문장을 DELAY초 뒤 응답하는 스텁 LLM으로 해석')
+    parser.add_argument('--http', action='store_true', help='main.app에 동시 요청 (기본 카탈로그)')
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    server = start_llm_stub(args.llm_stub) if args.llm_stub is not None else None
+    preferences = load_preferences(server is not None) if args.preferences else []
+    if args.preferences:
+        print(f"선호 문장 {len(preferences)}개 ({'스텁 LLM 사용' if server else '로컬 파서로 해석되는 문장만'})")
+
+    if args.http:
+        asyncio.run(run_http(args, preferences))
+    else:
+        run_sizes(args, preferences)
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+카탈로그 크기별 솔버 백엔드 비교 (풀이 시간, 목적함수 값, LP 완화 하한 대비 갭)
+
+    python bench/solver_bench.py
+    python bench/solver_bench.py --sizes 1000 10000 100000 --backends heuristic cbc --time-limit 5 --gap 0.01
+
+실제 음식 데이터를 복제하고 영양소에 잡음을 더한 가상 카탈로그를 만들어, 같은 목표값에 대해
+백엔드마다 풀이한다. 'MILP 대비'는 같은 크기에서 가장 좋은 목적함수 값과의 차이 비율이다.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import FoodCatalog, NUTRIENT_COLUMNS, get_catalog
+from recommend import MealRecommendation
+from solver_backends import HEURISTIC_ONLY_SIZE, SolverSettings, available_backends, solve_meal
+
+PROFILES = [(175, 70, 30, 'male', 3, 'maintain'), (160, 55, 25, 'female', 2, 'loss'),
+            (180, 90, 45, 'male', 1, 'gain'), (150, 45, 60, 'female', 5, 'maintain')]
+
+
+def synthetic_catalog(size: int, seed: int = 0) -> FoodCatalog:
+    # 원본 행을 반복하고 영양소를 ±15% 흔들어 size개 음식을 만듦 (종류/맵기 분포는 원본과 같음)
+    base = get_catalog().food_data
+    rng = np.random.default_rng(seed)
+    rows = base.iloc[np.arange(size) % len(base)].reset_index(drop=True)
+    copy = np.arange(size) // len(base)
+    rows['음식명'] = [name if n == 0 else f"{name}#{n}" for name, n in zip(rows['음식명'], copy)]
+    for column in NUTRIENT_COLUMNS.values():
+        noise = np.where(copy == 0, 1.0, rng.uniform(0.85, 1.15, size))
+        rows[column] = np.round(rows[column].to_numpy(dtype=float) * noise, 1)
+    return FoodCatalog(rows)
+
+
+def profile_targets() -> list:
+    recommender = MealRecommendation()
+    return [recommender.calculate_meal_targets(recommender.calculate_daily_calories(weight, height, age, gender, activity, goal))
+            for height, weight, age, gender, activity, goal in PROFILES]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[200, 1000, 5000, 20000, 100000])
+    parser.add_argument('--backends', nargs='+', default=None, help='기본: 설치된 백엔드 전체')
+    parser.add_argument('--time-limit', type=float, default=10.0)
+    parser.add_argument('--gap', type=float, default=None)
+    parser.add_argument('--max-milp-size', type=int, default=HEURISTIC_ONLY_SIZE, help='이보다 큰 카탈로그는 MILP 생략')
+    args = parser.parse_args()
+
+    backends = args.backends or available_backends()
+    targets = profile_targets()
+    print(f"백엔드: {', '.join(backends)}, 시간 제한 {args.time_limit}s, 갭 {args.gap}")
+    print(f"{'음식 수':>8} {'백엔드':>10} {'웜스타트':>6} {'첫 풀이(s)':>10} {'평균(s)':>8} {'최대(s)':>8} "
+          f"{'목적함수':>9} {'LP 갭':>7} {'최적':>5} {'MILP 대비':>9}")
+    for size in args.sizes:
+        catalog = synthetic_catalog(size)
+        runs = [(backend, warm) for backend in backends for warm in ((False, True) if backend != 'heuristic' else (False,))]
+        rows = []
+        for backend, warm in runs:
+            if backend != 'heuristic' and size > args.max_milp_size:
+                continue
+            resolved = 'heuristic' if backend == 'auto' and size > HEURISTIC_ONLY_SIZE else backend
+            if resolved == 'heuristic' and warm:
+                continue
+            settings = SolverSettings(backend, args.time_limit, args.gap, warm_start=warm)
+            times, objectives, gaps, optimal = [], [], [], 0
+            first = None
+            for t in targets:
+                start = time.perf_counter()
+                result = solve_meal(catalog, t, settings)
+                elapsed = time.perf_counter() - start
+                # 첫 풀이는 모델 생성 시간 포함
+                first = elapsed if first is None else first
+                times.append(elapsed)
+                objectives.append(result['objective'] if result['objective'] is not None else float('nan'))
+                if result['gap'] is not None:
+                    gaps.append(result['gap'])
+                optimal += bool(result['optimal'])
+            rows.append((backend, warm, first, times, objectives, gaps, optimal))
+
+        best = np.nanmin([r[4] for r in rows], axis=0) if rows else None
+        for backend, warm, first, times, objectives, gaps, optimal in rows:
+            loss = np.nanmean((np.array(objectives) - best) / np.maximum(np.abs(np.array(objectives)), 1.0))
+            print(f"{size:>8} {backend:>10} {('예' if warm else '-'):>6} {first:>10.2f} {statistics.mean(times[1:] or times):>8.2f} "
+                  f"{max(times):>8.2f} {np.nanmean(objectives):>9.2f} "
+                  f"{(statistics.mean(gaps) if gaps else float('nan')):>7.2f} {optimal:>3}/{len(times)} {loss:>9.1%}")
+
+
+if __name__ == "__main__":
+    main()
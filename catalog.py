@@ -0,0 +1,116 @@
+import hashlib
+import os
+import threading
+import numpy as np
+import pandas as pd
+from metrics import stage
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'food_data.csv')
+
+# 목표값 키 -> CSV 컬럼명
+NUTRIENT_COLUMNS = {
+    'calories': '칼로리',
+    'protein': '단백질',
+    'fat': '지방',
+    'carbs': '탄수화물',
+    'sodium': '나트륨',
+    'sugar': '당',
+    'fiber': '식이섬유',
+}
+
+# 추천 결과에 포함되는 영양소 키 -> 목표값 키
+ITEM_FIELDS = {
+    'kcal': 'calories',
+    'protein_g': 'protein',
+    'fat_g': 'fat',
+    'carb_g': 'carbs',
+    'sodium_mg': 'sodium',
+    'sugar_g': 'sugar',
+}
+
+MAIN_DISH_CATEGORIES = ('밥류', '면류', '초밥/롤')
+DESSERT_SNACK_CATEGORIES = ('빵/디저트', '튀김/간식')
+
+
+class FoodCatalog:
+    """
+    음식 데이터를 한 번만 읽어 컬럼 단위 배열로 보관하는 읽기 전용 인덱스
+
+    영양소는 연속된 float64 배열로, 종류/맵기는 인덱스 배열로 미리 계산해 두므로
+    모델 생성 시 행 단위 pandas 접근이 필요 없다.
+    """
+
+    def __init__(self, food_data: pd.DataFrame, version: str = None):
+        self.food_data = food_data.reset_index(drop=True)
+        self.size = len(self.food_data)
+
+        self.names = self.food_data['음식명'].astype(str).to_numpy()
+        self.categories = self.food_data['종류'].astype(str).to_numpy()
+        self.spice_levels = self.food_data['맵기'].astype(str).to_numpy()
+
+        self.nutrients = {
+            key: np.ascontiguousarray(self.food_data[column].to_numpy(dtype=np.float64))
+            for key, column in NUTRIENT_COLUMNS.items()
+        }
+
+        self.by_category = self._group(self.categories)
+        self.by_spice = self._group(self.spice_levels)
+        self.name_index = {name: i for i, name in enumerate(self.names)}
+
+        self.version = version or self._hash_frame(self.food_data)
+
+        # 결과 변환용 레코드 (iloc 조회 대신 사용)
+        self._items = [
+            {
+                'name': str(self.names[i]),
+                'category': str(self.categories[i]),
+                **{field: float(self.nutrients[key][i]) for field, key in ITEM_FIELDS.items()},
+            }
+            for i in range(self.size)
+        ]
+
+    @classmethod
+    def from_csv(cls, path: str = DEFAULT_CATALOG_PATH) -> 'FoodCatalog':
+        with stage('catalog_load'):
+            with open(path, 'rb') as f:
+                version = hashlib.sha1(f.read()).hexdigest()[:12]
+            return cls(pd.read_csv(path), version=version)
+
+    @staticmethod
+    def _group(values: np.ndarray) -> dict:
+        return {
+            value: np.flatnonzero(values == value)
+            for value in pd.unique(values)
+        }
+
+    @staticmethod
+    def _hash_frame(food_data: pd.DataFrame) -> str:
+        digest = pd.util.hash_pandas_object(food_data, index=False).to_numpy()
+        return hashlib.sha1(digest.tobytes()).hexdigest()[:12]
+
+    def indices(self, categories) -> np.ndarray:
+        # 여러 종류에 속하는 음식 인덱스 (정렬됨)
+        groups = [self.by_category[c] for c in categories if c in self.by_category]
+        if not groups:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(groups))
+
+    def food_info(self, i: int) -> dict:
+        return dict(self._items[i])
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(path: str = DEFAULT_CATALOG_PATH) -> FoodCatalog:
+    """프로세스 내에서 공유되는 카탈로그 (경로별로 한 번만 로드)"""
+    path = os.path.abspath(path)
+    catalog = _catalogs.get(path)
+    if catalog is None:
+        with _catalogs_lock:
+            catalog = _catalogs.get(path)
+            if catalog is None:
+                catalog = FoodCatalog.from_csv(path)
+                _catalogs[path] = catalog
+    return catalog
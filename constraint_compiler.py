@@ -0,0 +1,202 @@
+import numpy as np
+from catalog import FoodCatalog
+from meal_model import candidates_key
+
+# nlp.FoodGroup -> 카탈로그 종류
+FOOD_GROUP_CATEGORIES = {
+    'soup': '국/찌개/스프',
+    'rice': '밥류',
+    'meat': '육류',
+    'noodle': '면류',
+    'salad': '샐러드',
+    'fruit_veg': '과일/채소',
+    'seafood': '해산물',
+    'side_ferment': '반찬/발효',
+    'bread_dessert': '빵/디저트',
+    'fried_snack': '튀김/간식',
+    'sushi_roll': '초밥/롤',
+    'etc': '기타',
+}
+
+# 맵기: nlp.SpiceLevel과 카탈로그 값(하/중/상)을 같은 순위로 비교
+SPICE_LEVELS = {'low': 0, 'medium': 1, 'high': 2}
+SPICE_RANKS = {'하': 0, '중': 1, '상': 2}
+
+# nlp.Nutrient -> 목표값 키
+NUTRIENT_KEYS = {
+    'calorie': 'calories',
+    'protein': 'protein',
+    'fat': 'fat',
+    'carbon': 'carbs',
+    'sodium': 'sodium',
+    'sugar': 'sugar',
+    'fiber': 'fiber',
+}
+
+SOFT_WEIGHT = 20.0 # soft 선호 1건당 음식별 목적함수 보너스/벌점 (칼로리 편차 20kcal 수준)
+EQUAL_TOLERANCE = 0.2 # hard equal 영양소 제약의 허용 범위 (칼로리 목표와 같은 20%)
+
+
+class CompiledConstraints:
+    """
+    카탈로그 기준으로 컴파일된 사용자 제약 (풀이 풀 워커로 넘길 수 있도록 단순한 값만 보관)
+
+    Attributes:
+        candidates: 모델 변수로 만들 음식 인덱스 (정렬됨, None이면 카탈로그 전체)
+        include: 반드시 포함할 음식 인덱스 (변수를 1로 고정)
+        at_least: 하나 이상 포함해야 하는 음식 종류별 인덱스 배열
+        costs: 음식 인덱스 -> 목적함수 추가 비용 (음수면 선호)
+        bounds: 영양소 범위 제약 이름 (예: 'calories_max') -> 값
+        target_bounds: 목표값 조정 (영양소 키, bound_type, 값) 리스트
+        unknown: 카탈로그에 없어 무시한 음식 이름
+        eaten: 이미 먹은 음식 인덱스 (한 끼 구성 규칙에서 이 음식들을 빼고 나머지만 구성)
+    """
+
+    def __init__(self, candidates=None, include=(), at_least=(), costs=None, bounds=None,
+                 target_bounds=(), unknown=(), eaten=()):
+        self.candidates = candidates
+        self.include = sorted(include)
+        self.at_least = list(at_least)
+        self.costs = dict(sorted((costs or {}).items()))
+        self.bounds = dict(sorted((bounds or {}).items()))
+        self.target_bounds = list(target_bounds)
+        self.unknown = list(unknown)
+        self.eaten = sorted(eaten)
+
+    @property
+    def signature(self) -> tuple:
+        # 캐시 키에 덧붙일 제약 식별자 (같은 제약이면 같은 값)
+        return (
+            'constraints',
+            candidates_key(self.candidates),
+            tuple(self.include),
+            tuple(candidates_key(members) for members in self.at_least),
+            tuple(self.costs.items()),
+            tuple(self.bounds.items()),
+            tuple(self.eaten),
+        )
+
+    def apply_targets(self, targets: dict) -> dict:
+        """목표값을 soft 영양소 제약 쪽으로 옮긴 새 목표값 (hard equal은 목표값 자체를 지정)"""
+        targets = dict(targets)
+        for key, bound_type, value in self.target_bounds:
+            if bound_type == 'lower':
+                targets[key] = min(targets[key], value)
+            elif bound_type == 'greater':
+                targets[key] = max(targets[key], value)
+            else:
+                targets[key] = value
+        return targets
+
+
+def _field(constraint, name: str):
+    # nlp.Constraints와 같은 형식의 dict 모두 허용
+    if isinstance(constraint, dict):
+        return constraint.get(name)
+    return getattr(constraint, name, None)
+
+
+def compile_constraints(constraints: list, catalog: FoodCatalog) -> CompiledConstraints:
+    """
+    nlp.parse_constraints 결과를 모델에 바로 넣을 수 있는 형태로 변환
+
+    - EXCLUDE_ITEM(hard), 맵기(hard): 후보에서 음식을 빼서 변수 자체를 만들지 않음
+    - INCLUDE_ITEM(hard): 변수를 1로 고정, 음식 종류(hard): 해당 종류 최소 1개
+    - soft 선호: 음식별 목적함수 비용 (포함/선호는 보너스, 제외/맵기 차이는 벌점)
+    - NUTRIENT: hard는 기존 영양소 범위 제약의 우변을 좁히고, soft는 목표값을 옮김
+
+    Args:
+        constraints: nlp.Constraints (또는 같은 필드의 dict) 리스트
+        catalog: 음식 카탈로그
+
+    Returns:
+        CompiledConstraints
+    """
+    if not isinstance(constraints, list):
+        raise ValueError(f"제약 조건 형식이 올바르지 않습니다: {constraints!r}")
+
+    keep = np.ones(catalog.size, dtype=bool)
+    spice_ranks = np.array([SPICE_RANKS.get(level, 0) for level in catalog.spice_levels])
+    excluded = set()
+    include = set()
+    at_least = []
+    costs = np.zeros(catalog.size)
+    bounds = {}
+    target_bounds = []
+    unknown = []
+
+    for constraint in constraints:
+        intent = _field(constraint, 'intent')
+        hard = _field(constraint, 'strength') == 'hard'
+
+        if intent in ('INCLUDE_ITEM', 'EXCLUDE_ITEM'):
+            name = _field(constraint, 'food_item')
+            i = catalog.name_index.get(name)
+            if i is None:
+                unknown.append(name)
+                continue
+            if intent == 'EXCLUDE_ITEM':
+                if hard:
+                    excluded.add(i)
+                else:
+                    costs[i] += SOFT_WEIGHT
+            elif hard:
+                include.add(i)
+            else:
+                costs[i] -= SOFT_WEIGHT
+
+        elif intent == 'NUTRIENT':
+            key = NUTRIENT_KEYS.get(_field(constraint, 'nutrient'))
+            bound_type = _field(constraint, 'bound_type')
+            value = _field(constraint, 'bound_value')
+            if key is None or bound_type is None or value is None:
+                continue
+            if not hard:
+                target_bounds.append((key, bound_type, value))
+                continue
+            if bound_type == 'lower':
+                bounds[f'{key}_max'] = min(bounds.get(f'{key}_max', value), value)
+            elif bound_type == 'greater':
+                bounds[f'{key}_min'] = max(bounds.get(f'{key}_min', value), value)
+            else:
+                # 앞서 나온 이하/이상 제약과 겹치는 범위만 (덮어쓰지 않음)
+                target_bounds.append((key, bound_type, value))
+                low, high = value * (1 - EQUAL_TOLERANCE), value * (1 + EQUAL_TOLERANCE)
+                bounds[f'{key}_min'] = max(bounds.get(f'{key}_min', low), low)
+                bounds[f'{key}_max'] = min(bounds.get(f'{key}_max', high), high)
+
+        elif intent == 'PREFERENCE':
+            spice = _field(constraint, 'spice_level')
+            group = _field(constraint, 'food_group')
+            if _field(constraint, 'preference_type') == 'spice_level' and spice in SPICE_LEVELS:
+                level = SPICE_LEVELS[spice]
+                if hard:
+                    # 원하는 것보다 매운 음식 제외 (high는 제한 없음)
+                    keep &= spice_ranks <= level
+                else:
+                    # 원하는 것보다 매울수록 벌점, 원하는 맵기(순한 맛 제외)면 보너스
+                    costs += SOFT_WEIGHT * np.maximum(0, spice_ranks - level)
+                    if level > 0:
+                        costs[spice_ranks == level] -= SOFT_WEIGHT
+            elif group in FOOD_GROUP_CATEGORIES:
+                members = catalog.indices([FOOD_GROUP_CATEGORIES[group]])
+                if hard:
+                    at_least.append(members)
+                else:
+                    costs[members] -= SOFT_WEIGHT
+
+    # 명시적으로 포함한 음식은 맵기 조건보다 우선, 명시적 제외가 가장 우선
+    keep[list(include)] = True
+    keep[list(excluded)] = False
+    include -= excluded
+    candidates = None if keep.all() else np.flatnonzero(keep)
+
+    return CompiledConstraints(
+        candidates=candidates,
+        include=include,
+        at_least=at_least,
+        costs={int(i): float(costs[i]) for i in np.flatnonzero(costs)},
+        bounds=bounds,
+        target_bounds=target_bounds,
+        unknown=unknown,
+    )
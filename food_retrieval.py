@@ -0,0 +1,108 @@
+import re
+from collections import Counter, defaultdict
+
+# 한글 음절 -> 자모 분해용 (초성 19, 중성 21, 종성 28)
+_CHOSEONG = 'ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ'
+_JUNGSEONG = 'ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ'
+_JONGSEONG = ' ㄱㄲㄳㄴㄵㄶㄷㄹㄺㄻㄼㄽㄾㄿㅀㅁㅂㅄㅅㅆㅇㅈㅊㅋㅌㅍㅎ'
+
+NGRAM = 3 # 자모 n-gram 길이
+MIN_SCORE = 0.6 # 음식 이름의 n-gram 중 문장에 들어 있어야 하는 비율
+MAX_CANDIDATES = 12 # 프롬프트에 넣을 최대 음식 수
+
+
+def to_jamo(text: str) -> str:
+    # 한글 음절을 자모로 풀고 공백 제거, 나머지 문자는 소문자로 유지 ("김치 찌게" -> "ㄱㅣㅁㅊㅣㅉㅣㄱㅔ")
+    chars = []
+    for char in re.sub(r'\s+', '', text).lower():
+        code = ord(char) - 0xAC00
+        if 0 <= code < 11172:
+            chars.append(_CHOSEONG[code // 588])
+            chars.append(_JUNGSEONG[code % 588 // 28])
+            if code % 28:
+                chars.append(_JONGSEONG[code % 28])
+        else:
+            chars.append(char)
+    return ''.join(chars)
+
+
+def ngrams(jamo: str, n: int = NGRAM) -> set:
+    # 길이가 n보다 짧으면 문자열 전체를 하나의 n-gram으로 사용
+    if len(jamo) <= n:
+        return {jamo} if jamo else set()
+    return {jamo[i:i + n] for i in range(len(jamo) - n + 1)}
+
+
+def syllable_bigrams(text: str) -> set:
+    # 공백을 뺀 연속 음절 2-gram (한글 외 문자가 섞인 2-gram 제외)
+    text = re.sub(r'\s+', '', text)
+    return {text[i:i + 2] for i in range(len(text) - 1)
+            if all('가' <= char <= '힣' for char in text[i:i + 2])}
+
+
+class FoodRetriever:
+    """
+    자모 n-gram 역색인으로 문장에 언급됐을 법한 음식 이름을 찾는 검색기
+
+    음절이 아니라 자모 단위로 비교하므로 받침/모음 오타("김치찌게")나 띄어쓰기 차이에도
+    이름의 대부분 n-gram이 겹친다. 점수는 음식 이름의 n-gram 중 문장에 들어 있는 비율이다.
+    남는 자리는 문장과 두 음절 이상 겹치는 이름("새우" -> "새우볶음", "새우초밥")으로 채운다.
+    질의 시간은 문장 길이와 겹치는 색인 항목 수에만 비례한다.
+    """
+
+    def __init__(self, names):
+        self.names = list(dict.fromkeys(names))
+        self.name_set = set(self.names)
+        self.grams = [ngrams(to_jamo(name)) for name in self.names]
+        self.index = defaultdict(list) # n-gram -> 음식 번호
+        for i, grams in enumerate(self.grams):
+            for gram in grams:
+                self.index[gram].append(i)
+        self.bigrams = [syllable_bigrams(name) for name in self.names]
+        self.bigram_index = defaultdict(list) # 음절 2-gram -> 음식 번호
+        for i, bigrams in enumerate(self.bigrams):
+            for bigram in bigrams:
+                self.bigram_index[bigram].append(i)
+
+    def search(self, text: str, limit: int = MAX_CANDIDATES, min_score: float = MIN_SCORE,
+               partial: bool = True) -> list:
+        """
+        Args:
+            partial: 남는 자리를 음절 2-gram이 겹치는 이름으로 채울지 (점수는 min_score 미만)
+
+        Returns:
+            list: [(음식 이름, 점수), ...] 점수가 높은 순 (같으면 긴 이름 먼저)
+        """
+        jamo = to_jamo(text)
+        # 짧은 이름은 n-gram이 이름 전체이므로 길이 n 이하의 모든 부분 문자열로 조회
+        query = {jamo[i:i + n] for n in range(1, NGRAM + 1) for i in range(len(jamo) - n + 1)}
+        counts = Counter(i for gram in query for i in self.index.get(gram, ()))
+        scored = [(count / len(self.grams[i]), i) for i, count in counts.items()]
+        scored = [(score, i) for score, i in scored if score >= min_score]
+
+        if partial and len(scored) < limit:
+            chosen = {i for _, i in scored}
+            shared = Counter(i for bigram in syllable_bigrams(text) for i in self.bigram_index.get(bigram, ()))
+            scored += [(min_score * count / (len(self.bigrams[i]) + 1), i)
+                       for i, count in shared.items() if i not in chosen]
+
+        scored.sort(key=lambda item: (-item[0], -len(self.names[item[1]])))
+        return [(self.names[i], round(score, 3)) for score, i in scored[:limit]]
+
+    def candidates(self, text: str, limit: int = MAX_CANDIDATES) -> list:
+        # 프롬프트에 넣을 음식 이름
+        return [name for name, _ in self.search(text, limit)]
+
+    def resolve(self, name: str, min_score: float = 0.7):
+        # LLM이 돌려준 음식 이름을 실제 목록의 이름으로 (가까운 이름이 없으면 None)
+        # 문장 검색과 달리 양쪽 n-gram의 Dice 유사도로 비교 ("김치찌게"가 "김치"가 아닌 "김치찌개"로)
+        if name in self.name_set:
+            return name
+        grams = ngrams(to_jamo(name))
+        best, best_score = None, min_score
+        for candidate, _ in self.search(name, limit=20, min_score=0.5, partial=False):
+            other = ngrams(to_jamo(candidate))
+            score = 2 * len(grams & other) / (len(grams) + len(other))
+            if score >= best_score:
+                best, best_score = candidate, score
+        return best
@@ -0,0 +1,246 @@
+import numpy as np
+from catalog import FoodCatalog, MAIN_DISH_CATEGORIES, DESSERT_SNACK_CATEGORIES
+from meal_model import DEVIATIONS
+
+# 목적함수에 쓰이는 영양소 순서와 가중치 (MealModel과 동일, 첫 번째가 칼로리)
+OBJECTIVE_KEYS = [key for key, _ in DEVIATIONS.values()]
+OBJECTIVE_WEIGHTS = np.array([weight for _, weight in DEVIATIONS.values()])
+
+MIN_ITEMS = 4
+MAX_ITEMS = 8
+LIMITED_GROUPS = (('과일/채소',), ('샐러드',), DESSERT_SNACK_CATEGORIES) # 각각 최대 1개
+
+# 특성 행렬 열 구성: 목적함수 영양소 | 나트륨 | 당 | 개수 | 주식 | 제한 그룹들
+_N_OBJ = len(OBJECTIVE_KEYS)
+_SODIUM, _SUGAR, _COUNT, _MAIN = _N_OBJ, _N_OBJ + 1, _N_OBJ + 2, _N_OBJ + 3
+_GROUPS = slice(_N_OBJ + 4, None)
+
+PENALTY = 1000.0 # 제약 위반 1단위당 벌점 (위반을 먼저 없애도록 크게)
+SHORTLIST_SIZE = 2400 # 사용할 수 있는 음식이 이보다 많으면 종류별 상위 후보로 줄여서 탐색
+SHORTLIST_SHARES = (0.125, 0.25, 0.5) # 후보를 고를 때 기준으로 삼는 목표 대비 음식 한 개의 몫
+
+
+class MealHeuristic:
+    """
+    솔버 없이 NumPy로 한 끼 식단을 만드는 종류별 탐욕 + 지역 탐색 휴리스틱
+
+    주식 1개를 먼저 고른 뒤 구성 규칙과 나트륨/당 상한을 지키는 음식 중 가중 편차를
+    가장 많이 줄이는 음식을 하나씩 추가하고 (최소 개수 전에는 목표를 개수 비율만큼
+    나눠 잡는다), 이어서 추가/제거/교체 이동으로 벌점 포함 목적함수를 개선한다.
+    MILP의 웜 스타트나 빠른 근사해로 쓴다.
+    """
+
+    def __init__(self, catalog: FoodCatalog):
+        self.catalog = catalog
+        n_foods = catalog.size
+
+        main_mask = np.zeros(n_foods)
+        main_mask[catalog.indices(MAIN_DISH_CATEGORIES)] = 1
+        groups = np.zeros((n_foods, len(LIMITED_GROUPS)))
+        for g, categories in enumerate(LIMITED_GROUPS):
+            groups[catalog.indices(categories), g] = 1
+
+        self.features = np.column_stack(
+            [catalog.nutrients[key] for key in OBJECTIVE_KEYS]
+            + [catalog.nutrients['sodium'], catalog.nutrients['sugar'], np.ones(n_foods), main_mask, groups]
+        )
+        self.main_mask = main_mask.astype(bool)
+        self.category_groups = list(catalog.by_category.values())
+
+    def _caps(self, targets: dict, sodium_cap: float, sugar_cap: float):
+        return (targets['sodium'] * 1.2 if sodium_cap is None else sodium_cap,
+                targets['sugar'] * 1.2 if sugar_cap is None else sugar_cap)
+
+    def _score(self, states: np.ndarray, goal: np.ndarray, calories: float, sodium_cap: float, sugar_cap: float):
+        # states: (k, 특성 수) 합계 벡터 -> (목적함수 값, 위반량)
+        objective = np.abs(states[:, :_N_OBJ] - goal) @ OBJECTIVE_WEIGHTS
+        kcal = states[:, 0]
+        violation = (np.maximum(0, calories * 0.8 - kcal) + np.maximum(0, kcal - calories * 1.2)
+                     + np.maximum(0, states[:, _SODIUM] - sodium_cap) / 10
+                     + np.maximum(0, states[:, _SUGAR] - sugar_cap)
+                     + 100 * (np.maximum(0, MIN_ITEMS - states[:, _COUNT]) + np.maximum(0, states[:, _COUNT] - MAX_ITEMS)
+                              + np.abs(states[:, _MAIN] - 1)
+                              + np.maximum(0, states[:, _GROUPS] - 1).sum(axis=1)))
+        return objective, violation
+
+    def objective(self, selected: list, targets: dict) -> float:
+        goal = np.array([targets[key] for key in OBJECTIVE_KEYS])
+        return float(np.abs(self.features[selected, :_N_OBJ].sum(axis=0) - goal) @ OBJECTIVE_WEIGHTS)
+
+    def feasible(self, selected: list, targets: dict, sodium_cap: float = None, sugar_cap: float = None) -> bool:
+        sodium_cap, sugar_cap = self._caps(targets, sodium_cap, sugar_cap)
+        goal = np.array([targets[key] for key in OBJECTIVE_KEYS])
+        state = self.features[selected].sum(axis=0, keepdims=True)
+        _, violation = self._score(state, goal, targets['calories'], sodium_cap, sugar_cap)
+        return bool(violation[0] <= 1e-9)
+
+    def greedy(self, targets: dict, available: np.ndarray = None, sodium_cap: float = None, sugar_cap: float = None,
+               main_dish: int = None, costs: np.ndarray = None) -> list:
+        sodium_cap, sugar_cap = self._caps(targets, sodium_cap, sugar_cap)
+        goal = np.array([targets[key] for key in OBJECTIVE_KEYS])
+        allowed = np.ones(self.catalog.size, dtype=bool) if available is None else available.copy()
+        costs = np.zeros(self.catalog.size) if costs is None else costs
+        features = self.features
+
+        selected = []
+        state = np.zeros(features.shape[1])
+        current = float(np.abs(state[:_N_OBJ] - goal) @ OBJECTIVE_WEIGHTS)
+        if main_dish is not None:
+            # 주식을 지정한 경우 그 음식으로 시작
+            selected.append(main_dish)
+            state += features[main_dish]
+            allowed[main_dish] = False
+        while len(selected) < MAX_ITEMS:
+            candidates = (allowed
+                          & (state[_SODIUM] + features[:, _SODIUM] <= sodium_cap)
+                          & (state[_SUGAR] + features[:, _SUGAR] <= sugar_cap)
+                          & ((state[_GROUPS] + features[:, _GROUPS]) <= 1).all(axis=1))
+            # 첫 번째는 반드시 주식, 이후에는 주식 제외
+            candidates &= self.main_mask if not selected else ~self.main_mask
+            if not candidates.any():
+                break
+
+            index = np.flatnonzero(candidates)
+            # 최소 개수 전에는 (현재 개수 + 1) / 최소 개수 만큼의 목표를 기준으로 평가
+            step_goal = goal * min(1.0, (len(selected) + 1) / MIN_ITEMS)
+            scores = np.abs(state[:_N_OBJ] + features[index, :_N_OBJ] - step_goal) @ OBJECTIVE_WEIGHTS + costs[index]
+            best = int(np.argmin(scores))
+            if len(selected) >= MIN_ITEMS and scores[best] >= current:
+                break
+
+            i = int(index[best])
+            selected.append(i)
+            state += features[i]
+            current = float(scores[best]) - costs[i]
+            allowed[i] = False
+        return selected
+
+    def local_search(self, selected: list, targets: dict, available: np.ndarray = None,
+                     sodium_cap: float = None, sugar_cap: float = None, costs: np.ndarray = None,
+                     max_moves: int = 100) -> list:
+        """추가/제거/교체 중 벌점 포함 목적함수를 가장 많이 줄이는 이동을 더 나아지지 않을 때까지 반복"""
+        sodium_cap, sugar_cap = self._caps(targets, sodium_cap, sugar_cap)
+        goal = np.array([targets[key] for key in OBJECTIVE_KEYS])
+        features = self.features
+        allowed = np.ones(self.catalog.size, dtype=bool) if available is None else available
+        costs = np.zeros(self.catalog.size) if costs is None else costs
+        selected = list(selected)
+
+        def total(states):
+            objective, violation = self._score(states, goal, targets['calories'], sodium_cap, sugar_cap)
+            return objective + PENALTY * violation
+
+        state = features[selected].sum(axis=0) if selected else np.zeros(features.shape[1])
+        cost = costs[selected].sum()
+        current = float(total(state[None])[0]) + cost
+        for _ in range(max_moves):
+            chosen = np.zeros(self.catalog.size, dtype=bool)
+            chosen[selected] = True
+            outside = np.flatnonzero(allowed & ~chosen)
+            inside = np.array(selected, dtype=int)
+
+            moves = [] # (점수 배열, 이동 종류)
+            if outside.size:
+                moves.append((total(state + features[outside]) + cost + costs[outside], 'add'))
+            if inside.size:
+                moves.append((total(state - features[inside]) + cost - costs[inside], 'drop'))
+            if outside.size and inside.size:
+                swaps = state - features[inside][:, None, :] + features[outside][None, :, :]
+                swap_costs = cost - costs[inside][:, None] + costs[outside][None, :]
+                moves.append((total(swaps.reshape(-1, features.shape[1])) + swap_costs.ravel(), 'swap'))
+
+            best_score, best_move, best_at = current, None, None
+            for scores, kind in moves:
+                at = int(np.argmin(scores))
+                if scores[at] < best_score - 1e-9:
+                    best_score, best_move, best_at = float(scores[at]), kind, at
+            if best_move is None:
+                break
+
+            if best_move == 'add':
+                selected.append(int(outside[best_at]))
+            elif best_move == 'drop':
+                selected.remove(int(inside[best_at]))
+            else:
+                j, i = divmod(best_at, outside.size)
+                selected[selected.index(int(inside[j]))] = int(outside[i])
+            state = features[selected].sum(axis=0)
+            cost = costs[selected].sum()
+            current = best_score
+        return selected
+
+    def shortlist(self, targets: dict, available: np.ndarray, costs: np.ndarray = None,
+                  size: int = SHORTLIST_SIZE) -> np.ndarray:
+        """
+        종류별로 목표의 여러 몫(SHORTLIST_SHARES)에 가까운 음식만 남긴 마스크
+
+        모든 종류에서 같은 수만큼 남기므로 주식과 제한 그룹이 빠지지 않고, 몫마다 따로 고르므로
+        작은 반찬부터 큰 주식까지 크기가 고르게 섞인다. 탐색 비용은 카탈로그 크기와 무관하게
+        size에 비례한다.
+        """
+        goal = np.array([targets[key] for key in OBJECTIVE_KEYS])
+        per_pick = max(1, size // (max(1, len(self.category_groups)) * len(SHORTLIST_SHARES)))
+        shortlisted = np.zeros(self.catalog.size, dtype=bool)
+        for members in self.category_groups:
+            members = members[available[members]]
+            if members.size <= per_pick * len(SHORTLIST_SHARES):
+                shortlisted[members] = True
+                continue
+            features = self.features[members, :_N_OBJ]
+            for share in SHORTLIST_SHARES:
+                scores = np.abs(features - goal * share) @ OBJECTIVE_WEIGHTS
+                if costs is not None:
+                    scores = scores + costs[members]
+                shortlisted[members[np.argpartition(scores, per_pick)[:per_pick]]] = True
+        return shortlisted
+
+    def solve(self, targets: dict, available: np.ndarray = None, sodium_cap: float = None, sugar_cap: float = None,
+              starts: int = 16, costs: np.ndarray = None, kicks: int = 0):
+        """
+        Args:
+            targets: 영양소 목표값 (calculate_meal_targets 형식)
+            available: 사용할 수 있는 음식 마스크 (None이면 전체)
+            sodium_cap, sugar_cap: 상한 (기본: MealModel과 같은 목표 120%)
+            starts: 시작 주식 후보 수 (칼로리가 목표의 절반에 가까운 순서로 골라 각각 탐색)
+            costs: 음식별 추가 비용 (목적함수에 더해짐, 선호/다양성 조정용)
+            kicks: 가장 좋은 해에서 주식 외 음식 두 개를 무작위로 빼고 다시 지역 탐색하는 횟수
+                (지역 최적해를 벗어나기 위한 반복 지역 탐색, 시드 고정)
+
+        Returns:
+            list: 선택된 음식 인덱스 (규칙을 만족하는 식단을 못 만들면 None)
+        """
+        if (self.catalog.size if available is None else int(available.sum())) > SHORTLIST_SIZE:
+            available = self.shortlist(targets, np.ones(self.catalog.size, dtype=bool) if available is None else available,
+                                       costs)
+        mains = np.flatnonzero(self.main_mask if available is None else self.main_mask & available)
+        if not mains.size:
+            return None
+        closeness = np.abs(self.features[mains, 0] - targets['calories'] / 2)
+        starts = mains[np.argsort(closeness, kind='stable')[:starts]]
+
+        best, best_objective = None, None
+        for main_dish in starts.tolist():
+            selected = self.greedy(targets, available, sodium_cap, sugar_cap, main_dish, costs)
+            selected = self.local_search(selected, targets, available, sodium_cap, sugar_cap, costs)
+            if not self.feasible(selected, targets, sodium_cap, sugar_cap):
+                continue
+            objective = self.objective(selected, targets) + (costs[selected].sum() if costs is not None else 0)
+            if best is None or objective < best_objective:
+                best, best_objective = selected, objective
+
+        rng = np.random.default_rng(0)
+        for _ in range(kicks if best is not None else 0):
+            sides = [i for i in best if not self.main_mask[i]]
+            if len(sides) < 2:
+                break
+            dropped = set(rng.choice(sides, 2, replace=False).tolist())
+            selected = [i for i in best if i not in dropped]
+            allowed = np.ones(self.catalog.size, dtype=bool) if available is None else available.copy()
+            allowed[list(dropped)] = False
+            selected = self.local_search(selected, targets, allowed, sodium_cap, sugar_cap, costs)
+            if not self.feasible(selected, targets, sodium_cap, sugar_cap):
+                continue
+            objective = self.objective(selected, targets) + (costs[selected].sum() if costs is not None else 0)
+            if objective < best_objective - 1e-9:
+                best, best_objective = selected, objective
+        return best
@@ -0,0 +1,235 @@
+import asyncio
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from metrics import stage
+
+DEFAULT_BASE_URL = "https://clovastudio.stream.ntruss.com/v1/openai"
+DEFAULT_MODEL = "HCX-005"
+
+# 다시 시도해 볼 만한 오류 (연결/시간 초과/요청 한도/서버 오류)
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError)
+
+
+def normalize_text(text: str) -> str:
+    # 캐시 키용 정규화: 유니코드 NFKC, 소문자, 공백 정리, 끝 문장부호 제거
+    text = unicodedata.normalize('NFKC', text).lower()
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text.rstrip('.!?~ ')
+
+
+class DiskStore:
+    """sqlite 파일에 응답을 보관하는 선택적 영구 캐시 (재시작 후에도 유지)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # 클라이언트 이벤트 루프 스레드에서만 사용
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+        return self._conn
+
+    def get(self, key: str):
+        row = self._connect().execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, value: str):
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, value, time.time()))
+        conn.commit()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class LLMClient:
+    """
+    chat-completions 호출을 위한 비동기 클라이언트
+
+    전용 이벤트 루프 스레드 하나에서 연결 풀을 공유하며 동작하므로 동기 코드(complete)와
+    비동기 코드(acomplete) 어디서든 같은 풀과 캐시를 쓴다.
+
+    - 시도마다 timeout 초 제한, 실패 시 지터를 준 지수 백오프로 max_retries번 재시도
+    - (모델, 시스템 프롬프트, 정규화된 사용자 문장)을 키로 메모리 LRU + 선택적 디스크 캐시
+    - 같은 키로 진행 중인 호출이 있으면 새로 호출하지 않고 그 결과를 함께 기다림
+    """
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, api_key: str = None, model: str = DEFAULT_MODEL,
+                 timeout: float = 10.0, max_retries: int = 3, backoff: float = 0.5, max_connections: int = 20,
+                 cache_size: int = 1024, cache_path: str = None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_connections = max_connections
+        self.cache_size = cache_size
+        self.store = DiskStore(cache_path) if cache_path else None
+
+        self._cache = OrderedDict()
+        self._in_flight = {} # 키 -> 진행 중인 호출 Future (루프 스레드에서만 접근)
+        self._client = None
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'hits': 0, 'disk_hits': 0, 'coalesced': 0,
+                       'calls': 0, 'retries': 0, 'errors': 0}
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    thread = threading.Thread(target=loop.run_forever, name='llm-client', daemon=True)
+                    thread.start()
+                    self._thread = thread
+                    self._loop = loop
+        return self._loop
+
+    def _get_client(self) -> AsyncOpenAI:
+        # 재시도는 직접 처리하므로 SDK 재시도는 끔
+        if self._client is None:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                timeout=self.timeout,
+            )
+            self._client = AsyncOpenAI(base_url=self.base_url, api_key=self.api_key or 'none',
+                                       timeout=self.timeout, max_retries=0, http_client=http_client)
+        return self._client
+
+    def cache_key(self, system_prompt: str, user_text: str) -> str:
+        prompt_hash = hashlib.sha1(system_prompt.encode('utf-8')).hexdigest()[:12]
+        return f"{self.model}:{prompt_hash}:{normalize_text(user_text)}"
+
+    def complete(self, system_prompt: str, user_text: str, validate=None) -> str:
+        """
+        동기 호출 (요청 스레드에서 사용)
+
+        Args:
+            system_prompt: 시스템 프롬프트
+            user_text: 사용자 문장
+            validate: 응답 내용을 받아 캐시해도 되는지 돌려주는 함수 (없으면 항상 캐시)
+
+        Returns:
+            str: 응답 메시지 내용
+        """
+        future = asyncio.run_coroutine_threadsafe(self._complete(system_prompt, user_text, validate), self._get_loop())
+        return future.result()
+
+    async def acomplete(self, system_prompt: str, user_text: str, validate=None) -> str:
+        # 비동기 호출 (어느 이벤트 루프에서든 사용 가능)
+        future = asyncio.run_coroutine_threadsafe(self._complete(system_prompt, user_text, validate), self._get_loop())
+        return await asyncio.wrap_future(future)
+
+    async def _complete(self, system_prompt: str, user_text: str, validate) -> str:
+        key = self.cache_key(system_prompt, user_text)
+        self._stats['requests'] += 1
+
+        content = self._cache.get(key)
+        if content is not None:
+            self._cache.move_to_end(key)
+            self._stats['hits'] += 1
+            return content
+        if self.store is not None:
+            content = self.store.get(key)
+            if content is not None:
+                self._stats['disk_hits'] += 1
+                self._remember(key, content)
+                return content
+
+        # 같은 문장에 대한 호출이 이미 진행 중이면 그 결과를 공유
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self._stats['coalesced'] += 1
+            return await asyncio.shield(pending)
+
+        pending = self._in_flight[key] = asyncio.ensure_future(self._call(system_prompt, user_text))
+        try:
+            content = await asyncio.shield(pending)
+        finally:
+            del self._in_flight[key]
+        if validate is None or validate(content):
+            self._remember(key, content)
+            if self.store is not None:
+                self.store.put(key, content)
+        return content
+
+    def _remember(self, key: str, content: str):
+        self._cache[key] = content
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _call(self, system_prompt: str, user_text: str) -> str:
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._stats['calls'] += 1
+                with stage('llm_call'):
+                    response = await self._get_client().chat.completions.create(
+                        model=self.model,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": user_text},
+                        ],
+                        temperature=0.0,
+                    )
+                return response.choices[0].message.content
+            except RETRYABLE_ERRORS:
+                if attempt == self.max_retries:
+                    self._stats['errors'] += 1
+                    raise
+                # 지수 백오프 + 전체 지터 (동시에 실패한 요청들이 한꺼번에 재시도하지 않도록)
+                self._stats['retries'] += 1
+                await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+            except Exception:
+                self._stats['errors'] += 1
+                raise
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        stats['hit_rate'] = (stats['hits'] + stats['disk_hits'] + stats['coalesced']) / stats['requests'] \
+            if stats['requests'] else 0.0
+        stats['cache_size'] = len(self._cache)
+        return stats
+
+    def close(self):
+        if self._loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.close(), self._loop).result()
+            self._client = None
+        if self.store is not None:
+            # sqlite 연결은 루프 스레드에서 만들었으므로 같은 스레드에서 닫음
+            self._loop.call_soon_threadsafe(self.store.close)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+
+
+def client_from_env() -> LLMClient:
+    # LLM_CACHE_PATH를 지정하면 디스크 캐시도 사용
+    return LLMClient(
+        base_url=os.getenv('LLM_BASE_URL', DEFAULT_BASE_URL),
+        api_key=os.getenv('API_KEY'),
+        model=os.getenv('LLM_MODEL', DEFAULT_MODEL),
+        timeout=float(os.getenv('LLM_TIMEOUT', 10)),
+        max_retries=int(os.getenv('LLM_MAX_RETRIES', 3)),
+        max_connections=int(os.getenv('LLM_MAX_CONNECTIONS', 20)),
+        cache_size=int(os.getenv('LLM_CACHE_SIZE', 1024)),
+        cache_path=os.getenv('LLM_CACHE_PATH') or None,
+    )
@@ -1,14 +1,35 @@
-from fastapi import FastAPI
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 import uvicorn
+import metrics
+import recognition
 import recommend
 
 app = FastAPI()
+app.state.meal_recommender = recommend.meal_recommender # /recognize의 추천도 같은 추천기 사용
+
+@app.middleware("http")
+async def observe_request_time(request: Request, call_next):
+    # 경로 템플릿(/recommend/meal 등)별 처리 시간 (없는 경로는 하나로 묶어 라벨 수가 늘지 않도록)
+    started_at = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get('route')
+    metrics.registry.observe('http_request_seconds', time.perf_counter() - started_at,
+                             path=getattr(route, 'path', 'unmatched'), method=request.method)
+    return response
 
 @app.get("/")
 def root():
     return "Hello World"
 
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 app.include_router(recommend.router, prefix="/recommend")
+app.include_router(recognition.router, prefix="/recognize")
 
 if __name__ == '__main__':
-    uvicorn.run("main:app", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("main:app", port=8000, reload=True)
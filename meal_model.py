@@ -0,0 +1,371 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+from pulp import LpProblem, LpMinimize, LpVariable, LpAffineExpression, LpConstraint, lpSum, value, PULP_CBC_CMD
+from pulp.constants import LpConstraintEQ, LpConstraintGE, LpConstraintLE, LpSolutionOptimal, LpSolutionIntegerFeasible
+from catalog import FoodCatalog, NUTRIENT_COLUMNS, MAIN_DISH_CATEGORIES, DESSERT_SNACK_CATEGORIES
+from metrics import observe_stage, stage
+
+# 편차 변수 이름 접두사 -> (목표값 키, 목적함수 가중치)
+DEVIATIONS = {
+    'cal': ('calories', 1.0),
+    'protein': ('protein', 1.5),
+    'carb': ('carbs', 0.5),
+    'fat': ('fat', 0.5),
+}
+
+
+LIMIT_RATIO = 1.2 # 나트륨/당분 상한 = 목표 x 1.2
+MIN_ITEMS, MAX_ITEMS = 4, 8 # 한 끼 음식 수
+LIMITED_GROUPS = (('과일/채소',), ('샐러드',), DESSERT_SNACK_CATEGORIES) # 한 끼에 각각 최대 1개
+
+
+def target_rhs(targets: dict) -> dict:
+    # 요청마다 바뀌는 제약의 우변값 (제약 이름 -> 값)
+    rhs = {f'{name}_dev': targets[key] for name, (key, _) in DEVIATIONS.items()}
+    rhs['calories_min'] = targets['calories'] * 0.8 # 칼로리 목표 20% 내외
+    rhs['calories_max'] = targets['calories'] * 1.2
+    rhs['sodium_max'] = targets['sodium'] * LIMIT_RATIO # 나트륨/당분 목표 120% 이하
+    rhs['sugar_max'] = targets['sugar'] * LIMIT_RATIO
+    return rhs
+
+
+def candidates_key(candidates) -> str:
+    # 후보 음식 인덱스 집합의 식별자 (None이면 카탈로그 전체)
+    if candidates is None:
+        return 'all'
+    return hashlib.sha1(np.asarray(candidates, dtype=np.int64).tobytes()).hexdigest()[:12]
+
+
+class TimedProblem(LpProblem):
+    # 솔버가 호출하는 MPS 파일 쓰기 시간을 따로 기록 (마지막 쓰기 시간은 write_time)
+    write_time = 0.0
+
+    def writeMPS(self, *args, **kwargs):
+        started_at = time.perf_counter()
+        try:
+            return super().writeMPS(*args, **kwargs)
+        finally:
+            self.write_time = time.perf_counter() - started_at
+            observe_stage('lp_write', self.write_time)
+
+
+class MealModel:
+    """
+    목표값만 교체해 반복 풀이하는 한 끼 식사 MILP (스레드 하나가 독점 사용)
+
+    candidates를 주면 그 음식들만 변수로 만든다 (제외/맵기 조건으로 걸러낸 후보).
+    선택 결과는 항상 카탈로그 인덱스로 돌려준다.
+    """
+
+    def __init__(self, catalog: FoodCatalog, candidates: np.ndarray = None):
+        self.catalog = catalog
+        self.candidates = np.arange(catalog.size) if candidates is None else np.asarray(candidates, dtype=int)
+        # 카탈로그 인덱스 -> 변수 위치 (후보가 아니면 -1)
+        self.position = np.full(catalog.size, -1)
+        self.position[self.candidates] = np.arange(self.candidates.size)
+        self.food_vars = [LpVariable(f"food_{i}", cat='Binary') for i in self.candidates]
+        self.objective = None # 마지막 풀이의 목적함수 값
+        self.prob = TimedProblem("meal_recommendation", LpMinimize)
+
+        # 편차 변수와 목적 함수: 가중치 적용 편차 최소화
+        objective = []
+        deviations = {}
+        for name, (_, weight) in DEVIATIONS.items():
+            pos = LpVariable(f"{name}_pos", lowBound=0)
+            neg = LpVariable(f"{name}_neg", lowBound=0)
+            deviations[name] = (pos, neg)
+            objective += [(pos, weight), (neg, weight)]
+        self.deviations = deviations
+        self.prob += LpAffineExpression(objective)
+
+        sums = {key: self._weighted_sum(key) for key in NUTRIENT_COLUMNS}
+        self.sums = sums # 사용자 영양소 범위 제약을 요청마다 추가할 때 사용
+
+        # 영양소 편차: sum - pos + neg == target
+        for name, (key, _) in DEVIATIONS.items():
+            pos, neg = deviations[name]
+            expr = sums[key].copy()
+            expr.addInPlace(pos, -1)
+            expr.addInPlace(neg)
+            self._add(expr, LpConstraintEQ, f'{name}_dev')
+
+        # 칼로리 범위 (목표 20% 내외), 나트륨/당분 상한 (목표 120% 이하), 우변은 요청마다 교체
+        # 다른 영양소 범위는 사용자 제약이 있을 때만 _applied에서 추가
+        self._add(sums['calories'], LpConstraintGE, 'calories_min')
+        self._add(sums['calories'], LpConstraintLE, 'calories_max')
+        self._add(sums['sodium'], LpConstraintLE, 'sodium_max')
+        self._add(sums['sugar'], LpConstraintLE, 'sugar_max')
+
+        # 끼니 구성 (우변은 이미 먹은 음식이 있을 때 _applied에서 줄임)
+        self.composition = {}
+        # 총 음식 개수 제한 (4-8개)
+        self._add_composition(self.food_vars, LpConstraintGE, 'items_min', MIN_ITEMS)
+        self._add_composition(self.food_vars, LpConstraintLE, 'items_max', MAX_ITEMS)
+
+        # 주식(밥류, 면류, 초밥/롤) 정확히 1개
+        main_dishes = self._vars(catalog.indices(MAIN_DISH_CATEGORIES))
+        if main_dishes:
+            self._add_composition(main_dishes, LpConstraintEQ, 'main_dish', 1)
+
+        # 과일/채소, 샐러드, 디저트/간식 각각 최대 1개
+        for n, group in enumerate(LIMITED_GROUPS):
+            members = self._vars(catalog.indices(group))
+            if members:
+                self._add_composition(members, LpConstraintLE, f'group_max_{n}', 1)
+
+    def _vars(self, indices: np.ndarray) -> list:
+        # 카탈로그 인덱스 중 후보에 있는 음식의 변수
+        positions = self.position[indices]
+        return [self.food_vars[p] for p in positions[positions >= 0]]
+
+    def _weighted_sum(self, key: str) -> LpAffineExpression:
+        # 영양소 배열로 선형식을 한 번에 생성 (계수 0인 항 제외)
+        coefs = self.catalog.nutrients[key][self.candidates]
+        nonzero = np.flatnonzero(coefs)
+        return LpAffineExpression(zip([self.food_vars[i] for i in nonzero], coefs[nonzero].tolist()))
+
+    def _add(self, expr: LpAffineExpression, sense: int, name: str):
+        self.prob.addConstraint(LpConstraint(expr.copy(), sense, name, rhs=0), name)
+
+    def _add_composition(self, food_vars: list, sense: int, name: str, rhs: int):
+        self.prob.addConstraint(LpConstraint(lpSum(food_vars), sense, name, rhs=rhs), name)
+        self.composition[name] = rhs
+
+    def _remaining_composition(self, eaten: np.ndarray) -> dict:
+        # 이미 먹은 음식을 뺀 나머지 끼니의 구성 제약 우변 (예: 주식을 먹었으면 주식 0개)
+        def count(categories):
+            return int(np.isin(eaten, self.catalog.indices(categories)).sum())
+        rhs = {'items_min': max(0, MIN_ITEMS - eaten.size), 'items_max': max(0, MAX_ITEMS - eaten.size),
+               'main_dish': max(0, 1 - count(MAIN_DISH_CATEGORIES))}
+        for n, group in enumerate(LIMITED_GROUPS):
+            rhs[f'group_max_{n}'] = max(0, 1 - count(group))
+        return {name: value for name, value in rhs.items() if name in self.composition}
+
+    def set_targets(self, targets: dict, bounds: dict = None):
+        """
+        Args:
+            targets: 영양소 목표값
+            bounds: 사용자 영양소 범위 (예: {'calories_max': 700}), 기본 범위 제약이 있는 것은 더 좁힐 때만 반영
+                    (기본 범위 제약이 없는 것은 _applied에서 행으로 추가)
+        """
+        rhs = target_rhs(targets)
+        for name, value in (bounds or {}).items():
+            if name in rhs:
+                rhs[name] = max(rhs[name], value) if name.endswith('_min') else min(rhs[name], value)
+        for name, value in rhs.items():
+            self.prob.constraints[name].changeRHS(value)
+
+    @contextmanager
+    def _applied(self, constraints):
+        # 요청별 사용자 제약(후보, 포함 고정, 종류별 최소 1개, 영양소 범위, 선호 비용, 먹은 음식)을 잠시 반영했다가 되돌림
+        if constraints is None:
+            yield
+            return
+
+        fixed = self._vars(np.asarray(constraints.include, dtype=int))
+        for var in fixed:
+            var.lowBound = 1
+        # 모델이 후보보다 넓으면 (계획 풀이처럼 한 모델에 후보만 바꿔 가며 푸는 경우) 후보가 아닌 음식은 0으로 고정
+        removed = []
+        if constraints.candidates is not None and len(constraints.candidates) < self.candidates.size:
+            keep = np.zeros(self.catalog.size, dtype=bool)
+            keep[constraints.candidates] = True
+            removed = self._vars(np.flatnonzero(~keep))
+        for var in removed:
+            var.upBound = 0
+        composition = self._remaining_composition(np.asarray(constraints.eaten, dtype=int)) if constraints.eaten else {}
+        for name, value in composition.items():
+            self.prob.constraints[name].changeRHS(value)
+        rows = []
+        for n, members in enumerate(constraints.at_least):
+            name = f'at_least_{n}'
+            self.prob.addConstraint(LpConstraint(lpSum(self._vars(members)), LpConstraintGE, name, rhs=1), name)
+            rows.append(name)
+        for name, value in constraints.bounds.items():
+            if name in self.prob.constraints:
+                continue # 기본 범위 제약은 set_targets에서 우변만 좁힘
+            key, side = name.rsplit('_', 1)
+            sense = LpConstraintGE if side == 'min' else LpConstraintLE
+            self.prob.addConstraint(LpConstraint(self.sums[key].copy(), sense, name, rhs=value), name)
+            rows.append(name)
+        base = self.prob.objective
+        if constraints.costs:
+            positions = self.position[list(constraints.costs)]
+            extra = LpAffineExpression([(self.food_vars[p], cost)
+                                        for p, cost in zip(positions, constraints.costs.values()) if p >= 0])
+            self.prob.setObjective(base + extra)
+        try:
+            yield
+        finally:
+            for var in fixed:
+                var.lowBound = 0
+            for var in removed:
+                var.upBound = 1
+            for name in composition:
+                self.prob.constraints[name].changeRHS(self.composition[name])
+            for name in rows:
+                del self.prob.constraints[name]
+            self.prob.setObjective(base)
+
+    def _solve(self, targets: dict, solver, bounds: dict = None):
+        self.set_targets(targets, bounds)
+        started_at = time.perf_counter()
+        self.prob.write_time = 0.0
+        self.prob.solve(solver)
+        observe_stage('solver_run', time.perf_counter() - started_at - self.prob.write_time)
+        # 시간 제한에 걸린 경우에도 찾은 정수해(incumbent)가 있으면 사용
+        if self.prob.sol_status not in (LpSolutionOptimal, LpSolutionIntegerFeasible):
+            self.objective = None
+            return self.prob.status, None
+        # 선호 비용을 포함한 목적함수 값 (_applied를 벗어나기 전에 기록)
+        self.objective = value(self.prob.objective)
+        selected = [int(i) for i, var in zip(self.candidates, self.food_vars)
+                    if var.varValue is not None and round(var.varValue) == 1]
+        return self.prob.status, selected
+
+    def warm_start(self, selected: list, targets: dict) -> bool:
+        """
+        선택된 음식(카탈로그 인덱스)을 변수 초기값으로 설정 (solver의 warmStart와 함께 사용)
+
+        편차 변수도 이 식단에 맞는 값으로 설정해 이전 풀이의 값이 초기해에 섞이지 않게 한다.
+
+        Returns:
+            bool: 모든 음식이 후보에 있어 초기값을 설정했는지 여부
+        """
+        positions = self.position[np.asarray(selected, dtype=int)]
+        if (positions < 0).any():
+            return False
+        chosen = np.zeros(self.candidates.size, dtype=bool)
+        chosen[positions] = True
+        for var, on in zip(self.food_vars, chosen.tolist()):
+            var.setInitialValue(1 if on else 0)
+        for name, (key, _) in DEVIATIONS.items():
+            diff = float(self.catalog.nutrients[key][selected].sum()) - targets[key]
+            pos, neg = self.deviations[name]
+            pos.setInitialValue(max(0.0, diff))
+            neg.setInitialValue(max(0.0, -diff))
+        return True
+
+    def relaxation_bound(self, targets: dict, constraints=None, solver=None):
+        """
+        정수 조건을 푼 LP 완화 문제의 최적값 (정수해 목적함수 값의 하한, 풀지 못하면 None)
+
+        solver는 mip=False로 만든 것을 넘긴다. 변수 값과 풀이 상태를 덮어쓰므로
+        정수 풀이 결과를 읽은 뒤에 호출한다.
+        """
+        with self._applied(constraints), stage('lp_bound'):
+            self.set_targets(targets, constraints.bounds if constraints else None)
+            self.prob.solve(solver or PULP_CBC_CMD(mip=False, msg=0))
+            if self.prob.sol_status != LpSolutionOptimal:
+                return None
+            return value(self.prob.objective)
+
+    def solve(self, targets: dict, solver=None, constraints=None):
+        """
+        목표값을 반영해 풀이
+
+        Args:
+            constraints: constraint_compiler.compile_constraints 결과 (없으면 기본 추천)
+
+        Returns:
+            (status, 선택된 음식 인덱스 리스트)
+        """
+        with self._applied(constraints):
+            return self._solve(targets, solver or PULP_CBC_CMD(msg=0), constraints.bounds if constraints else None)
+
+    def solve_top_k(self, targets: dict, k: int, solver=None, constraints=None):
+        """
+        서로 다른 상위 k개 식단을 같은 모델에서 차례로 풀이
+
+        매 풀이 뒤 방금 찾은 식단만 정확히 배제하는 제약(no-good cut)을 추가해 다시 풀고,
+        끝나면 추가한 제약을 모두 제거해 템플릿을 원래 상태로 되돌린다.
+
+        Returns:
+            (첫 풀이의 status, [(선택된 음식 인덱스 리스트, 목적함수 값), ...], 모두 최적인지 여부)
+        """
+        solver = solver or PULP_CBC_CMD(msg=0)
+        bounds = constraints.bounds if constraints else None
+        status = None
+        alternatives = []
+        optimal = True
+        cuts = []
+        with self._applied(constraints):
+            try:
+                for rank in range(k):
+                    rank_status, selected = self._solve(targets, solver, bounds)
+                    if status is None:
+                        status = rank_status
+                    if selected is None:
+                        break
+                    alternatives.append((selected, self.objective))
+                    optimal = optimal and self.optimal
+                    if rank == k - 1:
+                        break
+
+                    # sum(선택된 x) - sum(나머지 x) <= |S| - 1
+                    chosen = set(selected)
+                    cut = LpAffineExpression([(var, 1 if i in chosen else -1)
+                                              for i, var in zip(self.candidates, self.food_vars)])
+                    name = f'exclude_{rank}'
+                    self.prob.addConstraint(LpConstraint(cut, LpConstraintLE, name, rhs=len(chosen) - 1), name)
+                    cuts.append(name)
+            finally:
+                for name in cuts:
+                    del self.prob.constraints[name]
+        return status, alternatives, optimal
+
+    @property
+    def optimal(self) -> bool:
+        # 마지막 풀이가 최적성을 증명했는지 (시간 제한 시 False)
+        return self.prob.sol_status == LpSolutionOptimal
+
+
+class MealModelTemplate:
+    """
+    카탈로그 버전(과 후보 음식 집합)별로 한 번 컴파일되는 모델 템플릿
+
+    LpProblem은 풀이 중 변수 값을 기록하므로 스레드마다 자신의 인스턴스를 한 번 만들어
+    재사용한다. 요청마다 바뀌는 것은 목표값에서 나온 우변값뿐이다.
+    """
+
+    def __init__(self, catalog: FoodCatalog, candidates: np.ndarray = None):
+        self.catalog = catalog
+        self.version = catalog.version
+        self.candidates = candidates
+        self._local = threading.local()
+
+    def instance(self) -> MealModel:
+        model = getattr(self._local, 'model', None)
+        if model is None:
+            with stage('model_build'):
+                model = MealModel(self.catalog, self.candidates)
+            self._local.model = model
+        return model
+
+    def solve(self, targets: dict, solver=None, constraints=None):
+        return self.instance().solve(targets, solver, constraints)
+
+    def solve_top_k(self, targets: dict, k: int, solver=None, constraints=None):
+        return self.instance().solve_top_k(targets, k, solver, constraints)
+
+
+MAX_TEMPLATES = 64 # 후보 집합별 템플릿 보관 수 (오래 안 쓴 것부터 제거)
+
+_templates = OrderedDict()
+_templates_lock = threading.Lock()
+
+
+def get_template(catalog: FoodCatalog, candidates: np.ndarray = None) -> MealModelTemplate:
+    key = (catalog.version, candidates_key(candidates))
+    with _templates_lock:
+        template = _templates.get(key)
+        if template is None:
+            template = _templates[key] = MealModelTemplate(catalog, candidates)
+        _templates.move_to_end(key)
+        while len(_templates) > MAX_TEMPLATES:
+            _templates.popitem(last=False)
+    return template
@@ -0,0 +1,188 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8" # Prometheus 텍스트 형식
+PREFIX = "decfi"
+
+# 단계별 소요 시간 히스토그램 구간 (초)
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+NODE_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+# 단계 이름 -> 설명
+STAGES = {
+    'catalog_load': 'CSV 읽기와 카탈로그 배열 생성',
+    'targets': '목표 영양소 계산',
+    'constraint_parse': '자연어 요청 해석 (로컬 파서 + LLM)',
+    'llm_call': 'LLM API 호출 1회',
+    'constraint_compile': '제약 컴파일',
+    'model_build': 'MILP 모델 생성',
+    'heuristic': '휴리스틱 풀이',
+    'lp_write': 'MPS 파일 쓰기',
+    'solver_run': '솔버 실행과 해 읽기',
+    'lp_bound': 'LP 완화 하한 계산',
+    'result_build': '선택 결과를 응답 항목으로 변환',
+    'queue_wait': '풀이 풀 대기열에서 기다린 시간',
+    'image_decode': '음식 사진 디코딩과 크기 조정',
+    'recognition_inference': '음식 인식 모델 배치 추론 1회',
+}
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    프로세스 안에서 공유하는 카운터/히스토그램 저장소 (Prometheus 텍스트 형식으로 출력)
+
+    다른 모듈의 stats() 값은 collector 함수로 등록해 출력 시점에 읽는다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {} # 이름 -> (type, help, buckets)
+        self._counters = defaultdict(float) # (이름, 라벨) -> 값
+        self._histograms = {} # (이름, 라벨) -> Histogram
+        self._collectors = []
+
+    def counter(self, name: str, help: str):
+        self._meta[name] = ('counter', help, None)
+
+    def histogram(self, name: str, help: str, buckets: tuple = STAGE_BUCKETS):
+        self._meta[name] = ('histogram', help, buckets)
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        with self._lock:
+            self._counters[name, _labels(labels)] += value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self._meta[name][2])
+            histogram.observe(value)
+
+    def add_collector(self, collector):
+        """collector(): [(이름, 'gauge'|'counter', 설명, [(라벨 dict, 값), ...]), ...] 를 돌려주는 함수"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, (kind, help, _) in self._meta.items():
+                full = f"{PREFIX}_{name}"
+                lines += [f"# HELP {full} {help}", f"# TYPE {full} {kind}"]
+                if kind == 'counter':
+                    for (metric, labels), value in sorted(self._counters.items()):
+                        if metric == name:
+                            lines.append(f"{full}{_format(labels)} {_number(value)}")
+                    continue
+                for (metric, labels), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f"{full}_bucket{_format(labels + (('le', _number(bound)),))} {count}")
+                    lines.append(f"{full}_bucket{_format(labels + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{full}_sum{_format(labels)} {_number(histogram.sum)}")
+                    lines.append(f"{full}_count{_format(labels)} {histogram.count}")
+
+        for collector in self._collectors:
+            for name, kind, help, samples in collector():
+                full = f"{PREFIX}_{name}"
+                lines += [f"# HELP {full} {help}", f"# TYPE {full} {kind}"]
+                for labels, value in samples:
+                    if value is not None:
+                        lines.append(f"{full}{_format(_labels(labels))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+registry = MetricsRegistry()
+registry.histogram('stage_seconds', '요청 처리 단계별 소요 시간 (초)')
+registry.histogram('http_request_seconds', 'HTTP 요청 처리 시간 (초, 스트리밍은 응답 시작까지)')
+registry.counter('solves_total', '백엔드/결과별 한 끼 풀이 수')
+registry.histogram('solver_nodes', 'CBC 분기 한정 노드 수', NODE_BUCKETS)
+registry.histogram('solve_seconds', '한 끼 풀이 시간 (초, 대기 시간 제외)')
+
+_local = threading.local()
+
+
+def observe_stage(name: str, seconds: float):
+    registry.observe('stage_seconds', seconds, stage=name)
+    timings = getattr(_local, 'timings', None)
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str):
+    # with stage('model_build'): ... 처럼 감싼 구간의 시간을 기록
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started_at)
+
+
+@contextmanager
+def collect():
+    """
+    이 스레드에서 기록되는 단계별 시간을 dict로도 모음 (풀이 풀 워커의 시간을 부모 프로세스로 넘길 때 사용)
+
+    with collect() as timings: ... 이후 timings는 {단계 이름: 초}
+    """
+    previous = getattr(_local, 'timings', None)
+    timings = _local.timings = {}
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+def record_timings(timings: dict):
+    # 다른 프로세스에서 collect()로 모은 단계별 시간 반영
+    for name, seconds in timings.items():
+        registry.observe('stage_seconds', seconds, stage=name)
+
+
+def record_solve(result: dict, solve_time: float = None):
+    # solver_backends.solve_meal 결과 한 건의 백엔드/상태/노드 수
+    outcome = 'optimal' if result['optimal'] else ('feasible' if result.get('selected') or result.get('alternatives')
+                                                   else 'failed')
+    registry.inc('solves_total', backend=result.get('backend') or 'none', outcome=outcome)
+    if result.get('nodes') is not None:
+        registry.observe('solver_nodes', result['nodes'])
+    if solve_time is not None:
+        registry.observe('solve_seconds', solve_time, backend=result.get('backend') or 'none')
+
+
+def render() -> str:
+    return registry.render()
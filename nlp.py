@@ -1,16 +1,23 @@
-from openai import OpenAI
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import Optional, Literal, List
 import json
 import re
 from dotenv import load_dotenv
-import os
+
+from catalog import get_catalog
+from llm_client import LLMClient, client_from_env
+from food_retrieval import FoodRetriever
+from metrics import registry
 
 load_dotenv()
-client = OpenAI(
-    api_key=os.getenv("API_KEY"),
-    base_url="https://clovastudio.stream.ntruss.com/v1/openai"
-)
+_client = None
+
+def get_client() -> LLMClient:
+    # 연결 풀/캐시를 공유하는 LLM 클라이언트 (처음 호출할 때 생성)
+    global _client
+    if _client is None:
+        _client = client_from_env()
+    return _client
 
 Intent = Literal[
     "INCLUDE_ITEM", # 1. 특정 음식 포함
@@ -21,7 +28,9 @@ Intent = Literal[
 
 Strength = Literal["soft", "hard"] # 선호 / 강제
 
-FoodItem = Literal["김치찌개", "된장찌개", "비빔밥", "불고기", "삼겹살", "갈비탕", "설렁탕", "냉면", "칼국수", "떡볶이", "순대국", "제육볶음", "잡채", "김밥", "참치김밥", "라면", "짜장면", "짬뽕", "볶음밥", "김치볶음밥", "피자", "햄버거", "치킨", "후라이드치킨", "양념치킨", "돈까스", "카레라이스", "오므라이스", "스파게티", "토마토파스타", "크림파스타", "스테이크", "샐러드", "시저샐러드", "그릭요거트", "과일샐러드", "바나나", "사과", "배", "딸기", "포도", "수박", "멜론", "망고", "파인애플", "오렌지", "레몬", "자몽", "블루베리", "체리", "복숭아", "참외", "토마토", "가지", "오이", "양배추", "브로콜리", "시금치", "감자", "고구마", "옥수수", "콩밥", "현미밥", "흰쌀밥", "잡곡밥", "죽", "미역국", "콩나물국", "계란찜", "계란후라이", "계란말이", "메추리알조림", "두부조림", "연두부", "순두부찌개", "고등어구이", "삼치구이", "갈치조림", "오징어볶음", "낙지볶음", "새우볶음", "조개탕", "홍합탕", "전복죽", "게장", "젓갈", "김치", "깍두기", "총각김치", "열무김치", "파김치", "백김치", "깻잎장아찌", "마늘장아찌", "고추장아찌", "청국장", "감자탕", "해장국", "추어탕", "육개장", "우동", "쌀국수", "포케", "타코", "부리토", "핫도그", "샌드위치", "크로와상", "베이글", "식빵", "호밀빵", "치즈케이크", "티라미수", "초콜릿케이크", "도넛", "머핀", "크루아상샌드위치", "바게트", "프렌치토스트", "팬케이크", "와플", "쿠키", "프렌치프라이", "어니언링", "치즈스틱", "모짜렐라피자", "페퍼로니피자", "마르게리타피자", "고르곤졸라피자", "씨푸드피자", "연어스테이크", "연어샐러드", "훈제연어", "베이컨", "소시지", "햄", "프라이드포테이토", "스프링롤", "춘권", "군만두", "찐만두", "물만두", "김치만두", "고기만두", "야채만두", "샤브샤브", "훠궈", "퐁듀", "라자냐", "리조또", "샤클슈카", "팔라펠", "후무스", "케밥", "샤와르마", "쿠스쿠스", "카프레제샐러드", "리코타샐러드", "양상추샐러드", "감자샐러드", "단호박죽", "팥죽", "녹두죽", "호박죽", "닭죽", "삼계탕", "닭칼국수", "닭볶음탕", "닭강정", "치킨커틀릿", "연어초밥", "광어초밥", "참치초밥", "새우초밥", "계란초밥", "장어덮밥", "카츠동", "규동", "텐동", "가츠동", "소고기덮밥", "치킨마요덮밥", "연어마요덮밥", "스시롤", "우나기롤", "드래곤롤", "캘리포니아롤", "참치롤", "새우롤", "연어롤", "초밥세트", "스시세트", "돈코츠라멘", "미소라멘", "시오라멘", "스파이시라멘", "파스타샐러드", "크루통샐러드", "토마토스프", "양송이스프"]
+def food_names() -> list:
+    # food_item 선택지 = 카탈로그의 음식 이름 (카탈로그에 음식을 추가하면 함께 늘어남)
+    return [str(name) for name in get_catalog().names]
 
 Nutrient = Literal["calorie", "protein", "fat", "carbon", "sodium", "sugar", "fiber"]
 # 칼로리, 단백질, 지방, 탄수화물, 나트륨, 당, 식이섬유
@@ -39,7 +48,7 @@ FoodGroup = Literal["soup", "rice", "meat", "noodle", "salad", "fruit_veg", "sea
 class Constraints(BaseModel):
     intent: Intent # 제약 종류
     strength: Strength = "soft" # 제약 강도
-    food_item: Optional[FoodItem] = None # (1, 2) 음식 이름
+    food_item: Optional[str] = None # (1, 2) 음식 이름 (카탈로그에 있는 이름)
     nutrient: Optional[Nutrient] = None # (3) 영양소 종류
     bound_type: Optional[Bound] = None # (3) 영양소 제약 종류
     bound_value: Optional[float] = None # (3) 영양소 제약 값
@@ -47,8 +56,14 @@ class Constraints(BaseModel):
     spice_level: Optional[SpiceLevel] = None # (4) 맵기 선호
     food_group: Optional[FoodGroup] = None # (4) 종류 선호
 
-def parse_constraints(user_text: str) -> List[Constraints]:
-    system_prompt = """
+    @field_validator('food_item')
+    @classmethod
+    def _known_food(cls, value):
+        if value is not None and value not in get_catalog().name_index:
+            raise ValueError(f"카탈로그에 없는 음식입니다: {value}")
+        return value
+
+PROMPT_TEMPLATE = """
         너는 사용자의 자연어 문장을 기반으로 식단 제약 조건을 JSON으로 변환하는 파서이다.  
         출력은 반드시 {"constraints": [...]} 형태의 JSON 하나만 생성해야 한다.  
         JSON 외의 설명, 텍스트는 절대 포함하지 않는다.
@@ -69,7 +84,7 @@ def parse_constraints(user_text: str) -> List[Constraints]:
           기본값은 "soft"
         - food_item: 문자열 | null (반드시 아래 중 하나)
           아래 제시된 음식 이름 중에서만 작성, 사용자가 작성한 음식이 존재하지 않는 경우 현저히 차이가 나지 않는 경우에만 아래 제시된 것 중 가장 가까운 것으로 대체
-          김치찌개 | 된장찌개 | 비빔밥 | 불고기 | 삼겹살 | 갈비탕 | 설렁탕 | 냉면 | 칼국수 | 떡볶이 | 순대국 | 제육볶음 | 잡채 | 김밥 | 참치김밥 | 라면 | 짜장면 | 짬뽕 | 볶음밥 | 김치볶음밥 | 피자 | 햄버거 | 치킨 | 후라이드치킨 | 양념치킨 | 돈까스 | 카레라이스 | 오므라이스 | 스파게티 | 토마토파스타 | 크림파스타 | 스테이크 | 샐러드 | 시저샐러드 | 그릭요거트 | 과일샐러드 | 바나나 | 사과 | 배 | 딸기 | 포도 | 수박 | 멜론 | 망고 | 파인애플 | 오렌지 | 레몬 | 자몽 | 블루베리 | 체리 | 복숭아 | 참외 | 토마토 | 가지 | 오이 | 양배추 | 브로콜리 | 시금치 | 감자 | 고구마 | 옥수수 | 콩밥 | 현미밥 | 흰쌀밥 | 잡곡밥 | 죽 | 미역국 | 콩나물국 | 계란찜 | 계란후라이 | 계란말이 | 메추리알조림 | 두부조림 | 연두부 | 순두부찌개 | 고등어구이 | 삼치구이 | 갈치조림 | 오징어볶음 | 낙지볶음 | 새우볶음 | 조개탕 | 홍합탕 | 전복죽 | 게장 | 젓갈 | 김치 | 깍두기 | 총각김치 | 열무김치 | 파김치 | 백김치 | 깻잎장아찌 | 마늘장아찌 | 고추장아찌 | 청국장 | 감자탕 | 해장국 | 추어탕 | 육개장 | 우동 | 쌀국수 | 포케 | 타코 | 부리토 | 핫도그 | 샌드위치 | 크로와상 | 베이글 | 식빵 | 호밀빵 | 치즈케이크 | 티라미수 | 초콜릿케이크 | 도넛 | 머핀 | 크루아상샌드위치 | 바게트 | 프렌치토스트 | 팬케이크 | 와플 | 쿠키 | 프렌치프라이 | 어니언링 | 치즈스틱 | 모짜렐라피자 | 페퍼로니피자 | 마르게리타피자 | 고르곤졸라피자 | 씨푸드피자 | 연어스테이크 | 연어샐러드 | 훈제연어 | 베이컨 | 소시지 | 햄 | 프라이드포테이토 | 스프링롤 | 춘권 | 군만두 | 찐만두 | 물만두 | 김치만두 | 고기만두 | 야채만두 | 샤브샤브 | 훠궈 | 퐁듀 | 라자냐 | 리조또 | 샤클슈카 | 팔라펠 | 후무스 | 케밥 | 샤와르마 | 쿠스쿠스 | 카프레제샐러드 | 리코타샐러드 | 양상추샐러드 | 감자샐러드 | 단호박죽 | 팥죽 | 녹두죽 | 호박죽 | 닭죽 | 삼계탕 | 닭칼국수 | 닭볶음탕 | 닭강정 | 치킨커틀릿 | 연어초밥 | 광어초밥 | 참치초밥 | 새우초밥 | 계란초밥 | 장어덮밥 | 카츠동 | 규동 | 텐동 | 가츠동 | 소고기덮밥 | 치킨마요덮밥 | 연어마요덮밥 | 스시롤 | 우나기롤 | 드래곤롤 | 캘리포니아롤 | 참치롤 | 새우롤 | 연어롤 | 초밥세트 | 스시세트 | 돈코츠라멘 | 미소라멘 | 시오라멘 | 스파이시라멘 | 파스타샐러드 | 크루통샐러드 | 토마토스프 | 양송이스프
+          {food_items}
           intent가 INCLUDE_ITEM 또는 EXCLUDE_ITEM일 때 사용  
         - nutrient: 문자열 | null (반드시 아래 중 하나)
           calorie | protein | fat | carbon | sodium | sugar | fiber
@@ -96,30 +111,98 @@ def parse_constraints(user_text: str) -> List[Constraints]:
           preference_type이 food_group일 때 사용
     """
 
-    response = client.chat.completions.create(
-        model="HCX-005",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_text},
-        ],
-        temperature=0.0
-    )
-
-    res = response.choices[0].message.content
-    
+def build_prompt(food_items) -> str:
+    # food_item 선택지를 채운 시스템 프롬프트 (선택지가 없으면 음식 제약을 쓰지 않도록 안내)
+    listed = " | ".join(food_items) if food_items else "(해당 없음, INCLUDE_ITEM/EXCLUDE_ITEM 사용하지 않음)"
+    return PROMPT_TEMPLATE.replace("{food_items}", listed)
+
+_retriever = None # (카탈로그 버전, 검색기)
+
+def get_retriever() -> FoodRetriever:
+    # 카탈로그 음식 이름으로 만든 검색기 (카탈로그 버전이 바뀌면 다시 생성)
+    global _retriever
+    version = get_catalog().version
+    if _retriever is None or _retriever[0] != version:
+        _retriever = (version, FoodRetriever(food_names()))
+    return _retriever[1]
+
+def prompt_for(user_text: str) -> str:
+    # 문장에 언급됐을 법한 음식만 넣어 음식 목록이 커져도 프롬프트 길이가 일정하도록
+    return build_prompt(get_retriever().candidates(user_text))
+
+def _parse_local(user_text: str):
+    # 흔한 요청은 로컬 규칙 파서로 바로 처리 (해석하지 못한 표현이 있으면 None)
+    from nlp_local import parse_local
+    local = parse_local(user_text)
+    registry.inc('constraint_parses_total', parser='local' if local.complete else 'llm')
+    return local.constraints if local.complete else None
+
+def _collect_metrics():
+    # /metrics에 내보낼 LLM 클라이언트 통계 (클라이언트를 만들기 전에는 없음)
+    if _client is None:
+        return []
+    stats = _client.stats()
+    return [
+        ('llm_requests_total', 'counter', 'LLM 해석 요청 수 (캐시 적중 포함)', [({}, stats['requests'])]),
+        ('llm_cache_hits_total', 'counter', 'LLM 호출 없이 응답한 요청 수',
+         [({'source': 'memory'}, stats['hits']), ({'source': 'disk'}, stats['disk_hits']),
+          ({'source': 'coalesced'}, stats['coalesced'])]),
+        ('llm_calls_total', 'counter', 'LLM API 호출 수 (재시도 포함)', [({}, stats['calls'])]),
+        ('llm_retries_total', 'counter', 'LLM API 재시도 수', [({}, stats['retries'])]),
+        ('llm_errors_total', 'counter', 'LLM API 오류 수', [({}, stats['errors'])]),
+    ]
+
+registry.counter('constraint_parses_total', '자연어 요청 해석 수 (parser: 처리한 파서)')
+registry.add_collector(_collect_metrics)
+
+def parse_constraints(user_text: str) -> List[Constraints]:
+    constraints = _parse_local(user_text)
+    if constraints is not None:
+        return constraints
+    return parse_constraints_llm(user_text)
+
+async def parse_constraints_async(user_text: str) -> List[Constraints]:
+    # LLM 응답을 기다리는 동안 스레드를 잡고 있지 않는 버전 (비동기 라우트용)
+    constraints = _parse_local(user_text)
+    if constraints is not None:
+        return constraints
+    return parse_response(await get_client().acomplete(prompt_for(user_text), user_text, validate=_is_valid))
+
+def parse_constraints_llm(user_text: str) -> List[Constraints]:
+    return parse_response(get_client().complete(prompt_for(user_text), user_text, validate=_is_valid))
+
+def _is_valid(res: str) -> bool:
+    # 스키마에 맞게 해석되는 응답만 캐시
+    return isinstance(parse_response(res, verbose=False), list)
+
+def parse_response(res: str, verbose: bool = True):
     fence = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", res, re.IGNORECASE)
     if fence:
         res = fence.group(1).strip()
     else:
         res = res.strip()
 
+    js = None
     try:
         js = json.loads(res)
-        return [Constraints(**c) for c in js["constraints"]]
+        return [Constraints(**c) for c in _resolve_items(js["constraints"])]
     except Exception as e:
-        print("JSON 파싱 중 오류", e)
+        if verbose:
+            print("JSON 파싱 중 오류", e)
         return js
 
+def _resolve_items(constraints: list) -> list:
+    # LLM이 적은 음식 이름을 실제 음식 목록의 이름으로 맞추고, 맞출 수 없는 음식 제약은 제외
+    resolved = []
+    for c in constraints:
+        if c.get("food_item") is not None:
+            name = get_retriever().resolve(c["food_item"])
+            if name is None:
+                continue
+            c = {**c, "food_item": name}
+        resolved.append(c)
+    return resolved
+
 if __name__ == "__main__":
     user_input = "오늘은 맵지 않게, 육류 위주로, 1800kcal보다 적도록 추천해줘. 그리고 불고기가 들어갔으면 좋겠어."
     constraints = parse_constraints(user_input)
@@ -0,0 +1,277 @@
+import re
+from collections import deque
+from typing import List
+from pydantic import BaseModel
+from nlp import Constraints, food_names
+
+LOCAL_MIN_CONFIDENCE = 1.0 # 모든 어절을 설명했을 때만 LLM 없이 결과 사용
+
+# 음식 종류 표현 -> nlp.FoodGroup (음식 이름과 겹치면 음식 이름이 우선)
+GROUP_WORDS = {
+    '국물': 'soup', '국류': 'soup', '찌개류': 'soup', '탕류': 'soup', '스프류': 'soup',
+    '밥류': 'rice', '덮밥류': 'rice',
+    '육류': 'meat', '고기': 'meat', '고기류': 'meat',
+    '면류': 'noodle', '면 요리': 'noodle', '국수류': 'noodle',
+    '샐러드류': 'salad',
+    '과일': 'fruit_veg', '채소': 'fruit_veg', '야채': 'fruit_veg', '과일/채소': 'fruit_veg',
+    '해산물': 'seafood', '해물': 'seafood', '생선': 'seafood',
+    '반찬': 'side_ferment', '발효식품': 'side_ferment', '김치류': 'side_ferment',
+    '빵': 'bread_dessert', '디저트': 'bread_dessert', '빵류': 'bread_dessert',
+    '튀김': 'fried_snack', '간식': 'fried_snack', '튀김류': 'fried_snack',
+    '초밥': 'sushi_roll', '스시': 'sushi_roll', '롤': 'sushi_roll',
+}
+
+SPICE_WORDS = {
+    '맵지 않': 'low', '맵지않': 'low', '안 맵': 'low', '안맵': 'low', '안 매운': 'low', '안매운': 'low',
+    '덜 맵': 'low', '덜 매운': 'low', '순한': 'low', '순하게': 'low', '자극적이지 않': 'low',
+    '적당히 매': 'medium', '약간 매': 'medium', '조금 매': 'medium', '살짝 매': 'medium',
+    '보통 맵': 'medium', '중간 맵': 'medium', '적당히 맵': 'medium',
+    '매운': 'high', '맵게': 'high', '매콤': 'high', '아주 매': 'high', '엄청 매': 'high', '얼큰': 'high',
+}
+
+# 음식/종류 뒤에 오는 포함/제외/선호 표현
+EXCLUDE_WORDS = ('빼', '제외', '말고', '없이', '없는', '싫', '안 먹', '안먹', '먹지 않', '못 먹', '못먹', '금지')
+INCLUDE_WORDS = ('넣', '포함', '들어가', '들어갔', '들어간', '추가', '먹고 싶', '먹고싶', '원해', '있었으면', '있으면')
+PREFER_WORDS = ('위주', '많이', '좋아', '선호', '중심')
+HARD_WORDS = ('반드시', '꼭', '절대', '무조건', '필수', '알레르기')
+# 앞의 포함/제외 표현을 뒤집는 표현 ("빼지 말고", "넣고 싶지 않아"), 있으면 LLM으로 넘김
+NEGATION_WORDS = ('지 말', '지말', '지 마', '지마', '싶지 않', '싶지않', '건 아니', '게 아니')
+
+NUTRIENT_WORDS = {
+    '칼로리': 'calorie', '열량': 'calorie', 'kcal': 'calorie',
+    '단백질': 'protein',
+    '지방': 'fat',
+    '탄수화물': 'carbon', '탄수': 'carbon',
+    '나트륨': 'sodium', '염분': 'sodium', '소금': 'sodium',
+    '당분': 'sugar', '당류': 'sugar', '설탕': 'sugar', '당': 'sugar',
+    '식이섬유': 'fiber', '섬유질': 'fiber',
+}
+
+_NUMBER = re.compile(r'(\d+(?:\.\d+)?)\s*(kcal|칼로리|cal|mg|g|그램|밀리그램)?', re.IGNORECASE)
+_BOUNDS = (
+    ('lower', re.compile(r'\s*(?:은|는|이|가|을|를|로|으로)?\s*(?:이하|미만|보다\s*(?:적|낮|작|덜)|넘지\s*않|안\s*넘|까지|아래)')),
+    ('greater', re.compile(r'\s*(?:은|는|이|가|을|를|로|으로)?\s*(?:이상|초과|보다\s*(?:많|높|크|더)|넘게|넘도록|넘는|위로)')),
+    ('equal', re.compile(r'\s*(?:은|는|이|가|을|를|로|으로)?\s*(?:정도|쯤|내외|안팎|가량|맞춰|맞게|로\s*맞)')),
+)
+_CLAUSE_BREAK = re.compile(r'[,.!?\n;]|그리고|그리구|또한')
+
+# 제약과 무관하게 요청에 흔히 쓰이는 어절 (앞부분 일치)
+FILLER_WORDS = (
+    '오늘', '내일', '이번', '아침', '점심', '저녁', '한끼', '추천', '식단', '식사', '메뉴', '음식',
+    '해줘', '해주', '주세요', '부탁', '그리고', '하고', '해서', '먹을', '먹고', '좋겠', '싶어', '싶다',
+    '했으면', '으로', '이랑', '이나', '하게', '하는', '있게', '되게', '되도록', '맞춰', '정도', '걸로',
+)
+# 한 글자 어절은 정확히 일치할 때만 (조사, 짧은 요청 표현)
+FILLER_SYLLABLES = {'좀', '또', '줘', '해', '요', '것', '거', '게', '끼', '한', '은', '는', '이', '가', '을', '를', '와', '과', '랑', '로', '도', '만'}
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick 다중 키워드 매처
+
+    키워드 수와 무관하게 입력 길이에 비례하는 시간으로 모든 등장 위치를 찾는다.
+    """
+
+    def __init__(self, keywords: dict):
+        # keywords: 키워드 -> 값
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for word, payload in keywords.items():
+            state = 0
+            for char in word:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].append((word, payload))
+
+        # 실패 링크 (BFS 순서로 한 단계 얕은 상태에서 이어받음)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find_all(self, text: str) -> list:
+        """Returns: [(시작, 끝, 키워드, 값), ...] (겹치는 등장 포함)"""
+        matches = []
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for word, payload in self.output[state]:
+                matches.append((end - len(word), end, word, payload))
+        return matches
+
+    def find(self, text: str) -> list:
+        """겹치지 않는 등장만 (먼저 시작하는 것, 같으면 긴 것 우선)"""
+        matches = sorted(self.find_all(text), key=lambda m: (m[0], -(m[1] - m[0])))
+        chosen = []
+        last_end = 0
+        for match in matches:
+            if match[0] >= last_end:
+                chosen.append(match)
+                last_end = match[1]
+        return chosen
+
+
+def _build_matcher() -> KeywordMatcher:
+    keywords = {}
+    for words, kind in ((EXCLUDE_WORDS, 'exclude'), (INCLUDE_WORDS, 'include'),
+                        (PREFER_WORDS, 'prefer'), (HARD_WORDS, 'hard'), (NEGATION_WORDS, 'negate')):
+        keywords.update({word: (kind, None) for word in words})
+    keywords.update({word: ('spice', level) for word, level in SPICE_WORDS.items()})
+    keywords.update({word: ('group', group) for word, group in GROUP_WORDS.items()})
+    keywords.update({name: ('item', name) for name in food_names()})
+    return KeywordMatcher(keywords)
+
+
+_matcher = _build_matcher()
+_nutrient_matcher = KeywordMatcher({word: key for word, key in NUTRIENT_WORDS.items()})
+
+
+class LocalParse(BaseModel):
+    constraints: List[Constraints] # 해석된 제약 조건
+    confidence: float # 제약 또는 일반 요청 표현으로 설명된 어절 비율 (0-1)
+    unmatched: List[str] # 해석하지 못한 어절/표현
+
+    @property
+    def complete(self) -> bool:
+        # LLM 없이 이 결과를 그대로 써도 되는지
+        return bool(self.constraints) and not self.unmatched and self.confidence >= LOCAL_MIN_CONFIDENCE
+
+
+def _clauses(text: str) -> list:
+    # 절 경계 (시작, 끝) 리스트, 제약 강도와 포함/제외 표현은 같은 절 안에서만 연결
+    bounds = [0]
+    for m in _CLAUSE_BREAK.finditer(text):
+        bounds += [m.start(), m.end()]
+    bounds.append(len(text))
+    return [(bounds[i], bounds[i + 1]) for i in range(0, len(bounds), 2)]
+
+
+def _parse_nutrients(text: str, clause: tuple, spans: list, unmatched: list) -> list:
+    # 숫자마다 같은 절의 앞쪽 영양소 표현과 뒤쪽 범위 표현을 연결
+    start, end = clause
+    segment = text[start:end]
+    words = _nutrient_matcher.find(segment)
+    results = []
+    for m in _NUMBER.finditer(segment):
+        unit = (m.group(2) or '').lower()
+        before = [w for w in words if w[1] <= m.start()]
+        nutrient = 'calorie' if unit in ('kcal', '칼로리', 'cal') else (before[-1][3] if before else None)
+        bound_type, cue_end = None, m.end()
+        for kind, pattern in _BOUNDS:
+            cue = pattern.match(segment, m.end())
+            if cue:
+                bound_type, cue_end = kind, cue.end()
+                break
+        if nutrient is None or bound_type is None:
+            unmatched.append(segment[m.start():cue_end].strip())
+            continue
+
+        value = float(m.group(1))
+        if nutrient == 'sodium' and unit in ('g', '그램'):
+            value *= 1000 # 나트륨은 mg 단위
+        results.append((nutrient, bound_type, value))
+        spans.append((start + m.start(), start + cue_end))
+        if before and nutrient == before[-1][3]:
+            spans.append((start + before[-1][0], start + before[-1][1]))
+    return results
+
+
+def parse_local(user_text: str) -> LocalParse:
+    """
+    음식 이름/종류, 맵기, 영양소 범위, 포함/제외 표현을 규칙으로 해석
+
+    음식 이름 뒤에 포함/제외 표현이 없거나, 포함/제외 표현 앞에 음식이 없거나, "빼지 말고" 같은 부정이 있거나,
+    숫자에 영양소나 범위 표현이 없거나, 제약으로도 일반 요청 표현으로도 설명되지 않는 어절이 있으면 unmatched에 남긴다.
+
+    Returns:
+        LocalParse: 제약 조건, 신뢰도, 해석하지 못한 표현
+    """
+    text = user_text.strip()
+    constraints = []
+    spans = [] # 설명된 문자 범위
+    unmatched = []
+
+    for clause in _clauses(text):
+        start, end = clause
+        matches = _matcher.find(text[start:end])
+        hard = any(kind == 'hard' for _, _, _, (kind, _) in matches)
+        strength = 'hard' if hard else 'soft'
+
+        # 음식/종류/맵기 목록은 뒤에 처음 나오는 포함/제외/선호 표현을 함께 따름 ("불고기랑 잡채 빼고", "매운 거 빼고")
+        pending = []
+        for m_start, m_end, word, (kind, value) in matches:
+            spans.append((start + m_start, start + m_end))
+            if kind in ('item', 'group', 'spice'):
+                pending.append((kind, value, word))
+            elif kind == 'negate':
+                unmatched.append(word)
+            elif kind in ('exclude', 'include', 'prefer'):
+                if not pending:
+                    # 연결할 음식/종류가 없는 포함/제외 표현은 설명된 것으로 보지 않음
+                    unmatched.append(word)
+                    continue
+                has_item = any(target_kind == 'item' for target_kind, _, _ in pending)
+                for target_kind, target, target_word in pending:
+                    if target_kind == 'spice':
+                        if kind == 'exclude' and target == 'high' and not has_item:
+                            # "매운 거 빼고", "매운 음식 싫어" -> 순한 맛
+                            target = 'low'
+                        elif kind == 'exclude' or has_item:
+                            # 순한 맛 제외, "매콤한 불고기 빼고"처럼 음식을 꾸미는 맛은 규칙으로 판단하지 않음
+                            unmatched.append(target_word)
+                            continue
+                        constraints.append(Constraints(intent='PREFERENCE', strength=strength,
+                                                       preference_type='spice_level', spice_level=target))
+                        continue
+                    if target_kind == 'group' and kind == 'include' and has_item:
+                        # "디저트로 티라미수 추가"처럼 종류가 함께 나온 음식을 설명하는 경우
+                        continue
+                    if target_kind == 'item' and kind != 'prefer':
+                        intent = 'EXCLUDE_ITEM' if kind == 'exclude' else 'INCLUDE_ITEM'
+                        constraints.append(Constraints(intent=intent, strength=strength, food_item=target))
+                    elif target_kind == 'group' and kind != 'exclude':
+                        constraints.append(Constraints(intent='PREFERENCE', strength=strength,
+                                                       preference_type='food_group', food_group=target))
+                    else:
+                        # 종류 제외, 음식 '위주' 같은 표현은 스키마로 나타낼 수 없음
+                        unmatched.append(target_word)
+                pending = []
+        # 표현 없이 끝난 맵기는 그 자체로 선호 ("맵지 않게"), 음식/종류는 해석하지 못한 것으로
+        for kind, value, word in pending:
+            if kind == 'spice':
+                constraints.append(Constraints(intent='PREFERENCE', strength=strength,
+                                               preference_type='spice_level', spice_level=value))
+            else:
+                unmatched.append(word)
+
+        for nutrient, bound_type, value in _parse_nutrients(text, clause, spans, unmatched):
+            constraints.append(Constraints(intent='NUTRIENT', strength=strength, nutrient=nutrient,
+                                           bound_type=bound_type, bound_value=value))
+
+    # 같은 제약이 여러 번 나오면 한 번만
+    unique = list({c.model_dump_json(): c for c in constraints}.values())
+
+    tokens = [(m.start(), m.end(), m.group()) for m in re.finditer(r'[^\s,.!?~]+', text)]
+    explained = 0
+    for token_start, token_end, token in tokens:
+        if (any(s < token_end and token_start < e for s, e in spans)
+                or token in FILLER_SYLLABLES or (len(token) > 1 and token.startswith(FILLER_WORDS))):
+            explained += 1
+        else:
+            unmatched.append(token)
+    confidence = explained / len(tokens) if tokens else 0.0
+
+    return LocalParse(constraints=unique, confidence=round(confidence, 3), unmatched=unmatched)
@@ -0,0 +1,36 @@
+# 사용자 정보로 영양소 목표값을 계산하는 함수 (카탈로그, 솔버 등 부수 효과 없이 import 가능)
+
+ACTIVITY_FACTORS = {1: 1.2, 2: 1.375, 3: 1.55, 4: 1.725, 5: 1.9}
+GOAL_MULTIPLIERS = {
+    'maintain': 1.0,
+    'loss': 0.85, # 기초대사량 85%
+    'gain': 1.15 # 기초대사량 115%
+}
+
+
+def calculate_daily_calories(weight: float, height: float, age: int, gender: str, activity: int, goal: str) -> float:
+    # 기초대사량 계산 (Mifflin St. Jeor)
+    s = 5 if gender == "male" else -161
+    bmr = 10 * weight + 6.25 * height - 5 * age + s
+
+    # 일일 권장 칼로리 계산
+    return bmr * ACTIVITY_FACTORS[activity] * GOAL_MULTIPLIERS[goal]
+
+
+def calculate_meal_targets(daily_calories: float, ratio: float = 0.4) -> dict:
+    # 한 끼 식사의 영양소 목표값 계산 (기본: 일일 권장량의 40%)
+    meal_calories = daily_calories * ratio
+
+    carb_ratio = 0.60 # 탄수화물 60%
+    protein_ratio = 0.15 # 단백질 15%
+    fat_ratio = 0.25 # 지방 25%
+
+    return {
+        'calories': meal_calories,
+        'carbs': (meal_calories * carb_ratio) / 4,
+        'protein': (meal_calories * protein_ratio) / 4,
+        'fat': (meal_calories * fat_ratio) / 9,
+        'fiber': max(8, meal_calories / 100), # 최소 8g, 칼로리 100당 1g
+        'sodium': 2000 * ratio, # mg, 일일 권장량 2000mg 중 끼니 비율만큼
+        'sugar': meal_calories * 0.1 / 4 # 칼로리의 10% 이하
+    }
@@ -0,0 +1,370 @@
+import math
+import threading
+import time
+import numpy as np
+from pulp import LpProblem, LpMinimize, LpVariable, LpAffineExpression, LpConstraint, lpSum
+from pulp.constants import (LpConstraintEQ, LpConstraintGE, LpConstraintLE, LpSolutionOptimal, LpSolutionIntegerFeasible,
+                            LpStatusOptimal)
+from catalog import FoodCatalog, MAIN_DISH_CATEGORIES
+from meal_model import DEVIATIONS, LIMIT_RATIO, LIMITED_GROUPS, MAX_ITEMS, MIN_ITEMS, MealModelTemplate
+from heuristic import MealHeuristic
+from constraint_compiler import CompiledConstraints
+from solver_backends import SolverSettings, milp_solver, solve_meal
+
+# 하루 끼니 수 -> (끼니 이름, 일일 칼로리 중 비율)
+MEAL_SPLITS = {
+    1: (('meal', 0.4),),
+    2: (('lunch', 0.5), ('dinner', 0.5)),
+    3: (('breakfast', 0.25), ('lunch', 0.4), ('dinner', 0.35)),
+}
+
+DAILY_SODIUM = 2000 # mg, 일일 나트륨 예산
+DAILY_SUGAR_RATIO = 0.1 # 일일 칼로리의 10% 이하
+MEAL_BUDGET_SLACK = 1.25 # 끼니별 상한 = 하루 예산 x 끼니 비율 x 1.25
+DIVERSITY_COST = 5.0 # 초기해 생성 시 이미 쓴 음식 1회당 추가 비용
+SEED_TOLERANCE = 1e-6 # 끼니를 다시 풀어 목적함수가 이보다 줄어야 교체
+
+
+def default_plan_repeat(days: int) -> int:
+    # 계획 전체에서 같은 음식은 이틀에 한 번꼴까지 (최소 2회)
+    return max(2, math.ceil(days / 2))
+
+
+def day_budgets(daily_calories: float) -> dict:
+    return {
+        'sodium': DAILY_SODIUM * 1.2,
+        'sugar': daily_calories * DAILY_SUGAR_RATIO / 4 * 1.2,
+    }
+
+
+class PlanModel:
+    """
+    days x 끼니 식단 계획
+
+    끼니마다 한 끼 모델로 풀고 하루 나트륨/당 예산과 같은 음식의 반복 제한만 끼니 사이에 맞춘다 (seed_plan).
+    끼니를 모두 묶은 음식 단위 MILP(prob)는 LP 완화 하한이 약해, CBC가 시간 제한 안에 끼니별 풀이보다 좋은 해를
+    거의 찾지 못한다 (1x3: 60초 풀이 22.4, 끼니별 풀이 4-5초 23.6 / 3x3, 7x3: 10초 풀이가 끼니별 풀이보다 나쁨).
+    그래서 seed_plan이 계획을 채우지 못할 때만 처음 필요할 때 만들어 푼다.
+
+    대신 끼니별 풀이는 끼니 사이 제약(반복 제한, 하루 예산)이 실제로 걸리면 최적성을 증명하지 못하고
+    끼니 수만큼 한 끼 풀이를 반복한다 (2x3은 5-6초, 최적 여부 False). 끼니 사이 제약이 걸리지 않으면
+    끼니별 최적해가 곧 계획의 최적해이다.
+    """
+
+    def __init__(self, catalog: FoodCatalog, days: int, meals: int, daily_repeat: int = 1, plan_repeat: int = None):
+        self.catalog = catalog
+        self.days = days
+        self.splits = MEAL_SPLITS[meals]
+        self.daily_repeat = daily_repeat
+        self.plan_repeat = default_plan_repeat(days) if plan_repeat is None else plan_repeat
+        self.heuristic = MealHeuristic(catalog)
+        self.slots = [(d, m) for d in range(days) for m in range(len(self.splits))]
+        # 끼니 풀이용 한 끼 모델 (제외 음식은 변수 상한으로 반영해 공유 템플릿 캐시를 쓰지 않음)
+        self.meal_template = MealModelTemplate(catalog)
+        self._meal_cache = {} # 계획 풀이 한 번 동안의 한 끼 풀이 결과
+        self.prob = None # 계획 전체 MILP (_build, 대체 풀이에서만 사용)
+
+    def _build(self):
+        """
+        days x 끼니 전체를 하나로 푸는 MILP
+
+        끼니마다 한 끼 모델과 같은 구성 규칙과 영양소 편차를 두고, 하루 단위로
+        나트륨/당 예산을, 계획 전체에 같은 음식의 반복 횟수 제한을 건다.
+        MealModel과 마찬가지로 목표값에서 나온 우변값만 요청마다 교체한다.
+        """
+        catalog = self.catalog
+        days = self.days
+        self.prob = LpProblem("meal_plan", LpMinimize)
+
+        n_foods = catalog.size
+        self.food_vars = {
+            (d, m): [LpVariable(f"food_{d}_{m}_{i}", cat='Binary') for i in range(n_foods)]
+            for d, m in self.slots
+        }
+
+        main_dishes = catalog.indices(MAIN_DISH_CATEGORIES)
+        limited_groups = [catalog.indices(group) for group in LIMITED_GROUPS]
+        nonzero = {key: np.flatnonzero(coefs) for key, coefs in catalog.nutrients.items()}
+
+        def weighted_sum(food_vars, key):
+            coefs = catalog.nutrients[key]
+            return LpAffineExpression(zip([food_vars[i] for i in nonzero[key]], coefs[nonzero[key]].tolist()))
+
+        objective = []
+        day_sums = {d: {'sodium': LpAffineExpression(), 'sugar': LpAffineExpression()} for d in range(days)}
+        day_objectives = {d: LpAffineExpression() for d in range(days)}
+        for d, m in self.slots:
+            food_vars = self.food_vars[d, m]
+            suffix = f'{d}_{m}'
+
+            # 끼니별 영양소 편차 (가중치는 한 끼 모델과 동일)
+            sums = {key: weighted_sum(food_vars, key) for key in ('calories', 'protein', 'carbs', 'fat')}
+            slot_objective = []
+            for name, (key, weight) in DEVIATIONS.items():
+                pos = LpVariable(f"{name}_pos_{suffix}", lowBound=0)
+                neg = LpVariable(f"{name}_neg_{suffix}", lowBound=0)
+                slot_objective += [(pos, weight), (neg, weight)]
+                expr = sums[key].copy()
+                expr.addInPlace(pos, -1)
+                expr.addInPlace(neg)
+                self._add(expr, LpConstraintEQ, f'{name}_dev_{suffix}')
+            objective += slot_objective
+            day_objectives[d].addInPlace(LpAffineExpression(slot_objective))
+
+            # 끼니별 칼로리 범위 (목표 20% 내외)
+            self._add(sums['calories'], LpConstraintGE, f'cal_min_{suffix}')
+            self._add(sums['calories'], LpConstraintLE, f'cal_max_{suffix}')
+
+            # 끼니별 나트륨/당 상한 (하루 예산을 끼니 비율보다 조금 넉넉히 배분)
+            sodium = weighted_sum(food_vars, 'sodium')
+            sugar = weighted_sum(food_vars, 'sugar')
+            self._add(sodium, LpConstraintLE, f'sodium_max_{suffix}')
+            self._add(sugar, LpConstraintLE, f'sugar_max_{suffix}')
+
+            # 끼니 구성: 4-8개, 주식 1개, 과일/채소, 샐러드, 디저트/간식 각각 최대 1개
+            self.prob += lpSum(food_vars) >= MIN_ITEMS
+            self.prob += lpSum(food_vars) <= MAX_ITEMS
+            if main_dishes.size:
+                self.prob += lpSum(food_vars[i] for i in main_dishes) == 1
+            for members in limited_groups:
+                if members.size:
+                    self.prob += lpSum(food_vars[i] for i in members) <= 1
+
+            day_sums[d]['sodium'].addInPlace(sodium)
+            day_sums[d]['sugar'].addInPlace(sugar)
+
+        self.prob += LpAffineExpression(objective)
+
+        # 날짜끼리는 목표와 예산이 같아 서로 바꿔도 같은 계획이므로, 하루 편차 합이 날짜순으로 커지게 해 대칭 제거
+        for d in range(days - 1):
+            self.prob += day_objectives[d] - day_objectives[d + 1] <= 0
+
+        # 하루 나트륨/당 예산
+        for d in range(days):
+            self._add(day_sums[d]['sodium'], LpConstraintLE, f'sodium_day_{d}')
+            self._add(day_sums[d]['sugar'], LpConstraintLE, f'sugar_day_{d}')
+
+        # 같은 음식 반복 제한: 하루 daily_repeat회, 계획 전체 plan_repeat회
+        meals_per_day = len(self.splits)
+        for i in range(n_foods):
+            if meals_per_day > self.daily_repeat:
+                for d in range(days):
+                    self.prob += lpSum(self.food_vars[d, m][i] for m in range(meals_per_day)) <= self.daily_repeat
+            if len(self.slots) > self.plan_repeat:
+                self.prob += lpSum(self.food_vars[slot][i] for slot in self.slots) <= self.plan_repeat
+
+    def _add(self, expr: LpAffineExpression, sense: int, name: str):
+        self.prob.addConstraint(LpConstraint(expr.copy(), sense, name, rhs=0), name)
+
+    def set_targets(self, meal_targets: list, budgets: dict):
+        """
+        Args:
+            meal_targets: 끼니 순서대로의 영양소 목표값 dict 리스트
+            budgets: 하루 예산 {'sodium': mg, 'sugar': g}
+        """
+        constraints = self.prob.constraints
+        for d, m in self.slots:
+            targets = meal_targets[m]
+            suffix = f'{d}_{m}'
+            for name, (key, _) in DEVIATIONS.items():
+                constraints[f'{name}_dev_{suffix}'].changeRHS(targets[key])
+            constraints[f'cal_min_{suffix}'].changeRHS(targets['calories'] * 0.8)
+            constraints[f'cal_max_{suffix}'].changeRHS(targets['calories'] * 1.2)
+            ratio = self.splits[m][1]
+            constraints[f'sodium_max_{suffix}'].changeRHS(budgets['sodium'] * ratio * MEAL_BUDGET_SLACK)
+            constraints[f'sugar_max_{suffix}'].changeRHS(budgets['sugar'] * ratio * MEAL_BUDGET_SLACK)
+        for d in range(self.days):
+            constraints[f'sodium_day_{d}'].changeRHS(budgets['sodium'])
+            constraints[f'sugar_day_{d}'].changeRHS(budgets['sugar'])
+
+    def warm_start(self, meal_targets: list, budgets: dict) -> bool:
+        """
+        탐욕 휴리스틱으로 반복 제한과 하루 예산을 지키는 초기해를 만들어 변수 초기값으로 설정
+
+        끼니마다 분리된 문제를 함께 분기하는 CBC는 좋은 초기해를 스스로 잘 찾지 못하므로
+        (LP 완화 하한이 0에 가까움) 풀이 전에 넣어준다.
+        """
+        n_foods = self.catalog.size
+        plan_usage = np.zeros(n_foods, dtype=int)
+        plan = {}
+        for d in range(self.days):
+            day_usage = np.zeros(n_foods, dtype=int)
+            remaining = dict(budgets)
+            for m, (_, ratio) in enumerate(self.splits):
+                # 끼니 상한과 그날 남은 예산 중 작은 값을 상한으로 사용
+                available = (plan_usage < self.plan_repeat) & (day_usage < self.daily_repeat)
+                caps = {key: min(budgets[key] * ratio * MEAL_BUDGET_SLACK, remaining[key]) for key in remaining}
+                # 이미 쓴 음식일수록 비용을 더해 반복 한도를 한꺼번에 소진하지 않게 함
+                selected = self.heuristic.solve(meal_targets[m], available,
+                                                sodium_cap=caps['sodium'], sugar_cap=caps['sugar'],
+                                                costs=plan_usage * DIVERSITY_COST)
+                if selected is None:
+                    return False
+                plan[d, m] = set(selected)
+                plan_usage[selected] += 1
+                day_usage[selected] += 1
+                for key in remaining:
+                    remaining[key] -= self.catalog.nutrients[key][selected].sum()
+
+        for slot, food_vars in self.food_vars.items():
+            for i, var in enumerate(food_vars):
+                var.setInitialValue(1 if i in plan[slot] else 0)
+        return True
+
+    def _solve_meal(self, m: int, meal_targets: list, caps: dict, excluded: np.ndarray, settings: SolverSettings,
+                    deadline: float = None):
+        """
+        m번째 끼니를 settings의 백엔드로 풀이 (excluded 음식 제외, 나트륨/당 상한 caps)
+
+        같은 계획 풀이 안에서 같은 조건의 끼니는 한 번만 푼다 (날짜마다 같은 목표이므로 자주 반복됨).
+
+        Returns:
+            (선택, 목적함수 값, 최적 여부) | None
+        """
+        key = (m, excluded.tobytes(), tuple(round(caps[name], 6) for name in sorted(caps)))
+        if key in self._meal_cache:
+            return self._meal_cache[key]
+        constraints = CompiledConstraints(candidates=np.flatnonzero(~excluded)) if excluded.any() else None
+        # 한 끼 모델의 나트륨/당 상한은 목표 x LIMIT_RATIO 이므로 상한이 caps가 되도록 목표를 맞춤
+        targets = dict(meal_targets[m], sodium=caps['sodium'] / LIMIT_RATIO, sugar=caps['sugar'] / LIMIT_RATIO)
+        time_limit = settings.time_limit
+        if deadline is not None:
+            remaining = max(0.1, deadline - time.perf_counter())
+            time_limit = remaining if time_limit is None else min(time_limit, remaining)
+        settings = SolverSettings(settings.backend, time_limit, settings.gap, settings.warm_start, settings.bound)
+        result = solve_meal(self.catalog, targets, settings, constraints, template=self.meal_template)
+        selected = result['selected']
+        solved = None if selected is None else (selected, result['objective'], result['optimal'])
+        self._meal_cache[key] = solved
+        return solved
+
+    def _slot_limits(self, d: int, m: int, plan: dict, budgets: dict, caps: dict):
+        # 다른 끼니를 고정했을 때 (d, m) 끼니의 제외 음식(반복 한도에 걸린 음식)과 상한 (caps와 그날 남은 예산 중 작은 값)
+        plan_usage = np.zeros(self.catalog.size, dtype=int)
+        day_usage = np.zeros(self.catalog.size, dtype=int)
+        remaining = dict(budgets)
+        for (day, meal), selected in plan.items():
+            if (day, meal) == (d, m):
+                continue
+            plan_usage[selected] += 1
+            if day == d:
+                day_usage[selected] += 1
+                for key in remaining:
+                    remaining[key] -= self.catalog.nutrients[key][selected].sum()
+        excluded = (plan_usage >= self.plan_repeat) | (day_usage >= self.daily_repeat)
+        return excluded, {key: max(0.0, min(cap, remaining[key])) for key, cap in caps.items()}
+
+    def _still_optimal(self, selected: list, solved_under: tuple, excluded: np.ndarray, caps: dict) -> bool:
+        # 더 느슨한 조건(제외 음식이 부분집합, 상한이 크거나 같음)에서 최적이었고 지금 조건도 지키면 다시 풀어도 같음
+        old_excluded, old_caps, optimal = solved_under
+        return (optimal and not (old_excluded & ~excluded).any() and not excluded[selected].any()
+                and all(old_caps[key] >= caps[key] - 1e-9 for key in caps)
+                and all(self.catalog.nutrients[key][selected].sum() <= caps[key] + 1e-9 for key in caps))
+
+    def seed_plan(self, meal_targets: list, budgets: dict, settings: SolverSettings = None, deadline: float = None):
+        """
+        한 끼 모델만으로 만든 초기 계획
+
+        날짜/끼니 순서로 앞 끼니들을 고정하고 한 끼 모델의 기본 상한(끼니 목표 x LIMIT_RATIO)으로 차례로 푼다
+        (반복 한도에 걸린 음식 제외, 그날 남은 예산 안에서). 반복되는 음식이 없으면 끼니마다 따로 푼 최적해와 같다.
+        그 뒤 끼니 하나씩 나머지를 고정하고 다시 풀어 목적함수가 더 줄지 않을 때까지 (또는 deadline까지) 고친다.
+        기본 상한으로 먼저 고치고, 계획 모델의 끼니 상한(MEAL_BUDGET_SLACK)으로 한 번 더 고쳐 끼니끼리 하루 예산을
+        나눠 쓰게 한다 (편차가 큰 끼니부터).
+
+        Returns:
+            ({(일, 끼니): [음식 인덱스, ...]}, 최적 여부) | None (어떤 끼니를 풀지 못한 경우)
+            모든 끼니가 제외 음식 없이 계획 모델의 끼니 상한으로 최적이면 끼니 사이 제약이 걸리지 않은 것이므로 계획도 최적이다.
+        """
+        limits = [{key: meal_targets[m][key] * LIMIT_RATIO for key in budgets} for m in range(len(self.splits))]
+        slack = [{key: budgets[key] * ratio * MEAL_BUDGET_SLACK for key in budgets} for _, ratio in self.splits]
+        settings = settings or SolverSettings()
+        plan, objectives, solved_under = {}, {}, {}
+
+        def improve(d, m, caps):
+            excluded, caps = self._slot_limits(d, m, plan, budgets, caps[m])
+            if (d, m) in plan and self._still_optimal(plan[d, m], solved_under[d, m], excluded, caps):
+                return False
+            solved = self._solve_meal(m, meal_targets, caps, excluded, settings, deadline)
+            if solved is None or ((d, m) in plan and solved[1] >= objectives[d, m] - SEED_TOLERANCE):
+                return False
+            plan[d, m], objectives[d, m], optimal = solved
+            solved_under[d, m] = (excluded, caps, optimal)
+            return True
+
+        for d, m in self.slots:
+            if not improve(d, m, limits):
+                return None
+        for caps in (limits, slack):
+            improved = True
+            while improved and (deadline is None or time.perf_counter() < deadline):
+                improved = False
+                for d, m in sorted(self.slots, key=lambda slot: -objectives[slot]):
+                    improved = improve(d, m, caps) or improved
+
+        optimal = all(solved_under[d, m][2] and not solved_under[d, m][0].any()
+                      and all(solved_under[d, m][1][key] >= slack[m][key] - 1e-9 for key in budgets)
+                      for d, m in self.slots)
+        return plan, optimal
+
+    def _plan(self) -> list:
+        plan = [[None] * len(self.splits) for _ in range(self.days)]
+        for d, m in self.slots:
+            plan[d][m] = [i for i, var in enumerate(self.food_vars[d, m])
+                          if var.varValue is not None and round(var.varValue) == 1]
+        return plan
+
+    def solve(self, meal_targets: list, budgets: dict, time_limit: float = None, settings: SolverSettings = None):
+        """
+        끼니마다 한 끼 모델로 풀고 하루 예산/반복 제한만 끼니 사이에 맞춰 계획을 만듦 (seed_plan)
+
+        한 끼 모델로 계획을 채우지 못할 때만 계획 전체 MILP를 만들어 휴리스틱 초기해를 넣어 푼다 (클래스 설명 참고).
+
+        Args:
+            time_limit: 계획 전체 풀이 시간 제한(초)
+            settings: 끼니 풀이 백엔드 설정 (settings.time_limit은 끼니 한 번의 풀이 시간 제한)
+
+        Returns:
+            (status, 일자별 끼니별 선택된 음식 인덱스 리스트 [[[i, ...], ...], ...] | None, 최적 여부)
+        """
+        deadline = time.perf_counter() + time_limit if time_limit else None
+        self._meal_cache = {}
+        seed = self.seed_plan(meal_targets, budgets, settings, deadline)
+        if seed is None:
+            # 한 끼 모델로 채우지 못한 경우 (반복/예산 제약이 빡빡함) 계획 모델 전체를 풀이
+            if self.prob is None:
+                self._build()
+            self.set_targets(meal_targets, budgets)
+            remaining = None if deadline is None else max(0.1, deadline - time.perf_counter())
+            settings = settings or SolverSettings()
+            backend = 'auto' if settings.backend == 'heuristic' else settings.backend
+            self.prob.solve(milp_solver(backend, remaining, settings.gap,
+                                        warm_start=self.warm_start(meal_targets, budgets)))
+            if self.prob.sol_status not in (LpSolutionOptimal, LpSolutionIntegerFeasible):
+                return self.prob.status, None, False
+            return self.prob.status, self._plan(), self.prob.sol_status == LpSolutionOptimal
+
+        plan, optimal = seed
+        return LpStatusOptimal, [[plan[d, m] for m in range(len(self.splits))] for d in range(self.days)], optimal
+
+
+_local = threading.local()
+
+
+def get_plan_model(catalog: FoodCatalog, days: int, meals: int, daily_repeat: int = 1, plan_repeat: int = None) -> PlanModel:
+    # 스레드별로 (카탈로그 버전, 일수, 끼니 수, 반복 제한)마다 한 번만 생성
+    models = getattr(_local, 'models', None)
+    if models is None:
+        models = _local.models = {}
+    key = (catalog.version, days, meals, daily_repeat, plan_repeat)
+    model = models.get(key)
+    if model is None:
+        model = models[key] = PlanModel(catalog, days, meals, daily_repeat, plan_repeat)
+    return model
+
+
+def solve_plan(catalog: FoodCatalog, meal_targets: list, budgets: dict, days: int, meals: int,
+               daily_repeat: int = 1, plan_repeat: int = None, time_limit: float = None,
+               settings: SolverSettings = None):
+    # 요청 스레드와 풀이 풀 워커에서 함께 쓰는 진입점
+    model = get_plan_model(catalog, days, meals, daily_repeat, plan_repeat)
+    return model.solve(meal_targets, budgets, time_limit, settings)
@@ -0,0 +1,487 @@
+import ast
+import asyncio
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Literal, Optional
+import numpy as np
+from fastapi import APIRouter, Query, Request, Response
+from starlette.concurrency import run_in_threadpool
+from catalog import ITEM_FIELDS, MAIN_DISH_CATEGORIES, FoodCatalog, get_catalog
+from constraint_compiler import CompiledConstraints
+from food_retrieval import FoodRetriever
+from meal_model import LIMITED_GROUPS, MAX_ITEMS
+from metrics import observe_stage, registry, stage
+from solver_pool import SolverOverloaded, SolverTimeout
+
+# CPU 추론용 선택 의존성 (없으면 /recognize는 503)
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+INPUT_SIZE = 640 # 모델 입력 크기가 고정되지 않은 경우의 기본값 (학습 imgsz)
+CONF_THRESHOLD = 0.25 # 검출로 인정할 최소 클래스 점수
+IOU_THRESHOLD = 0.45 # 같은 클래스 상자를 하나로 합칠 IoU
+MAX_DETECTIONS = 50 # 이미지당 최대 검출 수
+MAX_BATCH = 8 # 한 번에 추론할 최대 이미지 수
+BATCH_WINDOW = 0.005 # 첫 요청 이후 같은 배치로 모을 시간 (초)
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+PAD_VALUE = 114 / 255 # 레터박스 여백 (학습 때와 같은 회색)
+# 한 끼에 최대 하나만 들어갈 수 있는 음식 종류 (주식은 정확히 하나)
+SINGLE_GROUPS = (MAIN_DISH_CATEGORIES,) + LIMITED_GROUPS
+
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32)
+registry.histogram('recognition_batch_size', '한 번에 추론한 이미지 수', BATCH_BUCKETS)
+
+
+def recognition_available() -> bool:
+    return ort is not None and Image is not None
+
+
+class DecodedImage:
+    """
+    레터박스 크기에 맞게 줄인 RGB 이미지 (uint8 HWC, 배치 버퍼에 한 번만 복사됨)
+
+    Attributes:
+        pixels: 줄인 이미지 배열 (높이, 너비, 3)
+        scale: 원본 -> 모델 입력 배율
+        pad: 모델 입력에서 이미지가 시작하는 위치 (x, y)
+        size: 원본 크기 (너비, 높이)
+    """
+
+    def __init__(self, pixels: np.ndarray, scale: float, pad: tuple, size: tuple):
+        self.pixels = pixels
+        self.scale = scale
+        self.pad = pad
+        self.size = size
+
+
+def decode_image(data: bytes, input_size: int = INPUT_SIZE) -> DecodedImage:
+    """
+    이미지 바이트를 모델 입력 크기로 디코딩
+
+    JPEG는 draft()로 디코딩 단계에서 미리 줄이고, 알파 채널/팔레트 이미지만 RGB로 변환한다.
+    BytesIO는 받은 바이트를 복사하지 않고 그대로 읽는다.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow가 설치되어 있지 않습니다")
+    with stage('image_decode'):
+        image = Image.open(io.BytesIO(data))
+        size = image.size
+        image.draft('RGB', (input_size, input_size))
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        # draft로 줄어든 경우에도 원본 좌표로 되돌릴 수 있도록 배율은 원본 기준
+        scale = min(input_size / size[0], input_size / size[1])
+        width, height = max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+        if image.size != (width, height):
+            image = image.resize((width, height), Image.BILINEAR, reducing_gap=3.0)
+        pad = ((input_size - width) // 2, (input_size - height) // 2)
+        return DecodedImage(np.asarray(image), scale, pad, size)
+
+
+def _nms(boxes: np.ndarray, scores: np.ndarray, threshold: float) -> list:
+    # 점수 순으로 겹치는 상자를 제거 (boxes: x1, y1, x2, y2)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = np.argsort(-scores)
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(int(i))
+        rest = order[1:]
+        width = np.clip(np.minimum(boxes[i, 2], boxes[rest, 2]) - np.maximum(boxes[i, 0], boxes[rest, 0]), 0, None)
+        height = np.clip(np.minimum(boxes[i, 3], boxes[rest, 3]) - np.maximum(boxes[i, 1], boxes[rest, 1]), 0, None)
+        overlap = width * height
+        iou = overlap / np.maximum(areas[i] + areas[rest] - overlap, 1e-9)
+        order = rest[iou <= threshold]
+    return keep
+
+
+def postprocess(output: np.ndarray, image: DecodedImage, conf_threshold: float = CONF_THRESHOLD,
+                iou_threshold: float = IOU_THRESHOLD, max_detections: int = MAX_DETECTIONS) -> list:
+    """
+    YOLOv8 출력 한 장 (4 + 클래스 수, 앵커 수)을 원본 좌표의 검출 결과로 변환
+
+    Returns:
+        list: [(클래스 번호, 점수, [x1, y1, x2, y2]), ...] 점수가 높은 순
+    """
+    scores = output[4:]
+    classes = scores.argmax(axis=0)
+    confidence = scores[classes, np.arange(scores.shape[1])]
+    mask = confidence >= conf_threshold
+    if not mask.any():
+        return []
+    cx, cy, w, h = output[:4, mask]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    classes, confidence = classes[mask], confidence[mask]
+
+    # 클래스마다 좌표를 멀리 떨어뜨려 한 번의 NMS로 클래스별 NMS를 대신함
+    offsets = classes[:, None] * (boxes.max() + 1)
+    keep = _nms(boxes + offsets, confidence, iou_threshold)[:max_detections]
+
+    # 레터박스를 되돌려 원본 좌표로
+    boxes = (boxes[keep] - np.array(image.pad * 2)) / image.scale
+    boxes = np.clip(boxes, 0, np.array(image.size * 2))
+    return [(int(classes[i]), float(confidence[i]), [round(float(v), 1) for v in box])
+            for i, box in zip(keep, boxes)]
+
+
+def model_labels(session) -> list:
+    # ultralytics로 내보낸 ONNX는 메타데이터 names에 {번호: 이름} 문자열을 담음
+    names = session.get_modelmeta().custom_metadata_map.get('names')
+    if not names:
+        return []
+    names = ast.literal_eval(names)
+    return [names[i] for i in sorted(names)] if isinstance(names, dict) else list(names)
+
+
+class MicroBatcher:
+    """
+    동시에 들어온 요청을 짧은 시간 동안 모아 한 번에 처리하는 비동기 배처
+
+    첫 요청 후 window 초가 지나거나 max_batch개가 모이면 run_batch(items)를 전용 스레드에서 실행한다.
+    추론 스레드가 하나이므로 앞 배치를 처리하는 동안 들어온 요청은 다음 배치로 모인다.
+    """
+
+    def __init__(self, run_batch, max_batch: int = MAX_BATCH, window: float = BATCH_WINDOW):
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.window = window
+        self._pending = [] # (입력, future)
+        self._timer = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='recognition')
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._dispatch)
+        return await future
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: list):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self._executor, self.run_batch, [item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class FoodRecognizer:
+    """
+    ONNX로 내보낸 음식 검출 모델(YOLOv8)을 CPU에서 실행하고 검출 라벨을 카탈로그 음식에 연결
+
+    모델은 생성 시 한 번만 로드한다. 라벨 -> 카탈로그 인덱스는 시작할 때 한 번 계산하며,
+    aliases(라벨 -> 음식명)가 우선이고, 없으면 같은 이름, 그다음 자모 n-gram 유사도로 찾는다.
+
+    Args:
+        model_path: ONNX 모델 경로 (ultralytics: model.export(format='onnx', dynamic=True))
+        catalog: 음식 카탈로그
+        labels: 클래스 이름 (없으면 모델 메타데이터의 names)
+        aliases: 라벨 -> 카탈로그 음식명
+        threads: onnxruntime 연산 스레드 수 (None이면 CPU 수)
+    """
+
+    def __init__(self, model_path: str, catalog: FoodCatalog, labels: list = None, aliases: dict = None,
+                 threads: int = None, max_batch: int = MAX_BATCH, window: float = BATCH_WINDOW):
+        if not recognition_available():
+            raise RuntimeError("onnxruntime과 Pillow가 필요합니다")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads or os.cpu_count() or 1
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # 입력 크기/배치 크기가 고정된 모델이면 그 값을 사용 (배치 고정이면 그 크기로 나눠 실행)
+        self.input_size = model_input.shape[2] if isinstance(model_input.shape[2], int) else INPUT_SIZE
+        self.fixed_batch = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+
+        self.catalog = catalog
+        self.labels = list(labels or model_labels(self.session))
+        self.food_index = self._map_labels(self.labels, aliases or {})
+        self.batcher = MicroBatcher(self.run_batch, max_batch, window)
+
+    def _map_labels(self, labels: list, aliases: dict) -> list:
+        retriever = FoodRetriever(self.catalog.names)
+        mapped = []
+        for label in labels:
+            name = aliases.get(label) or retriever.resolve(str(label))
+            mapped.append(self.catalog.name_index.get(name))
+        return mapped
+
+    def run_batch(self, images: list) -> list:
+        """
+        디코딩된 이미지들을 한 번에 추론
+
+        Returns:
+            list: 이미지별 postprocess 결과
+        """
+        chunk = self.fixed_batch or len(images)
+        results = []
+        for start in range(0, len(images), chunk):
+            part = images[start:start + chunk]
+            batch = np.full((chunk, 3, self.input_size, self.input_size), PAD_VALUE, dtype=np.float32)
+            for slot, image in zip(batch, part):
+                height, width = image.pixels.shape[:2]
+                x, y = image.pad
+                # HWC uint8 -> CHW float32 변환과 0-1 정규화를 배치 버퍼에 바로 씀
+                np.multiply(image.pixels.transpose(2, 0, 1), 1 / 255, out=slot[:, y:y + height, x:x + width],
+                            casting='unsafe')
+            started_at = time.perf_counter()
+            output = self.session.run(None, {self.input_name: batch})[0]
+            observe_stage('recognition_inference', time.perf_counter() - started_at)
+            registry.observe('recognition_batch_size', len(part))
+            results += [postprocess(output[i], image) for i, image in enumerate(part)]
+        return results
+
+    async def recognize(self, data: bytes) -> dict:
+        """
+        이미지 한 장을 인식 (동시에 들어온 다른 요청과 같은 배치로 추론)
+
+        Returns:
+            dict: detections(라벨, 점수, 상자, 카탈로그 음식), items(인식된 음식), unknown(카탈로그에 없는 라벨)
+        """
+        image = await run_in_threadpool(decode_image, data, self.input_size)
+        detections = await self.batcher.submit(image)
+        return self.describe(detections)
+
+    def describe(self, detections: list) -> dict:
+        results, foods, unknown = [], [], []
+        for label_id, confidence, box in detections:
+            label = self.labels[label_id] if label_id < len(self.labels) else str(label_id)
+            i = self.food_index[label_id] if label_id < len(self.food_index) else None
+            food = self.catalog.food_info(i) if i is not None else None
+            results.append({"label": label, "confidence": round(confidence, 4), "box": box, "food": food})
+            if i is None:
+                unknown.append(label)
+            elif i not in foods:
+                foods.append(i)
+        return {
+            "detections": results,
+            "items": [self.catalog.food_info(i) for i in foods],
+            "unknown": list(dict.fromkeys(unknown)),
+        }
+
+    def close(self):
+        self.batcher.close()
+
+
+def include_constraints(items: list, strength: str = "hard") -> list:
+    """
+    인식된 음식을 compile_constraints에 바로 넣을 수 있는 INCLUDE_ITEM 제약으로
+
+    한 끼 구성 규칙(SINGLE_GROUPS 종류별 하나, 최대 MAX_ITEMS개)을 함께 지킬 수 있는 음식만 strength로 하고
+    나머지는 soft로 둔다 (예: 주식이 둘 인식되면 먼저 인식된 것만 hard).
+    """
+    constraints, used, fixed = [], set(), 0
+    for item in items:
+        group = next((n for n, categories in enumerate(SINGLE_GROUPS) if item['category'] in categories), None)
+        fits = fixed < MAX_ITEMS and (group is None or group not in used)
+        if fits and strength == "hard":
+            used.add(group)
+            fixed += 1
+        constraints.append({"intent": "INCLUDE_ITEM", "strength": strength if fits else "soft",
+                            "food_item": item['name']})
+    return constraints
+
+
+def remaining_targets(targets: dict, items: list) -> dict:
+    """이미 먹은 음식의 영양소를 뺀 끼니 목표값 (음수가 되지 않도록 0에서 자름)"""
+    targets = dict(targets)
+    for field, key in ITEM_FIELDS.items():
+        if key in targets:
+            targets[key] = max(0.0, targets[key] - sum(item[field] for item in items))
+    return targets
+
+
+def recognizer_from_env(catalog: FoodCatalog = None) -> Optional[FoodRecognizer]:
+    """
+    RECOGNITION_MODEL 경로의 모델로 인식기 생성 (경로가 없거나 선택 의존성이 없으면 None)
+
+    RECOGNITION_LABELS: 한 줄에 라벨 하나인 파일 (모델 메타데이터에 names가 없을 때)
+    RECOGNITION_ALIASES: {"라벨": "카탈로그 음식명"} JSON 파일
+    """
+    model_path = os.getenv('RECOGNITION_MODEL')
+    if not model_path or not recognition_available():
+        return None
+    labels = None
+    if os.getenv('RECOGNITION_LABELS'):
+        with open(os.getenv('RECOGNITION_LABELS'), encoding='utf-8') as f:
+            labels = [line.strip() for line in f if line.strip()]
+    aliases = None
+    if os.getenv('RECOGNITION_ALIASES'):
+        with open(os.getenv('RECOGNITION_ALIASES'), encoding='utf-8') as f:
+            aliases = json.load(f)
+    return FoodRecognizer(
+        model_path,
+        catalog or get_catalog(),
+        labels=labels,
+        aliases=aliases,
+        threads=int(os.getenv('RECOGNITION_THREADS', 0)) or None,
+        max_batch=int(os.getenv('RECOGNITION_MAX_BATCH', MAX_BATCH)),
+        window=float(os.getenv('RECOGNITION_BATCH_WINDOW', BATCH_WINDOW)),
+    )
+
+
+async def read_body(request: Request, limit: int = MAX_IMAGE_BYTES) -> Optional[bytes]:
+    """
+    요청 본문을 limit 바이트까지만 읽음
+
+    Content-Length가 limit을 넘으면 본문을 읽지 않고, 헤더가 없거나 틀려도 받은 양이 limit을 넘는 순간 중단한다.
+
+    Returns:
+        bytes | None (limit을 넘은 경우)
+    """
+    length = request.headers.get('content-length')
+    if length is not None and length.isdigit() and int(length) > limit:
+        return None
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+router = APIRouter()
+recognizer = recognizer_from_env() # 시작 시 모델 로드
+
+@router.post('/')
+async def recognize_food(request: Request, response: Response,
+                         height: Optional[float] = None, weight: Optional[float] = None, age: Optional[int] = None,
+                         gender: Optional[str] = None, activity: Optional[int] = None, goal: Optional[str] = None,
+                         use: Literal["include", "eaten"] = "include",
+                         k: Annotated[int, Query(ge=1, le=10)] = 1):
+    """
+    음식 사진에서 음식을 인식해 카탈로그 영양 정보와 함께 반환
+
+    요청 본문은 이미지 파일 바이트 그대로 (예: curl --data-binary @test-result-1.png)
+
+    Args:
+        height, weight, age, gender, activity, goal: 모두 주면 인식 결과를 반영한 한 끼 추천도 함께 반환
+        use: "include"면 인식된 음식을 포함하는 식단 (한 끼 구성 규칙상 함께 넣을 수 없는 음식은 soft, hard로 풀 수
+             없으면 모두 soft), "eaten"이면 이미 먹은 음식의 영양소와 끼니 구성(음식 수, 주식 등)을 뺀 나머지 식단
+        k: 함께 받을 후보 식단 수 (1-10)
+
+    Returns:
+        dict: detections, items, totals, constraints(INCLUDE_ITEM 제약), unknown, (선택) recommendation
+    """
+    if recognizer is None:
+        response.status_code = 503
+        return {
+            "status": "unavailable",
+            "message": "음식 인식 모델이 준비되지 않았습니다 (RECOGNITION_MODEL, onnxruntime, Pillow 필요)"
+        }
+
+    data = await read_body(request)
+    if not data:
+        response.status_code = 413 if data is None else 400
+        return {
+            "status": "error",
+            "message": "이미지가 없거나 너무 큽니다",
+            "error_details": f"{'최대 크기 초과' if data is None else '0 bytes'} (최대 {MAX_IMAGE_BYTES})"
+        }
+
+    try:
+        result = await recognizer.recognize(data)
+    except Exception as e:
+        response.status_code = 400
+        return {
+            "status": "error",
+            "message": f"이미지를 인식하지 못했습니다: {str(e)}",
+            "error_details": str(e)
+        }
+
+    # main에서 app.state에 넣어 둔 추천기 (/recommend와 같은 캐시와 풀이 풀 사용)
+    recommender = request.app.state.meal_recommender
+    result = {
+        "status": "success",
+        **result,
+        "totals": recommender.calculate_totals(result['items']),
+        "constraints": include_constraints(result['items']),
+    }
+
+    profile = (height, weight, age, gender, activity, goal)
+    if all(value is not None for value in profile):
+        result["recommendation"] = await _recommend_with(recommender, profile, result, use, k, response)
+    return result
+
+async def _solve_with(recommender, targets: dict, k: int, constraints) -> dict:
+    if k > 1:
+        alternatives = await run_in_threadpool(recommender.solve_meal_alternatives, targets, k, constraints)
+        return recommender.alternatives_result(alternatives)
+    selected_foods = await run_in_threadpool(recommender.solve_meal_optimization, targets, constraints)
+    return recommender.meal_result(selected_foods)
+
+async def _recommend_with(recommender, profile: tuple, recognized: dict, use: str, k: int, response: Response) -> dict:
+    # 인식 결과를 포함 제약 또는 먹은 양으로 반영한 추천 (recommend_one_meal과 같은 응답 형식)
+    height, weight, age, gender, activity, goal = profile
+    try:
+        daily_calories = recommender.calculate_daily_calories(weight, height, age, gender, activity, goal)
+        targets = recommender.calculate_meal_targets(daily_calories)
+        constraints = None
+        if use == "include":
+            constraints = recommender.compile_constraints(recognized['constraints'])
+        else:
+            # 먹은 만큼 목표값과 끼니 구성(음식 수, 주식, 종류별 개수)을 줄여 나머지만 추천
+            targets = remaining_targets(targets, recognized['items'])
+            eaten = [recommender.catalog.name_index[item['name']] for item in recognized['items']]
+            constraints = CompiledConstraints(eaten=eaten)
+
+        recommendation = await _solve_with(recommender, targets, k, constraints)
+        if (recommendation['status'] == "fail" and use == "include"
+                and any(c['strength'] == "hard" for c in recognized['constraints'])):
+            # hard 포함으로는 풀 수 없는 경우 (예: 나트륨이 끼니 상한에 가까운 음식) 모두 soft로 다시 풀이
+            soft = include_constraints(recognized['items'], "soft")
+            recommendation = await _solve_with(recommender, targets, k, recommender.compile_constraints(soft))
+        return recommendation
+    except SolverOverloaded as e:
+        # /recommend/와 같이 풀이 풀 포화는 503, 시간 초과는 504 (인식 결과는 그대로 돌려줌)
+        response.status_code = 503
+        response.headers["Retry-After"] = "1"
+        return {
+            "status": "overloaded",
+            "message": "요청이 많아 잠시 후 다시 시도해 주세요",
+            "error_details": str(e)
+        }
+    except SolverTimeout as e:
+        response.status_code = 504
+        return {
+            "status": "timeout",
+            "message": "추천 계산 시간이 초과되었습니다",
+            "error_details": str(e)
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"추천 과정에서 오류가 발생했습니다: {str(e)}",
+            "error_details": str(e)
+        }
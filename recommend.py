@@ -1,161 +1,184 @@
-import pandas as pd
-from pulp import *
-from fastapi import APIRouter
+from typing import Annotated, List, Literal, Optional
+from fastapi import APIRouter, Response, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel
+import asyncio
+import json
+import threading
+import time
+from catalog import FoodCatalog, get_catalog
+from constraint_compiler import CompiledConstraints, compile_constraints
+from recommend_cache import RecommendationCache, quantize_targets, target_key
+from solver_pool import SolverPool, SolverOverloaded, SolverTimeout, pool_from_env
+from solver_backends import SolverSettings, solve_meal, solve_meal_anytime
+from metrics import record_solve, registry, stage
+from nutrition import calculate_daily_calories, calculate_meal_targets
+from nlp import parse_constraints_async # 시작 시 해석 지표(constraint_parses_total, llm_*)도 등록
+from planner import MEAL_SPLITS, day_budgets, solve_plan
 
 class MealRecommendation:
-    def __init__(self):
-        # 음식 데이터 로드
-        self.food_data = pd.read_csv('food_data.csv')
+    def __init__(self, catalog: FoodCatalog = None, cache: RecommendationCache = None, pool: SolverPool = None,
+                 settings: SolverSettings = None):
+        # 공유 카탈로그 사용 (프로세스당 한 번만 로드)
+        self.catalog = catalog or get_catalog()
+        self.food_data = self.catalog.food_data
+        self.cache = cache
+        self.pool = pool
+        self.settings = settings or SolverSettings() # 풀 없이 직접 풀이할 때의 백엔드 설정
     
     def calculate_daily_calories(self, weight: float, height: float, age: int, gender: str, activity: int, goal: str) -> float:
-        # 기초대사량 계산 (Mifflin St. Jeor)
-        s = 5 if gender == "male" else -161
-        bmr = 10 * weight + 6.25 * height - 5 * age + s
-        
-        # 일일 권장 칼로리 계산
-        activity_factor_map = {1: 1.2, 2: 1.375, 3: 1.55, 4: 1.725, 5: 1.9}
-        activity_factor = activity_factor_map[activity]
-        goal_multipliers = {
-            'maintain': 1.0,
-            'loss': 0.85, # 기초대사량 85%
-            'gain': 1.15 # 기초대사량 115%
-        }
-        goal_multiplier = goal_multipliers[goal]
-        
-        daily_calories = bmr * activity_factor * goal_multiplier
-        return daily_calories
-    
-    def calculate_meal_targets(self, daily_calories: float) -> dict:
-        # 한 끼 식사의 영양소 목표값 계산 (일일 권장량의 40%)
-        meal_calories = daily_calories * 0.4
-        
-        carb_ratio = 0.60 # 탄수화물 60%
-        protein_ratio = 0.15 # 단백질 15%
-        fat_ratio = 0.25 # 지방 25%
-        
-        targets = {
-            'calories': meal_calories,
-            'carbs': (meal_calories * carb_ratio) / 4,
-            'protein': (meal_calories * protein_ratio) / 4,
-            'fat': (meal_calories * fat_ratio) / 9,
-            'fiber': max(8, meal_calories / 100), # 최소 8g, 칼로리 100당 1g
-            'sodium': 800, # mg, 일일 권장량의 40%
-            'sugar': meal_calories * 0.1 / 4 # 칼로리의 10% 이하
-        }
+        return calculate_daily_calories(weight, height, age, gender, activity, goal)
+    
+    def calculate_meal_targets(self, daily_calories: float, ratio: float = 0.4) -> dict:
+        return calculate_meal_targets(daily_calories, ratio)
+    
+    def _solve(self, targets: dict, constraints: CompiledConstraints = None):
+        # 풀이 (status, 선택된 인덱스, 캐시해도 되는지 여부)
+        if self.pool is not None:
+            # 프로세스 풀에서 시간 제한을 두고 풀이 (포화 시 SolverOverloaded)
+            result = self.pool.solve(targets, constraints=constraints)
+        else:
+            # 컴파일된 모델(또는 휴리스틱)로 목표값만 교체해 풀이
+            started_at = time.perf_counter()
+            result = solve_meal(self.catalog, targets, self.settings, constraints)
+            record_solve(result, time.perf_counter() - started_at)
+        return result['status'], result['selected'], self._cacheable(result)
+    
+    @staticmethod
+    def _cacheable(result: dict) -> bool:
+        # 최적해와 휴리스틱 전용 경로의 해는 같은 입력에 항상 같으므로 캐시, 시간 제한으로 끊긴 해는 제외
+        return result['complete']
+    
+    def _solve_top_k(self, targets: dict, k: int, constraints: CompiledConstraints = None):
+        # 풀이 (status, [(선택된 인덱스, 목적함수 값), ...], 최적 여부)
+        if self.pool is not None:
+            result = self.pool.solve(targets, k=k, constraints=constraints)
+        else:
+            started_at = time.perf_counter()
+            result = solve_meal(self.catalog, targets, self.settings, constraints, k)
+            record_solve(result, time.perf_counter() - started_at)
+        return result['status'], result['alternatives'], result['optimal']
+    
+    def _store(self, targets: dict, status: int, selected: list, optimal: bool, variant: tuple = ()):
+        # 시간 제한으로 끊긴 해는 캐시하지 않음
+        if self.cache is not None and optimal:
+            self.cache.put(self.catalog.version, targets, (status, selected), variant)
+    
+    def compile_constraints(self, constraints: list) -> CompiledConstraints:
+        # nlp.parse_constraints 결과를 이 카탈로그 기준으로 변환
+        with stage('constraint_compile'):
+            return compile_constraints(constraints, self.catalog)
+    
+    def solve_meal_optimization(self, targets: dict, constraints: CompiledConstraints = None) -> list:
+        """
+        Args:
+            targets: calculate_meal_targets 결과
+            constraints: compile_constraints 결과 (사용자 요청 반영, 없으면 기본 추천)
+        """
+        variant = ()
+        if constraints is not None:
+            targets = constraints.apply_targets(targets)
+            variant = constraints.signature
         
-        return targets
-    
-    def solve_meal_optimization(self, targets: dict) -> list:
-        n_foods = len(self.food_data)
-        
-        # 의사결정 변수: 각 음식의 선택 여부
-        food_vars = [LpVariable(f"food_{i}", cat='Binary') for i in range(n_foods)]
-        
-        prob = LpProblem("meal_recommendation", LpMinimize)
-        
-        # 편차 변수
-        cal_pos = LpVariable("cal_pos", lowBound=0)
-        cal_neg = LpVariable("cal_neg", lowBound=0)
-        protein_pos = LpVariable("protein_pos", lowBound=0)
-        protein_neg = LpVariable("protein_neg", lowBound=0)
-        carb_pos = LpVariable("carb_pos", lowBound=0)
-        carb_neg = LpVariable("carb_neg", lowBound=0)
-        fat_pos = LpVariable("fat_pos", lowBound=0)
-        fat_neg = LpVariable("fat_neg", lowBound=0)
-        
-        # 목적 함수: 가중치 적용 편차 최소화
-        prob += (1 * (cal_pos + cal_neg) +
-                1.5 * (protein_pos + protein_neg) +
-                0.5 * (carb_pos + carb_neg) +
-                0.5 * (fat_pos + fat_neg))
-        
-        # 영양소 제약 조건
-        prob += (lpSum([self.food_data.iloc[i]['칼로리'] * food_vars[i] 
-                       for i in range(n_foods)]) - targets['calories'] 
-                == cal_pos - cal_neg)
-        
-        prob += (lpSum([self.food_data.iloc[i]['단백질'] * food_vars[i] 
-                       for i in range(n_foods)]) - targets['protein'] 
-                == protein_pos - protein_neg)
-        
-        prob += (lpSum([self.food_data.iloc[i]['탄수화물'] * food_vars[i] 
-                       for i in range(n_foods)]) - targets['carbs'] 
-                == carb_pos - carb_neg)
-        
-        prob += (lpSum([self.food_data.iloc[i]['지방'] * food_vars[i] 
-                       for i in range(n_foods)]) - targets['fat'] 
-                == fat_pos - fat_neg)
-        
-        # 총 음식 개수 제한 (4-8개)
-        prob += lpSum(food_vars) >= 4
-        prob += lpSum(food_vars) <= 8
-        
-        # 주식(밥류, 면류, 초밥/롤) 최소 1개
-        main_dishes = [i for i, row in self.food_data.iterrows() 
-                        if row['종류'] in ['밥류', '면류', '초밥/롤']]
-        if main_dishes:
-            prob += lpSum([food_vars[i] for i in main_dishes]) == 1
-        
-        # 과일/채소, 샐러드, 디저트/간식 각각 최대 1개
-        fruits_veggies = [i for i, row in self.food_data.iterrows() 
-                            if row['종류'] == '과일/채소']
-        if fruits_veggies:
-            prob += lpSum([food_vars[i] for i in fruits_veggies]) <= 1
-
-        salad = [i for i, row in self.food_data.iterrows() 
-                            if row['종류'] == '샐러드']
-        if salad:
-            prob += lpSum([food_vars[i] for i in salad]) <= 1
-
-        dessert_snacks = [i for i, row in self.food_data.iterrows() 
-                            if row['종류'] in ['빵/디저트', '튀김/간식']]
-        if dessert_snacks:
-            prob += lpSum([food_vars[i] for i in dessert_snacks]) <= 1
-        
-        # 칼로리 범위 제한 (목표 20% 내외)
-        min_calories = targets['calories'] * 0.8
-        max_calories = targets['calories'] * 1.2
-        prob += lpSum([self.food_data.iloc[i]['칼로리'] * food_vars[i] 
-                        for i in range(n_foods)]) >= min_calories
-        prob += lpSum([self.food_data.iloc[i]['칼로리'] * food_vars[i] 
-                        for i in range(n_foods)]) <= max_calories
-        
-        # 나트륨 범위 제한 (목표 120% 내외)
-        prob += lpSum([self.food_data.iloc[i]['나트륨'] * food_vars[i] 
-                        for i in range(n_foods)]) <= targets['sodium'] * 1.2
-        
-        # 당분 범위 제한 (목표 120% 내외)
-        prob += lpSum([self.food_data.iloc[i]['당'] * food_vars[i] 
-                        for i in range(n_foods)]) <= targets['sugar'] * 1.2
-
-        prob.solve(PULP_CBC_CMD(msg=0))
-        
-        if prob.status == 1:
-            selected_foods = []
-            for i in range(n_foods):
-                if food_vars[i].varValue == 1:
-                    food_name = self.food_data.iloc[i]['음식명']
-                    food_info = {
-                        'name': food_name,
-                        'category': self.food_data.iloc[i]['종류'],
-                        'kcal': float(self.food_data.iloc[i]['칼로리']),
-                        'protein_g': float(self.food_data.iloc[i]['단백질']),
-                        'fat_g': float(self.food_data.iloc[i]['지방']),
-                        'carb_g': float(self.food_data.iloc[i]['탄수화물']),
-                        'sodium_mg': float(self.food_data.iloc[i]['나트륨']),
-                        'sugar_g': float(self.food_data.iloc[i]['당'])
-                    }
-                    selected_foods.append(food_info)
-            return selected_foods
+        if self.cache is not None:
+            # 양자화된 목표값 기준으로 캐시 조회, 없으면 풀이 후 저장
+            targets = quantize_targets(targets)
+            found, cached = self.cache.get(self.catalog.version, targets, variant)
+            if found:
+                status, selected = cached
+            else:
+                status, selected, optimal = self._solve(targets, constraints)
+                self._store(targets, status, selected, optimal, variant)
         else:
-            status_msg = {
-                -1: "최적해를 찾을 수 없음",
-                -2: "제약 조건에 오류가 있음", 
-                -3: "문제가 unbounded임"
-            }
-            print(f"문제 해결 실패: {status_msg.get(prob.status, '알 수 없는 오류')}")
+            status, selected, _ = self._solve(targets, constraints)
+        
+        return self._selected_foods(status, selected)
+    
+    def solve_meal_alternatives(self, targets: dict, k: int, constraints: CompiledConstraints = None) -> list:
+        """
+        서로 다른 상위 k개 식단을 한 번의 풀이 세션에서 생성
+        
+        Returns:
+            list: 목적함수 값이 작은 순서의 {'items': [...], 'objective': float} 리스트 (실패 시 None)
+        """
+        variant = ('top', k)
+        if constraints is not None:
+            targets = constraints.apply_targets(targets)
+            variant += constraints.signature
+        
+        if self.cache is not None:
+            targets = quantize_targets(targets)
+            found, cached = self.cache.get(self.catalog.version, targets, variant)
+            if found:
+                status, alternatives = cached
+            else:
+                status, alternatives, optimal = self._solve_top_k(targets, k, constraints)
+                self._store(targets, status, alternatives, optimal, variant)
+        else:
+            status, alternatives, _ = self._solve_top_k(targets, k, constraints)
+        
+        if not alternatives:
+            self._report_failure(status)
+            return None
+        return [{'items': self._selected_foods(status, selected), 'objective': round(objective, 3)}
+                for selected, objective in alternatives]
+    
+    def stream_meal(self, targets: dict, constraints: CompiledConstraints = None, deadline: float = 10.0):
+        """
+        더 나은 식단을 찾을 때마다 결과를 내보내는 제너레이터 (풀이 풀을 거치지 않고 호출한 스레드에서 풀이)
+        
+        캐시에 있으면 그 결과 하나만, 없으면 휴리스틱 해부터 최적해(또는 deadline 초 시점의 해)까지
+        차례로 내보내고, 마지막 결과를 캐시에 저장한다.
+        
+        Yields:
+            (이벤트 이름 'incumbent' | 'final', meal_result 형식에 objective, gap, optimal 등을 더한 dict)
+        """
+        variant = ()
+        if constraints is not None:
+            targets = constraints.apply_targets(targets)
+            variant = constraints.signature
+        
+        if self.cache is not None:
+            targets = quantize_targets(targets)
+            found, cached = self.cache.get(self.catalog.version, targets, variant)
+            if found:
+                result = self.meal_result(self._selected_foods(*cached))
+                result.update(source="cache", final=True)
+                yield "final", result
+                return
+        
+        for solved in solve_meal_anytime(self.catalog, targets, self.settings, constraints, deadline):
+            if solved['final']:
+                record_solve(solved, solved['elapsed'])
+                self._store(targets, solved['status'], solved['selected'], self._cacheable(solved), variant)
+            result = self.meal_result(self._selected_foods(solved['status'], solved['selected']))
+            result.update(
+                source=solved['backend'],
+                objective=round(solved['objective'], 3) if solved['objective'] is not None else None,
+                gap=round(solved['gap'], 4) if solved['gap'] is not None else None,
+                optimal=solved['optimal'],
+                elapsed_ms=round(solved['elapsed'] * 1000, 1),
+                final=solved['final']
+            )
+            yield ("final" if solved['final'] else "incumbent"), result
+    
+    def _selected_foods(self, status: int, selected: list) -> list:
+        if selected is not None:
+            with stage('result_build'):
+                return [self.catalog.food_info(i) for i in selected]
+        else:
+            self._report_failure(status)
             return None
     
+    def _report_failure(self, status: int):
+        status_msg = {
+            -1: "최적해를 찾을 수 없음",
+            -2: "제약 조건에 오류가 있음", 
+            -3: "문제가 unbounded임"
+        }
+        print(f"문제 해결 실패: {status_msg.get(status, '알 수 없는 오류')}")
+    
     def calculate_totals(self, selected_foods: list) -> dict:
         # 선택된 음식들의 영양소 총합 계산
         if not selected_foods:
@@ -182,10 +205,251 @@ class MealRecommendation:
             totals[key] = round(totals[key], 1)
         
         return totals
+    
+    def plan_meals(self, daily_calories: float, days: int, meals: int, time_limit: float = 10.0) -> dict:
+        """
+        days일 x 하루 meals끼 식단을 하나의 최적화로 계획
+        
+        하루 나트륨/당 예산과 끼니별 칼로리 비율, 같은 음식의 반복 제한을 함께 고려한다.
+        
+        Returns:
+            dict: 일자별 끼니 식단과 하루 영양소 총합
+        """
+        meal_targets = [self.calculate_meal_targets(daily_calories, ratio) for _, ratio in MEAL_SPLITS[meals]]
+        plan = {
+            'meal_targets': meal_targets,
+            'budgets': day_budgets(daily_calories),
+            'days': days,
+            'meals': meals
+        }
+        if self.pool is not None:
+            result = self.pool.solve_plan(plan)
+            status, selected_days, optimal = result['status'], result['days'], result['optimal']
+        else:
+            status, selected_days, optimal = solve_plan(self.catalog, time_limit=time_limit, settings=self.settings, **plan)
+        
+        if selected_days is None:
+            self._report_failure(status)
+            return {
+                "status": "fail"
+            }
+        
+        plan_days = []
+        for day, selected_meals in enumerate(selected_days, 1):
+            day_meals = []
+            for (meal, _), selected in zip(MEAL_SPLITS[meals], selected_meals):
+                items = self._selected_foods(status, selected)
+                day_meals.append({"meal": meal, "items": items, "totals": self.calculate_totals(items)})
+            day_totals = self.calculate_totals([food for m in day_meals for food in m["items"]])
+            plan_days.append({"day": day, "meals": day_meals, "totals": day_totals})
+        
+        return {
+            "status": "success",
+            "optimal": optimal, # False면 최적성이 증명되지 않은 계획
+            "days": plan_days
+        }
+    
+    def meal_result(self, selected_foods: list) -> dict:
+        # 추천 결과 응답 형식
+        if selected_foods is None:
+            return {
+                "status": "fail"
+            }
+        
+        return {
+            "status": "success",
+            "items": selected_foods,
+            "totals": self.calculate_totals(selected_foods)
+        }
+    
+    def alternatives_result(self, alternatives: list) -> dict:
+        # 첫 번째 식단은 기존 형식 그대로, 전체 후보는 alternatives에 순위별로 포함
+        if not alternatives:
+            return {
+                "status": "fail"
+            }
+        
+        result = self.meal_result(alternatives[0]['items'])
+        result["alternatives"] = [
+            {
+                "rank": rank,
+                "objective": alternative['objective'],
+                "items": alternative['items'],
+                "totals": self.calculate_totals(alternative['items'])
+            }
+            for rank, alternative in enumerate(alternatives, 1)
+        ]
+        return result
+    
+    def recommend_batch(self, profiles: list):
+        """
+        여러 사용자 프로필의 한 끼 식사를 입력 순서대로 추천
+        
+        같은 목표값으로 이어지는 프로필은 한 번만 풀이하고, 풀이 풀이 있으면
+        워커 수만큼 미리 제출해 둔다 (대기열 자리는 대화형 요청 몫).
+        
+        Args:
+            profiles: calculate_daily_calories 인자(weight, height, age, gender, activity, goal)를 담은 dict 리스트
+        
+        Yields:
+            dict: 입력 순번(index)이 포함된 항목별 추천 결과
+        """
+        version = self.catalog.version
+        keys = [] # 항목별 목표값 키 (계산 실패 시 예외)
+        unique = {} # 목표값 키 -> 목표값 (처음 등장한 순서)
+        for profile in profiles:
+            try:
+                daily_calories = self.calculate_daily_calories(**profile)
+                targets = quantize_targets(self.calculate_meal_targets(daily_calories))
+            except Exception as e:
+                keys.append(e)
+                continue
+            key = target_key(version, targets)
+            keys.append(key)
+            unique.setdefault(key, targets)
+        
+        solved = {} # 목표값 키 -> (status, selected)
+        pending = []
+        for key, targets in unique.items():
+            found, cached = self.cache.get(version, targets) if self.cache is not None else (False, None)
+            if found:
+                solved[key] = cached
+            else:
+                pending.append(key)
+        
+        # 배치 몫(pool.batch_slots)만큼 앞서 제출해 두고 입력 순서대로 결과를 기다림
+        # 풀 전체를 채우면 그동안 대화형 요청(/recommend/)이 모두 거절되므로 나머지 자리는 남겨 둔다
+        futures = {}
+        queue = iter(pending)
+        def fill():
+            if self.pool is None:
+                return
+            while len(futures) < self.pool.batch_slots:
+                key = next(queue, None)
+                if key is None:
+                    return
+                futures[key] = self.pool.submit(unique[key], block=True)
+        
+        for index, key in enumerate(keys):
+            try:
+                if isinstance(key, Exception):
+                    raise key
+                if key not in solved:
+                    fill()
+                    if key in futures:
+                        result = self.pool.wait(futures.pop(key))
+                        status, selected, optimal = result['status'], result['selected'], self._cacheable(result)
+                    else:
+                        status, selected, optimal = self._solve(unique[key])
+                    self._store(unique[key], status, selected, optimal)
+                    solved[key] = (status, selected)
+                result = self.meal_result(self._selected_foods(*solved[key]))
+            except SolverTimeout as e:
+                result = {"status": "timeout", "error_details": str(e)}
+            except Exception as e:
+                result = {"status": "error", "error_details": str(e)}
+            yield {"index": index, **result}
 
 router = APIRouter()
+recommendation_cache = RecommendationCache()
+solver_pool = pool_from_env()
+meal_recommender = MealRecommendation(cache=recommendation_cache, pool=solver_pool,
+                                      settings=SolverSettings.from_env()) # 시작 시 카탈로그 로드
+recommendation_cache.load_table(meal_recommender.catalog.version) # 사전 계산된 조회 테이블 (있는 경우)
+
+def _collect_metrics():
+    # /metrics에 내보낼 캐시와 풀이 풀 상태
+    cache = recommendation_cache.stats()
+    samples = [
+        ('recommendation_cache_hits_total', 'counter', '추천 캐시 적중 수', [({}, cache['hits'])]),
+        ('recommendation_cache_misses_total', 'counter', '추천 캐시 누락 수', [({}, cache['misses'])]),
+        ('recommendation_cache_entries', 'gauge', '추천 캐시 항목 수',
+         [({'kind': 'memory'}, cache['size']), ({'kind': 'table'}, cache['table_size'])]),
+    ]
+    if solver_pool is not None:
+        pool = solver_pool.stats()
+        samples += [
+            ('solver_pool_workers', 'gauge', '풀이 풀 워커 수', [({}, pool['workers'])]),
+            ('solver_pool_in_flight', 'gauge', '실행 중 + 대기 중인 풀이 수', [({}, pool['in_flight'])]),
+            ('solver_pool_queue_depth', 'gauge', '대기 중인 풀이 수', [({}, pool['queue_depth'])]),
+            ('solver_pool_rejected_total', 'counter', '대기열이 가득 차 거절한 요청 수', [({}, pool['rejected'])]),
+            ('solver_pool_timeouts_total', 'counter', '제한 시간 안에 결과를 받지 못한 요청 수', [({}, pool['timeouts'])]),
+        ]
+    return samples
+
+registry.add_collector(_collect_metrics)
+
+@router.get('/stats')
+def recommend_stats():
+    # 캐시와 풀이 풀의 상태 (대기열 길이, 대기 시간 등)
+    return {
+        "cache": recommendation_cache.stats(),
+        "solver_pool": solver_pool.stats() if solver_pool is not None else None
+    }
+
+@router.get('/plan')
+def recommend_plan(height: float, weight: float, age: int, gender: str, activity: int, goal: str,
+                   days: Annotated[int, Query(ge=1, le=7)] = 1, meals: Annotated[int, Query(ge=1, le=3)] = 3, response: Response = None):
+    """
+    여러 날의 식단을 한 번에 계획
+    
+    Args:
+        height, weight, age, gender, activity, goal: recommend_one_meal과 동일
+        days: 계획 일수 (1-7)
+        meals: 하루 끼니 수 (1-3)
+    
+    Returns:
+        dict: 일자별 끼니 식단과 영양소 총합
+    """
+    try:
+        daily_calories = meal_recommender.calculate_daily_calories(weight, height, age, gender, activity, goal)
+        return meal_recommender.plan_meals(daily_calories, days, meals)
+    
+    except SolverOverloaded as e:
+        if response is not None:
+            response.status_code = 503
+            response.headers["Retry-After"] = "1"
+        return {
+            "status": "overloaded",
+            "message": "요청이 많아 잠시 후 다시 시도해 주세요",
+            "error_details": str(e)
+        }
+    
+    except SolverTimeout as e:
+        if response is not None:
+            response.status_code = 504
+        return {
+            "status": "timeout",
+            "message": "계획 계산 시간이 초과되었습니다",
+            "error_details": str(e)
+        }
+    
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"추천 과정에서 오류가 발생했습니다: {str(e)}",
+            "error_details": str(e)
+        }
+
+def _recommend_one_meal(height: float, weight: float, age: int, gender: str, activity: int, goal: str,
+                        k: int, constraints: CompiledConstraints = None) -> dict:
+    # 풀이 대기 동안 블로킹되므로 스레드 풀에서 실행
+    with stage('targets'):
+        daily_calories = meal_recommender.calculate_daily_calories(weight, height, age, gender, activity, goal)
+        meal_targets = meal_recommender.calculate_meal_targets(daily_calories)
+    
+    if k > 1:
+        alternatives = meal_recommender.solve_meal_alternatives(meal_targets, k, constraints)
+        return meal_recommender.alternatives_result(alternatives)
+    
+    selected_foods = meal_recommender.solve_meal_optimization(meal_targets, constraints)
+    
+    return meal_recommender.meal_result(selected_foods)
+
 @router.get('/')
-def recommend_one_meal(height: float, weight: float, age: int, gender: str, activity: int, goal: str):
+async def recommend_one_meal(height: float, weight: float, age: int, gender: str, activity: int, goal: str,
+                       k: Annotated[int, Query(ge=1, le=10)] = 1, preference: Optional[str] = None,
+                       response: Response = None):
     """
     사용자 정보를 바탕으로 한 끼 식사 추천
     
@@ -196,32 +460,179 @@ def recommend_one_meal(height: float, weight: float, age: int, gender: str, acti
         gender: 성별 ('male' 또는 'female')
         activity: 활동 수준 (1-5)
         goal: 목표 ('maintain', 'loss', 'gain')
+        k: 함께 받을 서로 다른 후보 식단 수 (1-10)
+        preference: 자연어 요청 (예: "맵지 않게, 불고기는 빼고"), 제약 조건으로 해석해 반영
     
     Returns:
-        dict: 추천 식단과 영양소 총합 정보
+        dict: 추천 식단과 영양소 총합 정보 (k > 1이면 순위별 후보 식단 alternatives 포함)
     """
-    meal_recommender = MealRecommendation()
     try:
-        daily_calories = meal_recommender.calculate_daily_calories(weight, height, age, gender, activity, goal)
-        meal_targets = meal_recommender.calculate_meal_targets(daily_calories)
-        selected_foods = meal_recommender.solve_meal_optimization(meal_targets)
-        
-        if selected_foods is None:
-            return {
-                "status": "fail"
-            }
+        constraints = None
+        if preference:
+            # LLM 응답은 이벤트 루프에서 기다려 워커 스레드를 점유하지 않음
+            with stage('constraint_parse'):
+                parsed = await parse_constraints_async(preference)
+            constraints = meal_recommender.compile_constraints(parsed)
         
-        totals = meal_recommender.calculate_totals(selected_foods)
+        return await run_in_threadpool(_recommend_one_meal, height, weight, age, gender, activity, goal, k, constraints)
         
+    except SolverOverloaded as e:
+        # 대기열이 가득 찬 경우 작업을 쌓지 않고 바로 거절
+        if response is not None:
+            response.status_code = 503
+            response.headers["Retry-After"] = "1"
         return {
-            "status": "success",
-            "items": selected_foods,
-            "totals": totals
+            "status": "overloaded",
+            "message": "요청이 많아 잠시 후 다시 시도해 주세요",
+            "error_details": str(e)
         }
-        
+    
+    except SolverTimeout as e:
+        if response is not None:
+            response.status_code = 504
+        return {
+            "status": "timeout",
+            "message": "추천 계산 시간이 초과되었습니다",
+            "error_details": str(e)
+        }
+    
     except Exception as e:
         return {
             "status": "error",
             "message": f"추천 과정에서 오류가 발생했습니다: {str(e)}",
             "error_details": str(e)
-        }
\ No newline at end of file
+        }
+
+def _sse(event: str, data: dict) -> str:
+    # Server-Sent Events 메시지 한 건
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _stream_meal_events(height: float, weight: float, age: int, gender: str, activity: int, goal: str,
+                        constraints: CompiledConstraints, deadline: float, cancelled: threading.Event):
+    # 스레드 하나에서 끝까지 실행 (모델 인스턴스가 스레드별이므로 단계마다 스레드를 바꾸지 않음)
+    with stage('targets'):
+        daily_calories = meal_recommender.calculate_daily_calories(weight, height, age, gender, activity, goal)
+        meal_targets = meal_recommender.calculate_meal_targets(daily_calories)
+    for event in meal_recommender.stream_meal(meal_targets, constraints, deadline):
+        if cancelled.is_set():
+            return
+        yield event
+
+class _ReservedStreamingResponse(StreamingResponse):
+    # 본문을 보내기 전에 연결이 끊겨 제너레이터가 시작되지 않은 경우에도 on_close 호출
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
+
+@router.get('/stream')
+async def recommend_stream(height: float, weight: float, age: int, gender: str, activity: int, goal: str,
+                           preference: Optional[str] = None,
+                           deadline: Annotated[float, Query(gt=0, le=60)] = 10.0):
+    """
+    한 끼 식사 추천을 Server-Sent Events로 점진적으로 전송
+    
+    처음 찾은 식단(휴리스틱, 수십 ms)을 바로 보내고, 더 나은 식단을 찾을 때마다 다시 보낸다.
+    최적해를 찾거나 deadline 초가 지나면 final 이벤트로 끝난다.
+    
+    Args:
+        height, weight, age, gender, activity, goal, preference: recommend_one_meal과 동일
+        deadline: 최대 풀이 시간 (초)
+    
+    Returns:
+        text/event-stream: incumbent 이벤트 0개 이상과 final 이벤트 1개 (실패 시 error 이벤트)
+            data는 recommend_one_meal 결과에 source, objective, gap, optimal, elapsed_ms, final을 더한 JSON
+            풀이 풀이 가득 차면 스트림 대신 503 (Retry-After)
+    """
+    # 풀이는 요청 스레드에서 하지만 풀의 자리 하나를 끝날 때까지 차지해 동시 풀이 수를 함께 제한
+    release = None
+    if solver_pool is not None:
+        try:
+            release = solver_pool.reserve()
+        except SolverOverloaded as e:
+            return JSONResponse(status_code=503, headers={"Retry-After": "1"}, content={
+                "status": "overloaded",
+                "message": "요청이 많아 잠시 후 다시 시도해 주세요",
+                "error_details": str(e)
+            })
+    scheduled = threading.Event() # 풀이 스레드를 시작했는지 (시작했으면 그 스레드가 자리를 반환)
+    
+    def release_unscheduled():
+        if release is not None and not scheduled.is_set():
+            release()
+    
+    async def events():
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        cancelled = threading.Event()
+        
+        def produce(constraints):
+            try:
+                for event in _stream_meal_events(height, weight, age, gender, activity, goal,
+                                                 constraints, deadline, cancelled):
+                    loop.call_soon_threadsafe(queue.put_nowait, event)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, ("error", {
+                    "status": "error",
+                    "message": f"추천 과정에서 오류가 발생했습니다: {str(e)}",
+                    "error_details": str(e)
+                }))
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+                if release is not None:
+                    release()
+        
+        try:
+            constraints = None
+            if preference:
+                with stage('constraint_parse'):
+                    parsed = await parse_constraints_async(preference)
+                constraints = meal_recommender.compile_constraints(parsed)
+            scheduled.set()
+            producer = asyncio.ensure_future(run_in_threadpool(produce, constraints))
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield _sse(*item)
+            await producer
+        except Exception as e:
+            yield _sse("error", {
+                "status": "error",
+                "message": f"추천 과정에서 오류가 발생했습니다: {str(e)}",
+                "error_details": str(e)
+            })
+        finally:
+            # 클라이언트가 연결을 끊으면 다음 단계부터 풀이 중단
+            cancelled.set()
+            release_unscheduled()
+    
+    return _ReservedStreamingResponse(events(), release_unscheduled, media_type="text/event-stream",
+                                      headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+class UserProfile(BaseModel):
+    height: float # 키 (cm)
+    weight: float # 몸무게 (kg)
+    age: int # 나이
+    gender: Literal["male", "female"] # 성별
+    activity: int # 활동 수준 (1-5)
+    goal: Literal["maintain", "loss", "gain"] # 목표
+
+@router.post('/batch')
+def recommend_batch(profiles: List[UserProfile]):
+    """
+    여러 사용자의 한 끼 식사를 한 번에 추천
+    
+    Returns:
+        NDJSON 스트림: 입력 순서대로 한 줄에 한 항목 ({"index": ..., "status": ..., ...})
+    """
+    def lines():
+        for result in meal_recommender.recommend_batch([p.model_dump() for p in profiles]):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
\ No newline at end of file
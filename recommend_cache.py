@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_TABLE_PATH = os.getenv(
+    'RECOMMEND_LOOKUP_TABLE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recommend_lookup.json')
+)
+
+# 목표값 양자화 단위 (이 단위 안의 차이는 같은 문제로 취급)
+TARGET_QUANTUM = {
+    'calories': 10,
+    'carbs': 2,
+    'protein': 1,
+    'fat': 1,
+    'fiber': 1,
+    'sodium': 10,
+    'sugar': 1,
+}
+
+# 오프라인 사전 계산 범위 (일일 권장 칼로리, kcal)
+# 한 끼 = 40% 이므로 25kcal 간격이면 한 끼 칼로리 양자화 단위(10kcal)와 같다
+TABLE_DAILY_CALORIES = range(1000, 5001, 25)
+
+
+def quantize_targets(targets: dict) -> dict:
+    # 각 목표값을 양자화 단위의 중심값으로 맞춤
+    return {key: round(value / TARGET_QUANTUM[key]) * TARGET_QUANTUM[key] if key in TARGET_QUANTUM else value
+            for key, value in targets.items()}
+
+
+def target_key(version: str, targets: dict, variant: tuple = ()) -> tuple:
+    # variant: 같은 목표값에 대한 다른 종류의 결과 구분 (예: 상위 k개)
+    return (version,) + tuple(round(targets[key] / TARGET_QUANTUM[key]) for key in TARGET_QUANTUM) + variant
+
+
+class RecommendationCache:
+    """
+    양자화된 목표값 + 카탈로그 버전을 키로 하는 추천 결과 캐시 (LRU + TTL)
+
+    사전 계산된 조회 테이블(load_table)은 만료되지 않으며 LRU 용량에도 포함되지 않는다.
+    기본 값은 (풀이 상태, 선택된 음식 인덱스 리스트 | None) 이다.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._table = {}
+        self._lock = threading.Lock()
+
+    def get(self, version: str, targets: dict, variant: tuple = ()):
+        """
+        Returns:
+            (찾았는지 여부, 저장된 값)
+        """
+        key = target_key(version, targets, variant)
+        with self._lock:
+            value = self._table.get(key)
+            if value is not None:
+                self.hits += 1
+                return True, value
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+
+            self.misses += 1
+            return False, None
+
+    def put(self, version: str, targets: dict, value: tuple, variant: tuple = ()):
+        key = target_key(version, targets, variant)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._entries),
+                'table_size': len(self._table),
+            }
+
+    def load_table(self, version: str, path: str = DEFAULT_TABLE_PATH) -> int:
+        # 사전 계산된 조회 테이블 로드 (다른 카탈로그 버전의 테이블은 무시)
+        if not os.path.exists(path):
+            return 0
+        with open(path, encoding='utf-8') as f:
+            table = json.load(f)
+        if table.get('version') != version:
+            print(f"조회 테이블 버전 불일치로 무시: {table.get('version')} != {version}")
+            return 0
+
+        entries = {}
+        for entry in table['entries']:
+            targets = entry['targets']
+            entries[target_key(version, targets)] = (entry['status'], entry['selected'])
+        with self._lock:
+            self._table = entries
+        return len(entries)
+
+
+def _solve_table_entry(targets: dict, settings) -> dict:
+    from catalog import get_catalog
+    from solver_backends import solve_meal
+
+    result = solve_meal(get_catalog(), targets, settings)
+    return {'targets': targets, 'status': result['status'], 'selected': result['selected'],
+            'complete': result['complete']}
+
+
+def build_table(path: str = DEFAULT_TABLE_PATH, daily_calories=TABLE_DAILY_CALORIES, workers: int = None,
+                settings=None) -> int:
+    """
+    실용적인 칼로리 범위 전체를 미리 풀어 조회 테이블 파일로 저장
+
+    요청 경로와 같은 설정(SOLVER_BACKEND 등, 시간 제한 SOLVER_TIME_LIMIT)으로 풀고,
+    시간 제한으로 끊긴 해는 테이블에 넣지 않는다 (요청 시 다시 풀이).
+    """
+    from catalog import get_catalog
+    from nutrition import calculate_meal_targets
+    from solver_backends import SolverSettings
+
+    settings = settings or SolverSettings.from_env(float(os.getenv('SOLVER_TIME_LIMIT', 10)))
+    version = get_catalog().version
+    unique = {}
+    for calories in daily_calories:
+        targets = quantize_targets(calculate_meal_targets(calories))
+        unique.setdefault(target_key(version, targets), targets)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        solved = list(executor.map(_solve_table_entry, unique.values(), [settings] * len(unique)))
+    entries = [{key: entry[key] for key in ('targets', 'status', 'selected')} for entry in solved if entry['complete']]
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'version': version, 'entries': entries}, f, ensure_ascii=False)
+    return len(entries)
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    count = build_table()
+    print(f"{count}개 항목 저장 ({time.perf_counter() - start:.1f}s): {DEFAULT_TABLE_PATH}")
@@ -0,0 +1,374 @@
+import os
+import re
+import tempfile
+import threading
+import time
+import numpy as np
+import pulp
+from pulp import PULP_CBC_CMD
+from pulp.constants import LpStatusOptimal, LpStatusInfeasible, LpStatusNotSolved
+from catalog import FoodCatalog
+from heuristic import MealHeuristic
+from meal_model import MealModelTemplate, get_template
+from metrics import stage
+
+# auto: HiGHS가 있으면 HiGHS, 없으면 CBC로 MILP 풀이 (휴리스틱 해로 웜 스타트)
+BACKENDS = ('auto', 'cbc', 'highs', 'heuristic')
+
+HEURISTIC_ONLY_SIZE = 20000 # auto에서 후보 음식이 이보다 많으면 MILP 모델을 만들지 않고 휴리스틱만 사용
+HEURISTIC_BOUNDS = ('sodium_max', 'sugar_max') # 휴리스틱이 지킬 수 있는 사용자 영양소 범위
+HEURISTIC_KICKS = 16 # 휴리스틱 반복 지역 탐색 횟수
+STAGE_LIMITS = (0.2, 0.8, 3.2) # 단계별 풀이의 시간 제한(초), 이후에는 남은 시간 전체
+CUTOFF_MARGIN = 1e-6 # 단계별 풀이에서 현재 해보다 이만큼 이상 좋은 해만 찾도록 하는 여유
+
+
+class SolverSettings:
+    """
+    한 끼 풀이 방식 설정 (풀이 풀 워커로 넘길 수 있도록 단순한 값만 보관)
+
+    Attributes:
+        backend: BACKENDS 중 하나
+        time_limit: MILP 풀이 시간 제한(초, None이면 제한 없음)
+        gap: MILP 상대 최적성 갭 (예: 0.01이면 하한과 1% 이내에서 중단, None이면 솔버 기본값)
+        warm_start: 휴리스틱 해를 MILP 초기해로 넘길지 여부 (CBC는 초기해에 따라 탐색 경로가 바뀌어
+            오히려 느려지는 경우가 많아 기본값은 끔, bench/solver_bench.py로 비교)
+        bound: 최적성이 증명되지 않은 MILP 해에 대해 LP 완화 하한을 따로 풀어 하한으로 쓸지 여부 (기본값은 끔)
+
+    최적성이 증명되지 않은 해의 gap은 (목적함수 값 - 하한) / 목적함수 값이다. 하한은 CBC가 시간 제한에 걸릴 때
+    로그에 남기는 분기 한정 하한(루트 절단 평면 포함)과, bound면 LP 완화 하한 중 큰 값이다. 목적함수가 영양소
+    편차의 합이라 LP 완화 하한은 거의 0이고 CBC 하한도 약하다 (예: 0.3초 해 8.69, 최적해 8.59, 하한 0.86, 갭 0.90).
+    따라서 gap은 최적해와의 실제 차이가 아니라 그보다 훨씬 큰 보장값일 뿐이다. HiGHS는 로그를 읽지 않으므로 bound일
+    때만, 휴리스틱만 쓴 해와 상위 k개 풀이는 하한을 계산하지 않아 gap이 None이다.
+    """
+
+    def __init__(self, backend: str = 'auto', time_limit: float = None, gap: float = None,
+                 warm_start: bool = False, bound: bool = False):
+        if backend not in BACKENDS:
+            raise ValueError(f"알 수 없는 솔버입니다: {backend} (가능한 값: {', '.join(BACKENDS)})")
+        self.backend = backend
+        self.time_limit = time_limit
+        self.gap = gap
+        self.warm_start = warm_start
+        self.bound = bound
+
+    @classmethod
+    def from_env(cls, time_limit: float = None) -> 'SolverSettings':
+        # SOLVER_BACKEND, SOLVER_GAP, SOLVER_WARM_START, SOLVER_BOUND(1이면 켬)
+        gap = os.getenv('SOLVER_GAP')
+        return cls(
+            backend=os.getenv('SOLVER_BACKEND', 'auto'),
+            time_limit=time_limit,
+            gap=float(gap) if gap else None,
+            warm_start=os.getenv('SOLVER_WARM_START', '0') == '1',
+            bound=os.getenv('SOLVER_BOUND', '0') == '1',
+        )
+
+
+def highs_available() -> bool:
+    # highspy 패키지(HiGHS) 또는 highs 실행 파일
+    return bool(pulp.HiGHS().available() or pulp.HiGHS_CMD().available())
+
+
+def available_backends() -> list:
+    return [backend for backend in BACKENDS if backend != 'highs' or highs_available()]
+
+
+def milp_solver(backend: str = 'auto', time_limit: float = None, gap: float = None,
+                warm_start: bool = False, mip: bool = True, cutoff: float = None, log_path: str = None):
+    """
+    Args:
+        backend: 'cbc', 'highs' 또는 'auto' (HiGHS가 있으면 HiGHS)
+        mip: False면 정수 조건을 무시하고 LP 완화 문제로 풀이
+        cutoff: 목적함수 값이 이보다 작은 해만 탐색 (CBC만 지원, 없으면 풀이 결과가 infeasible)
+        log_path: 솔버 로그를 남길 파일 (CBC만 지원, solver_log로 노드 수와 하한을 읽음)
+
+    Returns:
+        PuLP 솔버 (HiGHS를 요청했는데 설치되어 있지 않으면 ValueError)
+    """
+    if backend == 'auto':
+        backend = 'highs' if highs_available() else 'cbc'
+    if backend == 'cbc':
+        options = [f'cutoff {cutoff}'] if cutoff is not None else []
+        return PULP_CBC_CMD(mip=mip, msg=0, timeLimit=time_limit, gapRel=gap, warmStart=warm_start, options=options,
+                            logPath=log_path)
+    if backend == 'highs':
+        if pulp.HiGHS().available():
+            return pulp.HiGHS(mip=mip, msg=False, timeLimit=time_limit, gapRel=gap)
+        if pulp.HiGHS_CMD().available():
+            return pulp.HiGHS_CMD(mip=mip, msg=False, timeLimit=time_limit, gapRel=gap, warmStart=warm_start)
+        raise ValueError("HiGHS가 설치되어 있지 않습니다 (pip install highspy)")
+    raise ValueError(f"MILP 솔버가 아닙니다: {backend}")
+
+
+def solver_log_path(backend: str):
+    # 노드 수를 읽을 CBC 로그용 임시 파일 (CBC가 아니면 None)
+    if backend != 'cbc':
+        return None
+    fd, path = tempfile.mkstemp(prefix='cbc-', suffix='.log')
+    os.close(fd)
+    return path
+
+
+def solver_log(log_path: str):
+    """
+    CBC 로그의 분기 한정 노드 수와 목적함수 하한 (읽은 뒤 로그 파일 삭제)
+
+    Returns:
+        (노드 수 | None, 하한 | None), 하한은 시간 제한에 걸린 경우의 'Lower bound' 또는 마지막 'best possible'
+    """
+    if log_path is None:
+        return None, None
+    try:
+        with open(log_path, encoding='utf-8', errors='replace') as f:
+            log = f.read()
+    except OSError:
+        return None, None
+    finally:
+        if os.path.exists(log_path):
+            os.remove(log_path)
+    nodes = re.findall(r'Enumerated nodes:\s+(\d+)', log)
+    bounds = (re.findall(r'Lower bound:\s+(-?[\d.]+(?:e[+-]?\d+)?)', log)
+              or re.findall(r'best possible (-?[\d.]+(?:e[+-]?\d+)?)', log))
+    return int(nodes[-1]) if nodes else None, float(bounds[-1]) if bounds else None
+
+
+_heuristics = {}
+_heuristics_lock = threading.Lock()
+
+
+def get_heuristic(catalog: FoodCatalog) -> MealHeuristic:
+    # 카탈로그 버전별로 한 번만 특성 행렬을 만듦
+    with _heuristics_lock:
+        heuristic = _heuristics.get(catalog.version)
+        if heuristic is None:
+            heuristic = _heuristics[catalog.version] = MealHeuristic(catalog)
+    return heuristic
+
+
+def heuristic_supported(constraints=None, k: int = 1) -> bool:
+    # 휴리스틱은 후보 제한, 선호 비용, 나트륨/당 상한만 다룸 (포함 고정, 종류별 최소, 먹은 음식, 상위 k개는 MILP)
+    if k > 1:
+        return False
+    if constraints is None:
+        return True
+    return (not constraints.include and not constraints.at_least and not constraints.eaten
+            and all(name in HEURISTIC_BOUNDS for name in constraints.bounds))
+
+
+def solve_heuristic(catalog: FoodCatalog, targets: dict, constraints=None):
+    """
+    Args:
+        targets: 영양소 목표값 (apply_targets까지 반영된 값)
+        constraints: heuristic_supported를 만족하는 compile_constraints 결과
+
+    Returns:
+        (선택된 음식 인덱스 리스트 | None, 선호 비용을 포함한 목적함수 값 | None)
+    """
+    heuristic = get_heuristic(catalog)
+    available, costs = None, None
+    sodium_cap, sugar_cap = targets['sodium'] * 1.2, targets['sugar'] * 1.2
+    if constraints is not None:
+        if constraints.candidates is not None:
+            available = np.zeros(catalog.size, dtype=bool)
+            available[constraints.candidates] = True
+        if constraints.costs:
+            costs = np.zeros(catalog.size)
+            costs[list(constraints.costs)] = list(constraints.costs.values())
+        sodium_cap = min(sodium_cap, constraints.bounds.get('sodium_max', sodium_cap))
+        sugar_cap = min(sugar_cap, constraints.bounds.get('sugar_max', sugar_cap))
+
+    with stage('heuristic'):
+        selected = heuristic.solve(targets, available, sodium_cap, sugar_cap, costs=costs, kicks=HEURISTIC_KICKS)
+    if selected is None:
+        return None, None
+    selected = sorted(selected)
+    objective = heuristic.objective(selected, targets) + (float(costs[selected].sum()) if costs is not None else 0.0)
+    return selected, objective
+
+
+def quality_gap(objective: float, bound: float):
+    # (목적함수 값 - 하한) / 목적함수 값, 목적함수 값이 0에 가까우면 1을 기준으로 사용 (하한이 약하면 1에 가까움)
+    if objective is None or bound is None:
+        return None
+    return max(0.0, objective - bound) / max(abs(objective), 1.0)
+
+
+def solve_meal(catalog: FoodCatalog, targets: dict, settings: SolverSettings = None, constraints=None,
+               k: int = 1, template: MealModelTemplate = None) -> dict:
+    """
+    설정된 백엔드로 한 끼 식단 풀이 (요청 스레드와 풀이 풀 워커에서 함께 쓰는 진입점)
+
+    - heuristic: NumPy 휴리스틱만 사용 (다룰 수 없는 제약이거나 해를 못 찾으면 MILP)
+    - cbc/highs: MILP, warm_start면 휴리스틱 해를 초기해로 넘김
+    - auto: 후보가 HEURISTIC_ONLY_SIZE보다 많으면 heuristic, 아니면 HiGHS/CBC
+    시간 제한에 걸리고 MILP 정수해가 없으면 휴리스틱 해를 돌려준다. 최적성이 증명되지 않은 해에는 하한(bound)과의
+    상대 차이(gap)를 함께 돌려준다 (하한의 출처와 한계는 SolverSettings 참고).
+    template을 주면 후보 집합별 공유 템플릿 대신 그 모델에 후보를 변수 상한으로 반영해 푼다
+    (계획 풀이처럼 후보가 자주 바뀌어 공유 템플릿 캐시를 밀어낼 수 있는 경우).
+
+    Returns:
+        dict: status, selected (k > 1이면 alternatives), optimal, objective, bound, gap, backend, heuristic_time,
+            nodes (CBC 분기 한정 노드 수, MILP를 풀지 않았으면 없음),
+            complete (다시 풀어도 같은 결과인지: 최적해이거나 휴리스틱만 쓰는 경로, 캐시 여부 판단용)
+    """
+    settings = settings or SolverSettings()
+    candidates = constraints.candidates if constraints is not None else None
+    n_candidates = catalog.size if candidates is None else len(candidates)
+    use_heuristic = heuristic_supported(constraints, k)
+
+    backend = settings.backend
+    if backend == 'auto':
+        backend = 'heuristic' if n_candidates > HEURISTIC_ONLY_SIZE else ('highs' if highs_available() else 'cbc')
+
+    initial, initial_objective, heuristic_time = None, None, 0.0
+    if use_heuristic and (backend == 'heuristic' or settings.warm_start):
+        started_at = time.perf_counter()
+        initial, initial_objective = solve_heuristic(catalog, targets, constraints)
+        heuristic_time = time.perf_counter() - started_at
+
+    if backend == 'heuristic' and initial is not None:
+        # 하한 계산을 위해 MILP 모델을 만들지 않음
+        return {
+            'status': LpStatusOptimal, 'selected': initial, 'optimal': False,
+            'objective': initial_objective, 'bound': None, 'gap': None,
+            'backend': 'heuristic', 'heuristic_time': heuristic_time, 'complete': True,
+        }
+    if backend == 'heuristic':
+        backend = 'highs' if highs_available() else 'cbc'
+
+    model = (template or get_template(catalog, candidates)).instance()
+    warm = initial is not None and model.warm_start(initial, targets)
+    log_path = solver_log_path(backend)
+    solver = milp_solver(backend, settings.time_limit, settings.gap, warm_start=warm, log_path=log_path)
+    result = {'backend': backend, 'heuristic_time': heuristic_time}
+    if k > 1:
+        try:
+            status, alternatives, optimal = model.solve_top_k(targets, k, solver, constraints)
+        finally:
+            result['nodes'], _ = solver_log(log_path) # 마지막 풀이의 노드 수
+        result.update(status=status, alternatives=alternatives, optimal=optimal, bound=None, gap=None,
+                      objective=alternatives[0][1] if alternatives else None, complete=optimal)
+        return result
+
+    try:
+        status, selected = model.solve(targets, solver, constraints)
+    finally:
+        result['nodes'], log_bound = solver_log(log_path)
+    optimal, objective = model.optimal, model.objective
+    if selected is None and status != LpStatusInfeasible and use_heuristic:
+        # 시간 제한 안에 정수해를 못 찾은 경우 휴리스틱 해 사용
+        if initial is None:
+            started_at = time.perf_counter()
+            initial, initial_objective = solve_heuristic(catalog, targets, constraints)
+            result['heuristic_time'] = time.perf_counter() - started_at
+        if initial is not None:
+            status, selected, objective, optimal = LpStatusOptimal, initial, initial_objective, False
+            result['backend'] = 'heuristic'
+
+    bound = None
+    if optimal and not settings.gap:
+        # 갭 허용 없이 최적성이 증명된 경우
+        bound = objective
+    elif selected is not None:
+        # 휴리스틱 해로 대신한 경우에도 MILP 하한은 그대로 성립
+        bound = log_bound
+        if settings.bound:
+            relaxed = model.relaxation_bound(targets, constraints, milp_solver(backend, mip=False))
+            if relaxed is not None:
+                bound = relaxed if bound is None else max(bound, relaxed)
+    result.update(status=status, selected=selected, optimal=optimal and selected is not None,
+                  objective=objective, bound=bound, gap=quality_gap(objective, bound),
+                  complete=optimal and selected is not None)
+    return result
+
+
+def solve_meal_anytime(catalog: FoodCatalog, targets: dict, settings: SolverSettings = None, constraints=None,
+                       deadline: float = 10.0):
+    """
+    점점 나아지는 식단을 찾는 대로 내보내는 제너레이터 (스트리밍 추천용)
+
+    휴리스틱 해를 먼저 내보낸 뒤 시간 제한을 늘려 가며(STAGE_LIMITS) MILP를 다시 풀고,
+    나아진 해만 내보낸다. CBC는 각 단계에서 현재 해보다 좋은 해만 찾도록 cutoff를 주므로, 더 좋은 해가
+    없다고 나오면(infeasible) 현재 해가 최적이다. 최적성이 증명되거나 deadline(초)이 지나면
+    final=True인 마지막 결과를 내보내고 끝난다.
+
+    Yields:
+        dict: status, selected, objective, bound, gap, optimal, backend, elapsed(초), final, complete
+    """
+    settings = settings or SolverSettings()
+    started_at = time.perf_counter()
+    candidates = constraints.candidates if constraints is not None else None
+    n_candidates = catalog.size if candidates is None else len(candidates)
+    backend = settings.backend
+    if backend == 'auto':
+        backend = 'heuristic' if n_candidates > HEURISTIC_ONLY_SIZE else ('highs' if highs_available() else 'cbc')
+
+    best, best_objective, best_backend = None, None, None
+    bound = None
+
+    def event(status, optimal=False, final=False, complete=None):
+        return {
+            'complete': optimal if complete is None else complete,
+            'status': status, 'selected': best, 'objective': best_objective,
+            'bound': best_objective if optimal and not settings.gap else bound,
+            'gap': 0.0 if optimal and not settings.gap else quality_gap(best_objective, bound),
+            'optimal': optimal, 'backend': best_backend,
+            'elapsed': time.perf_counter() - started_at, 'final': final,
+        }
+
+    if heuristic_supported(constraints):
+        best, best_objective = solve_heuristic(catalog, targets, constraints)
+        if best is not None:
+            best_backend = 'heuristic'
+            if backend == 'heuristic':
+                yield event(LpStatusOptimal, final=True, complete=True)
+                return
+            yield event(LpStatusOptimal)
+    if backend == 'heuristic':
+        backend = 'highs' if highs_available() else 'cbc'
+
+    model = get_template(catalog, candidates).instance()
+    if settings.bound:
+        bound = model.relaxation_bound(targets, constraints, milp_solver(backend, mip=False))
+
+    status = LpStatusOptimal if best is not None else LpStatusNotSolved
+    for limit in STAGE_LIMITS + (None,):
+        remaining = deadline - (time.perf_counter() - started_at)
+        if remaining <= 0:
+            break
+        limit = remaining if limit is None else min(limit, remaining)
+        cutoff = best_objective - CUTOFF_MARGIN if best is not None else None
+        log_path = solver_log_path(backend)
+        solver = milp_solver(backend, limit, settings.gap, cutoff=cutoff, log_path=log_path)
+        try:
+            stage_status, selected = model.solve(targets, solver, constraints)
+        finally:
+            _, stage_bound = solver_log(log_path)
+        if stage_bound is not None:
+            # cutoff가 있으면 하한은 현재 해보다 좋은 해들의 하한이므로 현재 해의 값까지만 인정
+            if best is not None:
+                stage_bound = min(stage_bound, best_objective)
+            bound = stage_bound if bound is None else max(bound, stage_bound)
+
+        if selected is not None and model.optimal:
+            best, best_objective, best_backend, status = selected, model.objective, backend, stage_status
+            yield event(status, optimal=True, final=True)
+            return
+        if selected is not None:
+            # cutoff를 지원하지 않는 솔버는 현재 해보다 나쁜 해를 돌려줄 수 있음
+            if best is None or model.objective < best_objective - CUTOFF_MARGIN:
+                best, best_objective, best_backend, status = selected, model.objective, backend, stage_status
+                yield event(status)
+        elif stage_status == LpStatusInfeasible:
+            # CBC에 cutoff를 준 경우에만 현재 해보다 좋은 해가 없다는 증명 (cutoff를 무시하는 솔버에서는
+            # 휴리스틱 해가 있는데 infeasible이면 증명이 아니므로 최적이라고 하지 않음), 해가 없으면 제약을 만족하는 식단이 없음
+            if best is not None and cutoff is not None and backend == 'cbc':
+                yield event(status, optimal=True, final=True)
+            elif best is not None:
+                yield event(status, final=True)
+            else:
+                yield event(stage_status, final=True)
+            return
+
+    # 시간 초과: 지금까지 찾은 가장 좋은 해
+    yield event(status, final=True)
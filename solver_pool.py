@@ -0,0 +1,231 @@
+import os
+import threading
+import time
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from catalog import DEFAULT_CATALOG_PATH, get_catalog
+from meal_model import get_template
+from metrics import collect, observe_stage, record_solve, record_timings
+from planner import solve_plan
+from solver_backends import HEURISTIC_ONLY_SIZE, SolverSettings, get_heuristic, solve_meal
+
+
+class SolverOverloaded(Exception):
+    """대기열이 가득 차 새 풀이 요청을 받을 수 없음"""
+
+
+class SolverTimeout(Exception):
+    """풀이 결과를 제한 시간 안에 받지 못함"""
+
+
+def _warm_up(catalog_path: str, settings: SolverSettings):
+    # 워커 프로세스 시작 시 카탈로그와 휴리스틱, (MILP를 쓰는 경우) 모델 템플릿을 미리 준비
+    catalog = get_catalog(catalog_path)
+    get_heuristic(catalog)
+    if settings.backend != 'heuristic' and (settings.backend != 'auto' or catalog.size <= HEURISTIC_ONLY_SIZE):
+        get_template(catalog).instance()
+
+
+def _solve(catalog_path: str, targets: dict, settings: SolverSettings, submitted_at: float, k: int = 1,
+           constraints=None) -> dict:
+    started_at = time.time()
+    # 워커 프로세스의 단계별 시간은 결과에 담아 부모 프로세스에서 기록
+    with collect() as timings:
+        result = solve_meal(get_catalog(catalog_path), targets, settings, constraints, k)
+    result['timings'] = timings
+    result['wait_time'] = started_at - submitted_at
+    result['solve_time'] = time.time() - started_at
+    return result
+
+
+def _solve_plan(catalog_path: str, plan: dict, settings: SolverSettings, time_limit: float, submitted_at: float) -> dict:
+    started_at = time.time()
+    status, days, optimal = solve_plan(get_catalog(catalog_path), time_limit=time_limit, settings=settings, **plan)
+    return {
+        'status': status,
+        'days': days,
+        'optimal': optimal,
+        'wait_time': started_at - submitted_at,
+        'solve_time': time.time() - started_at,
+    }
+
+
+class SolverPool:
+    """
+    고정 크기 프로세스 풀에서 한 끼 풀이(solver_backends.solve_meal)를 실행
+
+    실행 중 + 대기 중인 요청 수를 workers + max_queue로 제한하고, 가득 차면 즉시
+    SolverOverloaded를 던진다. 각 풀이는 time_limit 초 안에 끝나며, 제한에 걸리면
+    그때까지 찾은 가장 좋은 해를 돌려준다. 배치 추천은 batch_slots 자리까지만 쓰므로
+    workers + max_queue가 2 이상이면 대화형 요청이 들어갈 자리가 항상 하나 이상 남는다.
+    """
+
+    def __init__(self, workers: int = None, max_queue: int = None, time_limit: float = 10.0,
+                 catalog_path: str = DEFAULT_CATALOG_PATH, settings: SolverSettings = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = self.workers * 2 if max_queue is None else max_queue
+        # 배치 작업이 한꺼번에 차지할 수 있는 자리 수: 워커 수까지, 전체 자리(워커 + 대기열) 중 한 자리는 대화형 요청 몫으로 남김
+        # 전체 자리가 하나뿐이면 (workers=1, max_queue=0) 남길 수 없으므로 배치가 도는 동안 대화형 요청은 거절될 수 있음
+        capacity = self.workers + self.max_queue
+        self.batch_slots = min(self.workers, capacity - 1) if capacity > 1 else 1
+        self.time_limit = time_limit
+        self.catalog_path = catalog_path
+        # 백엔드/갭 설정 (시간 제한은 항상 풀의 time_limit)
+        settings = settings or SolverSettings()
+        self.settings = SolverSettings(settings.backend, time_limit, settings.gap, settings.warm_start, settings.bound)
+
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._backends = Counter() # 백엔드별 풀이 수 (최적해가 아니면 갭 합계도 기록)
+        self._gap_total = 0.0
+        self._gapped = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        initializer=_warm_up,
+                        initargs=(self.catalog_path, self.settings),
+                    )
+        return self._executor
+
+    def submit(self, targets: dict, block: bool = False, k: int = 1, constraints=None):
+        """
+        풀이 요청을 제출하고 Future를 반환
+
+        block=False면 자리가 없을 때 SolverOverloaded를 던지고, True면 자리가 날 때까지
+        기다린다 (배치 작업용). k > 1이면 서로 다른 상위 k개 식단을 풀이한다.
+        constraints는 compile_constraints 결과로, 워커에서 후보를 줄인 모델로 풀이한다.
+        """
+        args = (self.catalog_path, targets, self.settings, time.time(), k, constraints)
+        return self._submit(_solve, args, block)
+
+    def solve_plan(self, plan: dict) -> dict:
+        """
+        여러 날 식단 계획 풀이 (plan: planner.solve_plan 인자)
+
+        Returns:
+            dict: status, days, optimal, wait_time, solve_time
+        """
+        return self.wait(self._submit(_solve_plan, (self.catalog_path, plan, self.settings, self.time_limit, time.time()), False))
+
+    def reserve(self):
+        """
+        풀 밖(호출한 스레드)에서 실행하는 풀이가 풀의 자리 하나를 차지하게 함 (스트리밍 추천용)
+
+        실행 중 + 대기 중 한도에 함께 세므로 가득 차면 SolverOverloaded를 던진다.
+
+        Returns:
+            자리를 돌려주는 함수 (여러 번 호출해도 한 번만 반환)
+        """
+        self._acquire(False)
+        released = threading.Event()
+
+        def release():
+            with self._lock:
+                if released.is_set():
+                    return
+                released.set()
+            self._release(None)
+        return release
+
+    def _acquire(self, block: bool):
+        if not self._slots.acquire(blocking=block):
+            with self._lock:
+                self._rejected += 1
+            raise SolverOverloaded(f"대기 중인 풀이 요청이 한도({self.workers + self.max_queue})를 넘었습니다")
+        with self._lock:
+            self._in_flight += 1
+
+    def _submit(self, fn, args: tuple, block: bool):
+        self._acquire(block)
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def solve(self, targets: dict, k: int = 1, constraints=None) -> dict:
+        """
+        풀이를 실행하고 결과를 기다림
+
+        Returns:
+            dict: solve_meal 결과 (status, selected 또는 alternatives, optimal, objective, gap 등)와 wait_time, solve_time
+        """
+        return self.wait(self.submit(targets, k=k, constraints=constraints), k)
+
+    def wait(self, future, k: int = 1) -> dict:
+        # 대기열에서 기다리는 시간과 k번의 풀이 시간까지 고려한 상한
+        deadline = self.time_limit * (k + 1 + self.max_queue / self.workers) + 5
+        try:
+            return future.result(timeout=deadline)
+        except FutureTimeoutError:
+            with self._lock:
+                self._timeouts += 1
+            raise SolverTimeout(f"{deadline:.0f}초 안에 풀이 결과를 받지 못했습니다")
+
+    def _release(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            if future is not None and not future.cancelled() and future.exception() is None:
+                result = future.result()
+                self._completed += 1
+                self._wait_total += result['wait_time']
+                self._wait_max = max(self._wait_max, result['wait_time'])
+                observe_stage('queue_wait', result['wait_time'])
+                record_timings(result.get('timings', {}))
+                if 'backend' in result:
+                    record_solve(result, result['solve_time'])
+                    self._backends[result['backend']] += 1
+                    if not result['optimal'] and result['gap'] is not None:
+                        self._gap_total += result['gap']
+                        self._gapped += 1
+        self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'capacity': self.workers + self.max_queue,
+                'in_flight': self._in_flight,
+                'queue_depth': max(0, self._in_flight - self.workers),
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'timeouts': self._timeouts,
+                'wait_time_avg': self._wait_total / self._completed if self._completed else 0.0,
+                'wait_time_max': self._wait_max,
+                'backends': dict(self._backends),
+                'gap_avg': self._gap_total / self._gapped if self._gapped else None, # 최적이 아닌 해의 평균 갭
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def pool_from_env() -> Optional[SolverPool]:
+    # SOLVER_WORKERS=0 이면 풀 없이 요청 스레드에서 직접 풀이
+    workers = int(os.getenv('SOLVER_WORKERS', os.cpu_count() or 1))
+    if workers <= 0:
+        return None
+    max_queue = os.getenv('SOLVER_MAX_QUEUE')
+    return SolverPool(
+        workers=workers,
+        max_queue=int(max_queue) if max_queue is not None else None,
+        time_limit=float(os.getenv('SOLVER_TIME_LIMIT', 10)),
+        settings=SolverSettings.from_env(),
+    )
@@ -0,0 +1,142 @@
+"""
+로컬 제약 파서 테스트
+
+parser_corpus.jsonl의 llm은 같은 문장을 LLM 파서로 해석해 기록한 결과이다.
+기록을 새로 만들려면 (API_KEY 필요):
+
+    python tests/test_nlp_local.py --record
+"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nlp
+import nlp_local
+from nlp import Constraints
+from nlp_local import KeywordMatcher, LocalParse, parse_local
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parser_corpus.jsonl')
+
+
+def load_corpus(path: str = CORPUS_PATH) -> list:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def normalize(constraints: list) -> set:
+    # 순서와 기본값 표기 차이를 없앤 비교용 집합
+    return {
+        json.dumps((Constraints(**c) if isinstance(c, dict) else c).model_dump(exclude_none=True),
+                   sort_keys=True, ensure_ascii=False)
+        for c in constraints
+    }
+
+
+CORPUS = load_corpus()
+LOCAL = [entry for entry in CORPUS if parse_local(entry['text']).complete]
+FALLBACK = [entry for entry in CORPUS if not parse_local(entry['text']).complete]
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    # LLM 호출 대신 기록된 결과를 돌려주고, 호출된 문장을 남김
+    recorded = {entry['text']: entry['llm'] for entry in CORPUS}
+    calls = []
+
+    def fake_llm(user_text):
+        calls.append(user_text)
+        return [Constraints(**c) for c in recorded[user_text]]
+
+    monkeypatch.setattr(nlp, 'parse_constraints_llm', fake_llm)
+    return calls
+
+
+def test_corpus_coverage():
+    # 로컬 파서가 처리하는 문장이 줄어들면 LLM 호출이 늘어남
+    assert len(LOCAL) >= 23
+
+
+@pytest.mark.parametrize('entry', LOCAL, ids=[entry['text'] for entry in LOCAL])
+def test_local_matches_llm(entry, llm_calls):
+    assert normalize(parse_local(entry['text']).constraints) == normalize(entry['llm'])
+    assert normalize(nlp.parse_constraints(entry['text'])) == normalize(entry['llm'])
+    assert llm_calls == []
+
+
+@pytest.mark.parametrize('entry', FALLBACK, ids=[entry['text'] for entry in FALLBACK])
+def test_incomplete_falls_back_to_llm(entry, llm_calls):
+    local = parse_local(entry['text'])
+    assert local.unmatched or not local.constraints
+    assert normalize(nlp.parse_constraints(entry['text'])) == normalize(entry['llm'])
+    assert llm_calls == [entry['text']]
+
+
+def test_matcher_finds_overlapping_keywords():
+    matcher = KeywordMatcher({'he': 1, 'she': 2, 'his': 3, 'hers': 4})
+    found = {(start, end, word) for start, end, word, _ in matcher.find_all('ushers')}
+    assert found == {(1, 4, 'she'), (2, 4, 'he'), (2, 6, 'hers')}
+
+
+def test_matcher_prefers_earliest_then_longest():
+    matcher = KeywordMatcher({'김치': 'a', '김치찌개': 'b', '찌개': 'c', '개': 'd'})
+    assert [(word, value) for _, _, word, value in matcher.find('김치찌개랑 찌개')] == [('김치찌개', 'b'), ('찌개', 'c')]
+
+
+def test_matcher_without_match():
+    matcher = KeywordMatcher({'불고기': 1})
+    assert matcher.find_all('') == []
+    assert matcher.find('잡채 빼고') == []
+
+
+@pytest.mark.parametrize('text', ['불고기 빼지 말고', '잡채 넣고 싶지 않아', '불고기 빼지마'])
+def test_negation_is_not_handled_locally(text):
+    local = parse_local(text)
+    assert not local.complete
+    assert any(word in nlp_local.NEGATION_WORDS for word in local.unmatched)
+
+
+def test_hard_strength_stays_in_clause():
+    local = parse_local('불고기 꼭 넣어줘, 잡채 빼고')
+    assert normalize(local.constraints) == normalize([
+        {'intent': 'INCLUDE_ITEM', 'strength': 'hard', 'food_item': '불고기'},
+        {'intent': 'EXCLUDE_ITEM', 'strength': 'soft', 'food_item': '잡채'},
+    ])
+
+
+def test_unknown_word_lowers_confidence():
+    local = parse_local('불고기 빼고 양념은 덜 달게')
+    assert local.confidence < 1.0
+    assert not local.complete
+
+
+def test_confidence_threshold(monkeypatch):
+    constraints = [Constraints(intent='EXCLUDE_ITEM', food_item='불고기')]
+    assert LocalParse(constraints=constraints, confidence=1.0, unmatched=[]).complete
+    assert not LocalParse(constraints=constraints, confidence=0.9, unmatched=[]).complete
+    assert not LocalParse(constraints=[], confidence=1.0, unmatched=[]).complete
+
+    monkeypatch.setattr(nlp_local, 'LOCAL_MIN_CONFIDENCE', 0.8)
+    assert LocalParse(constraints=constraints, confidence=0.9, unmatched=[]).complete
+    assert not LocalParse(constraints=constraints, confidence=0.9, unmatched=['양념']).complete
+
+
+def record(path: str = CORPUS_PATH):
+    # 모든 문장을 LLM으로 다시 해석해 llm 갱신
+    corpus = load_corpus(path)
+    for entry in corpus:
+        result = nlp.parse_constraints_llm(entry['text'])
+        entry['llm'] = [c.model_dump(exclude_none=True) for c in result] if isinstance(result, list) else []
+    with open(path, 'w', encoding='utf-8') as f:
+        for entry in corpus:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+if __name__ == "__main__":
+    if '--record' in sys.argv:
+        record()
+    else:
+        sys.exit(pytest.main([__file__, '-q']))